@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Gemma - Event bus benchmark
+Starts an EventManager with synthetic producers and consumers and measures
+throughput, per-hop latency and CPU per event for typical payloads, over
+the socket and in-process transports. Needs no camera, microphone or model.
+
+Results are written as JSON so that runs from different commits can be
+compared, either by hand or with --compare.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the gemma-chat directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config import Config
+from src.event_system import (AudioEvent, CameraEvent, EventConsumer, EventManager, EventProducer,
+                              EventType, GemmaEvent, TextEvent, get_latency_recorder)
+from src.event_system.event_producer import POLICY_BLOCK
+
+# Payloads by name: event type and size in bytes
+PAYLOADS = {
+    "text": (EventType.TEXT_INPUT, 100),       # A typed or transcribed sentence
+    "jpeg": (EventType.CAMERA_FRAME, 50_000),  # A 640x480 JPEG frame
+    "audio": (EventType.AUDIO_FRAME, 64_000)   # 2s of 16 kHz 16-bit PCM
+}
+
+TRANSPORTS = ("socket", "local")
+
+# Trace stages marked on every benchmark event
+STAGE_PRODUCER = "bench_producer"
+STAGE_MANAGER = "event_manager"
+STAGE_CONSUMER = "bench_consumer"
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the Gemma event bus")
+    parser.add_argument("--transports", default=",".join(TRANSPORTS),
+                        help="comma-separated transports to run (default: %(default)s)")
+    parser.add_argument("--payloads", default=",".join(PAYLOADS),
+                        help="comma-separated payloads to run (default: %(default)s)")
+    parser.add_argument("--clients", default="1x1,4x4",
+                        help="comma-separated PRODUCERSxCONSUMERS counts (default: %(default)s)")
+    parser.add_argument("--events", type=int, default=1000,
+                        help="events sent by each producer (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=50,
+                        help="events sent by each producer before measuring (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="events per second per producer; 0 sends as fast as flow control allows, "
+                             "so latencies include queueing")
+    parser.add_argument("--codecs", default=None,
+                        help="comma-separated codecs offered by clients (default: from config)")
+    parser.add_argument("--keep-policies", action="store_true",
+                        help="keep the configured drop and coalesce policies instead of delivering every event")
+    parser.add_argument("--idle-timeout", type=float, default=2.0,
+                        help="seconds without deliveries after which a run is considered finished")
+    parser.add_argument("--output", default=None,
+                        help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", default=None,
+                        help="JSON results of an earlier run to compare against")
+    return parser.parse_args()
+
+def parse_clients(spec: str) -> List[Tuple[int, int]]:
+    """Parse "PxC" producer and consumer counts"""
+    clients = []
+    for entry in spec.split(","):
+        producers, _, consumers = entry.strip().partition("x")
+        clients.append((int(producers), int(consumers)))
+    return clients
+
+def make_config(args, transport: str, socket_path: str) -> Config:
+    """Configuration for one benchmark run"""
+    config = Config()
+    config.EVENT_SOCKET_PATH = socket_path
+    config.EVENT_LOCAL_TRANSPORT = transport == "local"
+    config.EVENT_JOURNAL_ENABLED = False
+    if args.codecs:
+        config.EVENT_CODECS = tuple(args.codecs.split(","))
+    if not args.keep_policies:
+        # Measure the bus itself rather than how much of the load it sheds
+        config.EVENT_DROPPABLE_TYPES = ()
+        config.EVENT_COALESCE_TYPES = ()
+    return config
+
+def make_event(event_type: EventType, payload: bytes) -> GemmaEvent:
+    """Build a traced benchmark event"""
+    if event_type == EventType.CAMERA_FRAME:
+        event = CameraEvent(event_type, frame_data=payload)
+    elif event_type == EventType.AUDIO_FRAME:
+        event = AudioEvent(event_type, audio_data=payload)
+    else:
+        event = TextEvent(event_type, text=payload.decode("ascii"))
+    event.start_trace(STAGE_PRODUCER)
+    return event
+
+def latency_summary(histogram_summary: Dict[str, float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    return {
+        key: round(histogram_summary[key] * 1000, 4)
+        for key in ("mean", "p50", "p95", "p99", "max")
+    }
+
+class DeliveryCounter:
+    """Counts events received by the benchmark consumers"""
+
+    def __init__(self, consumer_count: int):
+        self.counts = [0] * consumer_count
+        self.last_delivery = time.perf_counter()
+
+    def handler(self, index: int):
+        """Event handler for one consumer"""
+        def on_event(event: GemmaEvent):
+            event.mark(STAGE_CONSUMER)
+            self.counts[index] += 1
+            self.last_delivery = time.perf_counter()
+        return on_event
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.last_delivery = time.perf_counter()
+
+    async def wait_for(self, expected: int, idle_timeout: float):
+        """Wait until every consumer has the expected events or deliveries stop"""
+        while min(self.counts) < expected:
+            if time.perf_counter() - self.last_delivery > idle_timeout:
+                break
+            await asyncio.sleep(0.005)
+
+async def send_events(producer: EventProducer, event_type: EventType, payload: bytes,
+                      count: int, rate: float) -> int:
+    """Send events from one producer, optionally paced"""
+    sent = 0
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    for index in range(count):
+        if interval:
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if await producer.send_event(make_event(event_type, payload)):
+            sent += 1
+    return sent
+
+async def run_scenario(args, transport: str, payload_name: str, producer_count: int,
+                       consumer_count: int) -> Dict[str, Any]:
+    """Run one transport, payload and client count combination"""
+    event_type, payload_size = PAYLOADS[payload_name]
+    payload = b"x" * payload_size if event_type == EventType.TEXT_INPUT else os.urandom(payload_size)
+
+    socket_path = os.path.join(tempfile.gettempdir(), f"gemma_bench_{os.getpid()}.sock")
+    config = make_config(args, transport, socket_path)
+
+    manager = EventManager(config)
+    await manager.start()
+
+    counter = DeliveryCounter(consumer_count)
+    consumers = []
+    producers = []
+    try:
+        for index in range(consumer_count):
+            consumer = EventConsumer(config, f"bench_consumer_{index}")
+            consumer.register_handler(event_type, counter.handler(index))
+            await consumer.start_consuming()
+            consumers.append(consumer)
+
+        for index in range(producer_count):
+            if args.keep_policies:
+                producer = EventProducer(config, f"bench_producer_{index}")
+            else:
+                producer = EventProducer(config, f"bench_producer_{index}",
+                                         flow_policies={}, default_policy=POLICY_BLOCK)
+            if not await producer.connect():
+                raise RuntimeError(f"Producer {index} cannot connect to {socket_path}")
+            producers.append(producer)
+
+        # Warm up connections and caches before measuring
+        if args.warmup > 0:
+            await asyncio.gather(*(send_events(producer, event_type, payload, args.warmup, 0)
+                                   for producer in producers))
+            await counter.wait_for(args.warmup * producer_count, args.idle_timeout)
+
+        recorder = get_latency_recorder()
+        recorder.reset()
+        counter.reset()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        sent_counts = await asyncio.gather(*(send_events(producer, event_type, payload, args.events, args.rate)
+                                             for producer in producers))
+        send_duration = time.perf_counter() - wall_start
+
+        expected = args.events * producer_count
+        await counter.wait_for(expected, args.idle_timeout)
+        duration = counter.last_delivery - wall_start
+        cpu_time = time.process_time() - cpu_start
+
+        sent = sum(sent_counts)
+        delivered = sum(counter.counts)
+        stages = recorder.get_summary()
+        missing = {'since_start': {}, 'since_previous': {}}
+        manager_stage = stages.get(STAGE_MANAGER, missing)
+        consumer_stage = stages.get(STAGE_CONSUMER, missing)
+
+        return {
+            'transport': transport,
+            'payload': payload_name,
+            'payload_bytes': payload_size,
+            'producers': producer_count,
+            'consumers': consumer_count,
+            'codec': producers[0].get_statistics()['codec'],
+            'events_sent': sent,
+            'events_delivered': delivered,
+            'events_lost': expected * consumer_count - delivered,
+            'duration_s': round(duration, 4),
+            'send_rate_eps': round(sent / send_duration, 1) if send_duration > 0 else 0.0,
+            'throughput_eps': round(delivered / duration, 1) if duration > 0 else 0.0,
+            'throughput_mbps': round(delivered * payload_size / duration / 1e6, 2) if duration > 0 else 0.0,
+            'cpu_us_per_event': round(cpu_time / delivered * 1e6, 2) if delivered else None,
+            'latency_ms': {
+                'producer_to_manager': latency_summary(manager_stage['since_previous']) if manager_stage['since_previous'] else None,
+                'manager_to_consumer': latency_summary(consumer_stage['since_previous']) if consumer_stage['since_previous'] else None,
+                'end_to_end': latency_summary(consumer_stage['since_start']) if consumer_stage['since_start'] else None
+            },
+            'producer_flow': [producer.get_statistics() for producer in producers],
+            'scheduler': manager.get_statistics()['scheduler']
+        }
+
+    finally:
+        for producer in producers:
+            await producer.disconnect()
+        for consumer in consumers:
+            await consumer.stop_consuming()
+        await manager.stop()
+
+def git_commit() -> Optional[str]:
+    """Commit of the working tree being benchmarked, if known"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+def scenario_key(result: Dict[str, Any]) -> Tuple:
+    return (result['transport'], result['payload'], result['producers'], result['consumers'])
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    """Print throughput, latency and CPU changes against an earlier run"""
+    with open(baseline_path) as f:
+        baseline = {scenario_key(result): result for result in json.load(f)['results']}
+
+    print(f"{'scenario':<28} {'throughput':>18} {'p50 e2e ms':>18} {'p99 e2e ms':>18} {'cpu us/event':>18}",
+          file=sys.stderr)
+
+    def change(old: Optional[float], new: Optional[float]) -> str:
+        if old is None or new is None:
+            return "n/a"
+        percent = (new - old) / old * 100 if old else 0.0
+        return f"{new:g} ({percent:+.0f}%)"
+
+    for result in results:
+        old = baseline.get(scenario_key(result))
+        name = "{}/{}/{}x{}".format(*scenario_key(result))
+        if old is None:
+            print(f"{name:<28} (not in baseline)", file=sys.stderr)
+            continue
+
+        new_latency = result['latency_ms']['end_to_end'] or {}
+        old_latency = old['latency_ms']['end_to_end'] or {}
+        print(f"{name:<28} "
+              f"{change(old['throughput_eps'], result['throughput_eps']):>18} "
+              f"{change(old_latency.get('p50'), new_latency.get('p50')):>18} "
+              f"{change(old_latency.get('p99'), new_latency.get('p99')):>18} "
+              f"{change(old['cpu_us_per_event'], result['cpu_us_per_event']):>18}",
+              file=sys.stderr)
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    """Run every requested scenario"""
+    results = []
+    for transport in args.transports.split(","):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        for payload_name in args.payloads.split(","):
+            if payload_name not in PAYLOADS:
+                raise ValueError(f"Unknown payload: {payload_name}")
+            for producer_count, consumer_count in parse_clients(args.clients):
+                result = await run_scenario(args, transport, payload_name, producer_count, consumer_count)
+                results.append(result)
+                print(f"{transport:>6} {payload_name:>5} {producer_count}x{consumer_count}: "
+                      f"{result['throughput_eps']:>9.0f} events/s, "
+                      f"e2e p50 {(result['latency_ms']['end_to_end'] or {}).get('p50', 0):.3f} ms, "
+                      f"{result['cpu_us_per_event']} us cpu/event, "
+                      f"{result['events_lost']} lost",
+                      file=sys.stderr)
+
+    return {
+        'benchmark': 'event_bus',
+        'timestamp': time.time(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'events': args.events,
+            'warmup': args.warmup,
+            'rate': args.rate,
+            'codecs': args.codecs,
+            'keep_policies': args.keep_policies
+        },
+        'results': results
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        print_comparison(report['results'], args.compare)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Gemma - Event journal replay
+Feeds a recorded event journal back into a running event bus, either at
+the recorded pace (optionally scaled) or as fast as possible
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.config import Config
+from src.event_system import EventProducer, EventType
+from src.event_system.event_producer import POLICY_BLOCK
+from src.event_system.journal import JournalReader
+
+def parse_args():
+    """Parse command line arguments"""
+    config = Config.from_env()
+    parser = argparse.ArgumentParser(description="Replay a recorded Gemma event journal")
+    parser.add_argument("--journal-dir", default=config.EVENT_JOURNAL_DIR,
+                        help="journal directory (default: %(default)s)")
+    parser.add_argument("--socket", default=config.EVENT_SOCKET_PATH,
+                        help="event bus socket path (default: %(default)s)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed relative to the recording; 0 replays as fast as possible")
+    parser.add_argument("--start", type=float, default=0.0,
+                        help="seconds into the recording to start from")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="seconds of the recording to replay")
+    parser.add_argument("--types", default=None,
+                        help="comma-separated event types to replay (default: all)")
+    parser.add_argument("--keep-timestamps", action="store_true",
+                        help="keep the recorded event timestamps instead of restamping on send")
+    parser.add_argument("--info", action="store_true",
+                        help="print the time range of the journal and exit")
+    return config, parser.parse_args()
+
+async def replay(config: Config, args) -> int:
+    """Replay the journal and print a summary"""
+    reader = JournalReader(args.journal_dir)
+    time_range = reader.time_range()
+    if time_range is None:
+        print(f"No journal records found in {args.journal_dir}")
+        return 1
+
+    first_time, last_time = time_range
+    if args.info:
+        print(f"Journal {args.journal_dir}: {last_time - first_time:.1f}s recorded "
+              f"from {time.ctime(first_time)}")
+        return 0
+
+    start_time = first_time + args.start
+    end_time = start_time + args.duration if args.duration is not None else None
+    event_types = {EventType(value) for value in args.types.split(",")} if args.types else None
+
+    config.EVENT_SOCKET_PATH = args.socket
+    # Wait for credits instead of dropping, so that every recorded event is replayed
+    producer = EventProducer(config, "journal_replay", flow_policies={}, default_policy=POLICY_BLOCK)
+    if not await producer.connect():
+        print(f"Cannot connect to the event bus at {args.socket}")
+        return 1
+
+    sent = 0
+    max_lag = 0.0
+    replay_start = time.perf_counter()
+    recording_start = None
+
+    try:
+        for timestamp, event in reader.events(start_time, end_time):
+            if event_types is not None and event.event_type not in event_types:
+                continue
+
+            # Hold each event back until its recorded offset, scaled by speed
+            if args.speed > 0:
+                if recording_start is None:
+                    recording_start = timestamp
+                due = (timestamp - recording_start) / args.speed
+                delay = due - (time.perf_counter() - replay_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            if not args.keep_timestamps:
+                event.timestamp = time.time()
+
+            if not await producer.send_event(event):
+                print("Event bus connection lost, stopping replay")
+                break
+            sent += 1
+    finally:
+        await producer.disconnect()
+
+    elapsed = time.perf_counter() - replay_start
+    rate = sent / elapsed if elapsed > 0 else 0.0
+    print(f"Replayed {sent} events in {elapsed:.2f}s ({rate:.0f} events/s)")
+    if args.speed > 0:
+        print(f"Maximum lag behind the recorded schedule: {max_lag * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    config, args = parse_args()
+    sys.exit(asyncio.run(replay(config, args)))
@@ -7,10 +7,11 @@ import numpy as np
 from typing import Optional, Dict, Any, List
 import time
 import threading
+from collections import deque
 from queue import Queue as ThreadQueue
 
 from .object_detector import ObjectDetector, DetectedObject
-from ..event_system import EventProducer, EventType, CameraEvent
+from ..event_system import EventProducer, EventType, CameraEvent, SharedFrameRing
 from ..config import Config
 
 class CameraProcessor:
@@ -35,6 +36,10 @@ class CameraProcessor:
         # Event system
         self.event_producer = EventProducer(config, "camera_processor")
         
+        # Shared memory ring for raw frames, created on the first frame
+        self.shared_frames_enabled = config.SHARED_FRAMES_ENABLED
+        self.frame_ring: Optional[SharedFrameRing] = None
+        
         # Camera capture
         self.cap: Optional[cv2.VideoCapture] = None
         self.running = False
@@ -48,7 +53,7 @@ class CameraProcessor:
         # Performance tracking
         self.fps_counter = 0
         self.fps_start_time = time.time()
-        self.processing_times = []
+        self.processing_times = deque(maxlen=100)
         
         # Threading
         self.capture_thread: Optional[threading.Thread] = None
@@ -98,6 +103,11 @@ class CameraProcessor:
         # Disconnect from event system
         await self.event_producer.disconnect()
         
+        # Release shared frame ring
+        if self.frame_ring:
+            self.frame_ring.close()
+            self.frame_ring = None
+        
         self.logger.info("Camera processor stopped")
     
     def _initialize_camera(self) -> bool:
@@ -224,8 +234,6 @@ class CameraProcessor:
             # Update performance metrics
             processing_time = time.time() - start_time
             self.processing_times.append(processing_time)
-            if len(self.processing_times) > 100:
-                self.processing_times.pop(0)
             
             self.last_frame_time = time.time()
             
@@ -235,22 +243,47 @@ class CameraProcessor:
     async def _send_frame_event(self, frame: np.ndarray, objects: List[DetectedObject]):
         """Send camera frame event"""
         try:
-            # Encode frame as JPEG for transmission
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_data = buffer.tobytes()
+            frame_ref = self._write_shared_frame(frame)
             
-            # Create event
-            event = CameraEvent(
-                event_type=EventType.CAMERA_FRAME,
-                frame_data=frame_data,
-                detections=[obj.to_dict() for obj in objects]
-            )
+            if frame_ref is not None:
+                # Consumers read the raw frame from shared memory
+                event = CameraEvent(
+                    event_type=EventType.CAMERA_FRAME,
+                    frame_ref=frame_ref,
+                    detections=[obj.to_dict() for obj in objects]
+                )
+            else:
+                # Encode frame as JPEG for transmission
+                _, buffer = cv2.imencode('.jpg', frame)
+                event = CameraEvent(
+                    event_type=EventType.CAMERA_FRAME,
+                    frame_data=buffer.tobytes(),
+                    detections=[obj.to_dict() for obj in objects]
+                )
             
             await self.event_producer.send_event(event)
             
         except Exception as e:
             self.logger.error(f"Error sending frame event: {e}")
     
+    def _write_shared_frame(self, frame: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Copy a frame into the shared ring and return its reference"""
+        if not self.shared_frames_enabled:
+            return None
+        
+        try:
+            if self.frame_ring is None:
+                slot_size = max(frame.nbytes, self.camera_width * self.camera_height * 3)
+                self.frame_ring = SharedFrameRing.create(
+                    self.config.CAMERA_RING_NAME, self.config.CAMERA_RING_SLOTS, slot_size
+                )
+            return self.frame_ring.write(frame)
+            
+        except Exception as e:
+            self.logger.warning(f"Shared frame ring unavailable, falling back to JPEG events: {e}")
+            self.shared_frames_enabled = False
+            return None
+    
     async def _send_object_events(self, changes: Dict[str, List[DetectedObject]]):
         """Send object detection events"""
         try:
@@ -297,5 +330,7 @@ class CameraProcessor:
             'avg_processing_time': avg_processing_time,
             'camera_resolution': (self.camera_width, self.camera_height),
             'camera_fps': self.camera_fps,
-            'detection_summary': self.object_detector.get_detection_summary()
+            'detection_summary': self.object_detector.get_detection_summary(),
+            'frame_ring': self.frame_ring.get_statistics() if self.frame_ring else None,
+            'event_flow': self.event_producer.get_statistics()
         }
\ No newline at end of file
@@ -2,13 +2,42 @@
 
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 @dataclass
 class Config:
     # Event System
     EVENT_SOCKET_PATH: str = "/tmp/gemma_events.sock"
-    EVENT_BUFFER_SIZE: int = 4096
+    EVENT_BUFFER_SIZE: int = 65536
+    EVENT_MAX_FRAME_SIZE: int = 16 * 1024 * 1024
+    EVENT_CODECS: Tuple[str, ...] = ("msgpack", "binary", "json")  # In order of preference
+    EVENT_QUEUE_MAX_SIZE: int = 256
+    EVENT_DROPPABLE_TYPES: Tuple[str, ...] = ("camera_frame", "audio_frame")  # Evicted first when the queue is full
+    EVENT_COALESCE_TYPES: Tuple[str, ...] = ("camera_frame",)  # Only the latest queued event is kept
+    EVENT_CLIENT_QUEUE_SIZE: int = 64  # Outgoing events buffered per client
+    EVENT_PRODUCER_CREDITS: int = 32  # Events a producer may have in flight
+    EVENT_FLOW_POLICIES: Tuple[str, ...] = (  # "event_type:policy" used when a producer runs out of credits
+        "camera_frame:latest",
+        "audio_frame:drop",
+        "wake_word_detected:queue",
+        "speech_detected:queue"
+    )
+    EVENT_FLOW_DEFAULT_POLICY: str = "queue"
+    EVENT_LOCAL_TRANSPORT: bool = True  # Skip the socket for components in the manager's process
+    
+    # Shared Memory Frame Rings
+    SHARED_FRAMES_ENABLED: bool = True  # Send camera/audio payloads by reference
+    CAMERA_RING_NAME: str = "gemma_camera_frames"
+    CAMERA_RING_SLOTS: int = 8
+    AUDIO_RING_NAME: str = "gemma_audio_frames"
+    AUDIO_RING_SLOTS: int = 4
+    AUDIO_RING_SLOT_SECONDS: int = 4  # Longest speech segment a slot can hold; longer ones are sent inline
+    
+    # Event Journal
+    EVENT_JOURNAL_ENABLED: bool = False  # Record every event entering the bus
+    EVENT_JOURNAL_DIR: str = "data/journal"
+    EVENT_JOURNAL_SEGMENT_SIZE: int = 64 * 1024 * 1024
+    EVENT_JOURNAL_MAX_SEGMENTS: int = 16  # Oldest segments are deleted beyond this
     
     # Camera Processing
     CAMERA_DEVICE: int = 0
@@ -23,23 +52,51 @@ class Config:
     AUDIO_CHANNELS: int = 1
     AUDIO_CHUNK_SIZE: int = 1024
     VAD_MODEL_PATH: str = "silero_vad"
-    WAKE_WORDS: list = ("Gemma", "Hey Gemma")
+    WAKE_WORDS: Tuple[str, ...] = ("Gemma", "Hey Gemma")
     
     # AI Model API
-    API_URL: str = "http://localhost:8000"
+    API_URL: str = "http://localhost:8000"  # Or unix:///path/to/socket for a server on this host
+    API_FALLBACK_URL: str = ""  # Second server used when the first is down
+    API_MAX_CONNECTIONS: int = 8  # Pooled keep-alive connections per server
+    API_HEALTH_INTERVAL: float = 5.0  # Seconds between background health checks
+    API_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a server is skipped
     MODEL_NAME: str = "gemma3n"
-    MAX_HISTORY: int = 20
+    MAX_HISTORY: int = 20  # Exchanges kept in the prompt at most
+    TOKENIZER_NAME: str = ""  # Hugging Face name or local path of a tokenizer to count prompt tokens; estimated if empty
+    PROMPT_TOKEN_BUDGET: int = 4096  # Prompt plus response tokens per request
+    PROMPT_SUMMARY_TOKENS: int = 256  # Summary of turns dropped from the prompt
+    PROMPT_CONTEXT_TOKENS: int = 512  # Memory facts, detections and other per-turn context
+    VISION_INPUT_SIZE: int = 768  # Camera frames are downscaled to fit the model's vision input
+    VISION_JPEG_QUALITY: int = 85
+    VISION_UNCHANGED_DISTANCE: int = 4  # Perceptual hash bits a frame may differ by and still count as unchanged
+    VISION_RESEND_INTERVAL: float = 60.0  # Seconds after which an unchanged view is sent again
     MAX_NEW_TOKENS: int = 100
     TEMPERATURE: float = 0.7
     RESPONSE_TARGET_MS: int = 400
+    STREAM_RESPONSES: bool = True  # Stream model output so speech starts before generation ends
     
     # Memory System
     IMMEDIATE_MEMORY_SIZE: int = 100
+    IMMEDIATE_MEMORY_DUPLICATE_THRESHOLD: float = 0.8  # Word overlap above which a new fact is a duplicate
+    MEMORY_RETRIEVAL_BUDGET_MS: int = 30  # Memory lookups return what they have after this
+    DISTILLATION_WORKERS: int = 1  # Processes running fact distillation
+    DISTILLATION_QUEUE_SIZE: int = 32  # Exchanges waiting for distillation before the oldest is dropped
+    DISTILLATION_MAX_BATCH: int = 8  # Exchanges distilled in one generation
     MILVUS_HOST: str = "localhost"
     MILVUS_PORT: int = 19530
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    LONG_TERM_BATCH_SIZE: int = 64  # Facts stored per long-term memory write
+    LONG_TERM_BATCH_WINDOW: float = 0.05  # Seconds to collect a batch
+    LONG_TERM_FLUSH_INTERVAL: float = 5.0  # Seconds between Milvus flushes
+    LONG_TERM_SEARCH_WORKERS: int = 2  # Searches over the retrieval budget keep running on these
+    EMBEDDING_CACHE_DIR: str = "data/embeddings"
+    EMBEDDING_CACHE_SIZE: int = 2048  # Embeddings kept in memory
+    EMBEDDING_DISK_CACHE_SIZE: int = 100000  # Embeddings kept on disk
+    VECTOR_STORE_BACKEND: str = "auto"  # Options: "auto" (Milvus, else local), "milvus", "local"
+    VECTOR_STORE_DIR: str = "data/vectors"  # Local vector store snapshots
+    VECTOR_STORE_EXACT_LIMIT: int = 20000  # Vectors searched exactly before building an IVF index
     
     # TTS
     TTS_ENGINE: str = "piper"  # Options: "piper", "kokoro", "espeak"
@@ -60,14 +117,14 @@ class Config:
         for field_name, field_value in config.__dict__.items():
             env_value = os.getenv(f"GEMMA_{field_name}")
             if env_value is not None:
-                if isinstance(field_value, int):
+                if isinstance(field_value, bool):
+                    setattr(config, field_name, env_value.lower() in ("true", "1", "yes"))
+                elif isinstance(field_value, int):
                     setattr(config, field_name, int(env_value))
                 elif isinstance(field_value, float):
                     setattr(config, field_name, float(env_value))
-                elif isinstance(field_value, bool):
-                    setattr(config, field_name, env_value.lower() in ("true", "1", "yes"))
-                elif isinstance(field_value, list):
-                    setattr(config, field_name, env_value.split(","))
+                elif isinstance(field_value, (list, tuple)):
+                    setattr(config, field_name, tuple(item.strip() for item in env_value.split(",") if item.strip()))
                 else:
                     setattr(config, field_name, env_value)
         
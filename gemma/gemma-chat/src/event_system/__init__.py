@@ -4,5 +4,7 @@ from .event_manager import EventManager
 from .event_types import EventType, GemmaEvent, TTSEvent, CameraEvent, AudioEvent, TextEvent
 from .event_producer import EventProducer
 from .event_consumer import EventConsumer
+from .shared_frames import SharedFrameRing, resolve_frame_ref
+from .tracing import LatencyRecorder, get_latency_recorder, mark_stage
 
-__all__ = ["EventManager", "EventType", "GemmaEvent", "TTSEvent", "CameraEvent", "AudioEvent", "TextEvent", "EventProducer", "EventConsumer"]
\ No newline at end of file
+__all__ = ["EventManager", "EventType", "GemmaEvent", "TTSEvent", "CameraEvent", "AudioEvent", "TextEvent", "EventProducer", "EventConsumer", "SharedFrameRing", "resolve_frame_ref", "LatencyRecorder", "get_latency_recorder", "mark_stage"]
\ No newline at end of file
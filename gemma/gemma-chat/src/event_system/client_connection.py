@@ -0,0 +1,225 @@
+"""Per-client connection state held by the event manager"""
+
+import asyncio
+import logging
+import socket
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .codecs import EventCodec
+from .event_types import EventType, GemmaEvent
+from .protocol import FRAME_CONTROL, FRAME_EVENT, Buffer, encode_control, write_frame
+
+class ClientConnection:
+    """A connected client with its subscriptions and outgoing queue.
+
+    Events routed to the client are queued and written by a dedicated
+    writer task, so a slow reader only delays its own deliveries. The queue
+    is bounded: when it is full, the oldest queued event of a droppable type
+    is evicted, or the new event is dropped if it is droppable itself.
+    Control messages are queued separately, never dropped, and written
+    ahead of events.
+
+    Events the client sends are flow controlled with credits: the client
+    may have at most `credit_window` events in the manager at once, and
+    credits are returned in batches as its events are released.
+    """
+
+    def __init__(self,
+                 client_id: str,
+                 name: str,
+                 client_socket: socket.socket,
+                 codec: EventCodec,
+                 subscriptions: Optional[Iterable[EventType]] = None,
+                 max_queue_size: int = 64,
+                 droppable_types: Iterable[EventType] = (),
+                 credit_window: int = 32):
+        self.client_id = client_id
+        self.name = name
+        self.socket = client_socket
+        self.codec = codec
+        self.max_queue_size = max_queue_size
+        self.droppable_types = set(droppable_types)
+        self.logger = logging.getLogger(f"{__name__}.{name}")
+
+        # None means the client receives every event
+        self.subscriptions: Optional[Set[EventType]] = None
+        self.set_subscriptions(subscriptions)
+
+        # Outgoing queues
+        self.queue: Deque[Tuple[GemmaEvent, List[Buffer]]] = deque()
+        self.control_queue: Deque[bytes] = deque()
+        self.ready = asyncio.Event()
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        # Flow control
+        self.credit_window = credit_window
+        self.credit_batch = max(1, credit_window // 4)
+        self.credits_owed = 0
+
+        # Statistics
+        self.sent_events = 0
+        self.dropped_events = 0
+        self.credits_granted = 0
+
+    def set_subscriptions(self, subscriptions: Optional[Iterable[EventType]]):
+        """Replace the set of event types routed to this client"""
+        self.subscriptions = set(subscriptions) if subscriptions is not None else None
+
+    def is_subscribed(self, event_type: EventType) -> bool:
+        """Check whether events of a type should be routed to this client"""
+        return self.subscriptions is None or event_type in self.subscriptions
+
+    def start(self):
+        """Start the writer task"""
+        self.writer_task = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, event: GemmaEvent, payload: List[Buffer]) -> bool:
+        """Queue an encoded event for sending. Returns False if it was dropped."""
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_queue_size and not self._evict_droppable():
+            if event.event_type in self.droppable_types:
+                self.dropped_events += 1
+                return False
+
+        self.queue.append((event, payload))
+        self.ready.set()
+        return True
+
+    def send_control(self, message: Dict[str, Any]):
+        """Queue a control message for the client"""
+        if self.closed:
+            return
+        self.control_queue.append(encode_control(message))
+        self.ready.set()
+
+    def release_credit(self):
+        """Account for one of the client's events leaving the manager.
+
+        Credits go back to the client in batches to keep control traffic low.
+        """
+        self.credits_owed += 1
+        if self.credits_owed >= self.credit_batch:
+            self.send_control({'type': 'credit', 'credits': self.credits_owed})
+            self.credits_granted += self.credits_owed
+            self.credits_owed = 0
+
+    def _evict_droppable(self) -> bool:
+        """Remove the oldest queued droppable event, if any"""
+        for index, (event, _) in enumerate(self.queue):
+            if event.event_type in self.droppable_types:
+                del self.queue[index]
+                self.dropped_events += 1
+                return True
+        return False
+
+    async def _write_loop(self):
+        """Write queued events to the client socket"""
+        try:
+            while not self.closed:
+                if self.control_queue:
+                    await write_frame(self.socket, self.control_queue.popleft(), FRAME_CONTROL)
+                    continue
+
+                if not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+
+                _, payload = self.queue.popleft()
+                await write_frame(self.socket, payload)
+                self.sent_events += 1
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Error sending to client {self.client_id}: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        """Shut the connection down and stop the writer.
+
+        The socket is shut down rather than closed so that the manager's
+        pending read sees end-of-stream and releases the socket itself.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        self.queue.clear()
+        self.control_queue.clear()
+        self.ready.set()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def get_statistics(self) -> Dict[str, object]:
+        """Get connection statistics"""
+        return {
+            'name': self.name,
+            'codec': self.codec.name if self.codec else 'local',
+            'subscriptions': (sorted(event_type.value for event_type in self.subscriptions)
+                              if self.subscriptions is not None else None),
+            'queue_size': len(self.queue),
+            'sent_events': self.sent_events,
+            'dropped_events': self.dropped_events,
+            'credits_granted': self.credits_granted
+        }
+
+
+class LocalClientConnection(ClientConnection):
+    """A client running in the same process as the event manager.
+
+    Events are queued as objects rather than encoded, and the client takes
+    them straight from the queue instead of a writer task sending them over
+    a socket. Subscriptions, the bounded queue and credits work as for
+    socket clients.
+    """
+
+    def __init__(self, client_id: str, name: str, **kwargs):
+        super().__init__(client_id, name, None, None, **kwargs)
+
+    def start(self):
+        """Local clients need no writer task"""
+
+    def send_control(self, message: Dict[str, Any]):
+        """Queue a control message for the client, unencoded"""
+        if self.closed:
+            return
+        self.control_queue.append(message)
+        self.ready.set()
+
+    async def receive(self) -> Optional[List[Tuple[int, Any]]]:
+        """Wait for queued messages and take all of them.
+
+        Returns (kind, item) pairs like the frames of a socket connection,
+        with control messages as dicts and events as private copies, or
+        None once the connection is closed.
+        """
+        while not self.closed:
+            if self.control_queue or self.queue:
+                items: List[Tuple[int, Any]] = [(FRAME_CONTROL, message) for message in self.control_queue]
+                self.control_queue.clear()
+                items.extend((FRAME_EVENT, event.clone()) for event, _ in self.queue)
+                self.sent_events += len(self.queue)
+                self.queue.clear()
+                return items
+
+            self.ready.clear()
+            await self.ready.wait()
+        return None
+
+    def close(self):
+        """Shut the connection down, waking up a waiting receive"""
+        if self.closed:
+            return
+
+        self.closed = True
+        self.queue.clear()
+        self.control_queue.clear()
+        self.ready.set()
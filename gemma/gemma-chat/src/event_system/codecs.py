@@ -0,0 +1,206 @@
+"""Event codecs for the event bus wire protocol
+
+A codec turns a GemmaEvent into a list of buffers making up one frame
+payload, and back. The codec used on a connection is negotiated during the
+handshake: the client lists the codecs it supports in order of preference
+and the event manager picks the first one it also supports.
+
+- "binary": fixed struct header, compact JSON metadata, and binary values
+  from `event.data` carried out of band as raw blobs
+- "msgpack": same layout with msgpack metadata (only if msgpack is installed)
+- "json": the plain `GemmaEvent.to_json` form, kept for debugging
+"""
+
+import json
+import logging
+import struct
+from typing import Any, Dict, List, Optional, Sequence
+
+from .event_types import EventType, GemmaEvent
+from .protocol import Buffer
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Stable wire codes for event types, in declaration order
+_EVENT_TYPES: List[EventType] = list(EventType)
+_EVENT_TYPE_CODES: Dict[EventType, int] = {event_type: code for code, event_type in enumerate(_EVENT_TYPES)}
+
+# Placeholder key for a value carried as an out-of-band blob
+BLOB_MARKER = "__blob__"
+
+# Metadata key carrying the event's latency trace
+TRACE_KEY = "__trace__"
+
+class EventCodec:
+    """Base class for event codecs"""
+
+    name = "base"
+
+    def encode(self, event: GemmaEvent) -> List[Buffer]:
+        """Encode an event into the buffers forming one frame payload"""
+        raise NotImplementedError
+
+    def decode(self, payload: Buffer) -> GemmaEvent:
+        """Decode an event from a frame payload"""
+        raise NotImplementedError
+
+class JsonCodec(EventCodec):
+    """Human-readable JSON codec for debugging"""
+
+    name = "json"
+
+    def encode(self, event: GemmaEvent) -> List[Buffer]:
+        return [event.to_json().encode("utf-8")]
+
+    def decode(self, payload: Buffer) -> GemmaEvent:
+        return GemmaEvent.from_json(bytes(payload))
+
+class BinaryCodec(EventCodec):
+    """Struct header plus out-of-band blobs.
+
+    Layout of a payload:
+
+        header        version, event type, priority, timestamp,
+                      source length, metadata length, blob count
+        blob lengths  one uint32 per blob
+        source        utf-8
+        metadata      `event.data` with binary values replaced by
+                      {"__blob__": index}, plus the latency trace if
+                      any under "__trace__"
+        blobs         raw bytes, concatenated
+
+    Only top-level values of `event.data` are moved out of band; binary
+    values nested deeper are not supported. Decoded blobs are memoryviews
+    into the received frame, so they are not copied.
+    """
+
+    name = "binary"
+    version = 1
+
+    _HEADER = struct.Struct("!BBidHIH")
+    _BLOB_LENGTH = struct.Struct("!I")
+
+    def _dump_metadata(self, metadata: Dict[str, Any]) -> bytes:
+        return json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+
+    def _load_metadata(self, payload: Buffer) -> Dict[str, Any]:
+        return json.loads(bytes(payload))
+
+    def encode(self, event: GemmaEvent) -> List[Buffer]:
+        blobs: List[Buffer] = []
+        metadata: Dict[str, Any] = {}
+
+        for key, value in event.data.items():
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                metadata[key] = {BLOB_MARKER: len(blobs)}
+                blobs.append(value)
+            else:
+                metadata[key] = value
+
+        if event.trace is not None:
+            metadata[TRACE_KEY] = event.trace
+
+        source = event.source.encode("utf-8")
+        metadata_bytes = self._dump_metadata(metadata)
+
+        head = [
+            self._HEADER.pack(
+                self.version,
+                _EVENT_TYPE_CODES[event.event_type],
+                event.priority,
+                event.timestamp,
+                len(source),
+                len(metadata_bytes),
+                len(blobs)
+            )
+        ]
+        head.extend(self._BLOB_LENGTH.pack(len(blob)) for blob in blobs)
+        head.append(source)
+        head.append(metadata_bytes)
+
+        return [b"".join(head)] + blobs
+
+    def decode(self, payload: Buffer) -> GemmaEvent:
+        view = memoryview(payload)
+        (version, type_code, priority, timestamp,
+         source_length, metadata_length, blob_count) = self._HEADER.unpack_from(view, 0)
+        if version != self.version:
+            raise ValueError(f"Unsupported {self.name} codec version: {version}")
+
+        offset = self._HEADER.size
+        blob_lengths = []
+        for _ in range(blob_count):
+            blob_lengths.append(self._BLOB_LENGTH.unpack_from(view, offset)[0])
+            offset += self._BLOB_LENGTH.size
+
+        source = bytes(view[offset:offset + source_length]).decode("utf-8")
+        offset += source_length
+
+        data = self._load_metadata(view[offset:offset + metadata_length])
+        trace = data.pop(TRACE_KEY, None)
+        offset += metadata_length
+
+        blobs = []
+        for length in blob_lengths:
+            blobs.append(view[offset:offset + length])
+            offset += length
+
+        for key, value in data.items():
+            if isinstance(value, dict) and len(value) == 1 and BLOB_MARKER in value:
+                data[key] = blobs[value[BLOB_MARKER]]
+
+        return GemmaEvent(
+            event_type=_EVENT_TYPES[type_code],
+            timestamp=timestamp,
+            data=data,
+            priority=priority,
+            source=source,
+            trace=trace
+        )
+
+class MsgpackCodec(BinaryCodec):
+    """Binary codec with msgpack-encoded metadata"""
+
+    name = "msgpack"
+
+    def _dump_metadata(self, metadata: Dict[str, Any]) -> bytes:
+        return msgpack.packb(metadata, use_bin_type=True)
+
+    def _load_metadata(self, payload: Buffer) -> Dict[str, Any]:
+        return msgpack.unpackb(payload, raw=False)
+
+CODECS: Dict[str, EventCodec] = {
+    JsonCodec.name: JsonCodec(),
+    BinaryCodec.name: BinaryCodec()
+}
+
+if MSGPACK_AVAILABLE:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+def get_codec(name: str) -> EventCodec:
+    """Get a codec by name"""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown event codec: {name}")
+
+def supported_codecs(preferred: Sequence[str]) -> List[str]:
+    """Filter a preference list down to the codecs available here"""
+    codecs = [name for name in preferred if name in CODECS]
+    if not codecs:
+        logger.warning(f"None of the configured codecs {list(preferred)} are available, using json")
+        codecs = [JsonCodec.name]
+    return codecs
+
+def negotiate_codec(offered: Sequence[str]) -> Optional[str]:
+    """Pick the first codec offered by a client that is available here"""
+    for name in offered:
+        if name in CODECS:
+            return name
+    return None
@@ -1,25 +1,31 @@
 """Event consumer for receiving events from the event manager"""
 
 import asyncio
-import socket
 import logging
 from typing import Optional, Callable, Dict, List
 from asyncio import Queue
 
 from .event_types import GemmaEvent, EventType
+from .protocol import FRAME_EVENT
+from .transport import EventTransport, open_transport
 from ..config import Config
 
 class EventConsumer:
-    """Consumes events from the event manager"""
+    """Consumes events from the event manager.
+    
+    Consumers in the event manager's process receive events directly
+    instead of through the socket, see transport.py.
+    """
     
     def __init__(self, config: Config, consumer_name: str = "unknown"):
         self.config = config
         self.consumer_name = consumer_name
         self.logger = logging.getLogger(f"{__name__}.{consumer_name}")
         self.socket_path = config.EVENT_SOCKET_PATH
-        self.client_socket: Optional[socket.socket] = None
+        self.transport: Optional[EventTransport] = None
         self.connected = False
         self.running = False
+        self.tasks: List[asyncio.Task] = []
         
         # Event handling
         self.handlers: Dict[EventType, List[Callable]] = {}
@@ -28,11 +34,13 @@ class EventConsumer:
     async def connect(self) -> bool:
         """Connect to the event manager"""
         try:
-            self.client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            self.client_socket.setblocking(False)
-            await asyncio.get_event_loop().sock_connect(self.client_socket, self.socket_path)
+            transport = open_transport(self.config)
+            await transport.connect(self.consumer_name, subscriptions=self._subscriptions())
+            self.transport = transport
+            
             self.connected = True
-            self.logger.info(f"Connected to event manager")
+            self.logger.info(f"Connected to event manager ({transport.name} transport, "
+                             f"codec: {transport.codec_name})")
             return True
         except Exception as e:
             self.logger.error(f"Failed to connect to event manager: {e}")
@@ -42,12 +50,20 @@ class EventConsumer:
     async def disconnect(self):
         """Disconnect from the event manager"""
         self.running = False
-        if self.client_socket:
+        
+        # A read left pending on the closed socket would keep its file
+        # descriptor registered with the event loop
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        
+        if self.transport:
             try:
-                self.client_socket.close()
+                self.transport.close()
             except:
                 pass
-            self.client_socket = None
+            self.transport = None
             self.connected = False
             self.logger.info("Disconnected from event manager")
     
@@ -60,10 +76,10 @@ class EventConsumer:
         self.running = True
         
         # Start receiving events
-        asyncio.create_task(self._receive_events())
+        self.tasks.append(asyncio.create_task(self._receive_events()))
         
         # Start processing events
-        asyncio.create_task(self._process_events())
+        self.tasks.append(asyncio.create_task(self._process_events()))
         
         self.logger.info("Started consuming events")
     
@@ -77,18 +93,13 @@ class EventConsumer:
         """Receive events from the event manager"""
         while self.running and self.connected:
             try:
-                data = await asyncio.get_event_loop().sock_recv(
-                    self.client_socket, self.config.EVENT_BUFFER_SIZE
-                )
-                if not data:
+                items = await self.transport.receive()
+                if items is None:
                     break
                 
-                try:
-                    event_json = data.decode('utf-8')
-                    event = GemmaEvent.from_json(event_json)
-                    await self.event_queue.put(event)
-                except Exception as e:
-                    self.logger.error(f"Error parsing event: {e}")
+                for kind, event in items:
+                    if kind == FRAME_EVENT:
+                        await self.event_queue.put(event)
                     
             except Exception as e:
                 if self.running:
@@ -125,6 +136,7 @@ class EventConsumer:
             self.handlers[event_type] = []
         self.handlers[event_type].append(handler)
         self.logger.debug(f"Registered handler for {event_type}")
+        self._schedule_subscription_update()
     
     def unregister_handler(self, event_type: EventType, handler: Callable):
         """Unregister an event handler"""
@@ -133,10 +145,34 @@ class EventConsumer:
                 self.handlers[event_type].remove(handler)
                 if not self.handlers[event_type]:
                     del self.handlers[event_type]
+                    self._schedule_subscription_update()
                 self.logger.debug(f"Unregistered handler for {event_type}")
             except ValueError:
                 self.logger.warning(f"Handler not found for {event_type}")
     
+    def _subscriptions(self) -> List[str]:
+        """Event types this consumer has handlers for"""
+        return sorted(event_type.value for event_type in self.handlers)
+    
+    def _schedule_subscription_update(self):
+        """Tell the event manager about changed handlers once connected"""
+        if not self.connected:
+            return  # Sent with the handshake instead
+        try:
+            asyncio.get_running_loop().create_task(self._send_subscriptions())
+        except RuntimeError:
+            self.logger.warning("Cannot update subscriptions outside the event loop")
+    
+    async def _send_subscriptions(self):
+        """Send the current subscriptions to the event manager"""
+        try:
+            await self.transport.send_control({
+                'type': 'subscribe',
+                'event_types': self._subscriptions()
+            })
+        except Exception as e:
+            self.logger.error(f"Failed to update subscriptions: {e}")
+    
     async def get_next_event(self, timeout: float = 1.0) -> Optional[GemmaEvent]:
         """Get the next event from the queue"""
         try:
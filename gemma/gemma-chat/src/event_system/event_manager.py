@@ -5,29 +5,52 @@ import socket
 import os
 import logging
 from typing import Dict, List, Callable, Optional, Any
-from asyncio import Queue
-import json
-import time
-from dataclasses import asdict
 
 from .event_types import GemmaEvent, EventType
+from .scheduler import EventScheduler
+from .client_connection import ClientConnection, LocalClientConnection
+from .codecs import get_codec, negotiate_codec
+from .journal import EventJournal
+from .protocol import FRAME_CONTROL, FRAME_EVENT, FrameReader, decode_control, write_control
+from .transport import register_local_manager, unregister_local_manager
 from ..config import Config
 
 class EventManager:
-    """Manages event distribution using Unix domain sockets"""
+    """Manages event distribution using Unix domain sockets.
+    
+    Clients in the same process connect through the local transport
+    instead, see transport.py.
+    """
     
     def __init__(self, config: Config):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.socket_path = config.EVENT_SOCKET_PATH
         self.server_socket: Optional[socket.socket] = None
-        self.clients: Dict[str, socket.socket] = {}
-        self.event_queue: Queue = Queue()
+        self.clients: Dict[str, ClientConnection] = {}
+        self.next_client_number = 0
         self.handlers: Dict[EventType, List[Callable]] = {}
         self.running = False
+        self.tasks: List[asyncio.Task] = []
+        self.client_tasks: Dict[str, asyncio.Task] = {}
+        
+        # Priority scheduler for events (higher priority processed first)
+        self.droppable_types = [EventType(name) for name in config.EVENT_DROPPABLE_TYPES]
+        self.scheduler = EventScheduler(
+            max_size=config.EVENT_QUEUE_MAX_SIZE,
+            droppable_types=self.droppable_types,
+            coalesce_types=[EventType(name) for name in config.EVENT_COALESCE_TYPES],
+            on_release=self._release_credit
+        )
         
-        # Priority queue for events (higher priority processed first)
-        self.priority_queue: List[GemmaEvent] = []
+        # Optional record of every event entering the bus, for offline replay
+        self.journal: Optional[EventJournal] = None
+        if config.EVENT_JOURNAL_ENABLED:
+            self.journal = EventJournal(
+                config.EVENT_JOURNAL_DIR,
+                segment_size=config.EVENT_JOURNAL_SEGMENT_SIZE,
+                max_segments=config.EVENT_JOURNAL_MAX_SEGMENTS
+            )
         
     async def start(self):
         """Start the event manager server"""
@@ -43,13 +66,18 @@ class EventManager:
         self.server_socket.listen(5)
         self.server_socket.setblocking(False)
         
+        if self.journal:
+            self.journal.open()
+        
         self.running = True
+        if self.config.EVENT_LOCAL_TRANSPORT:
+            register_local_manager(self.socket_path, self)
         
         # Start event processing loop
-        asyncio.create_task(self._process_events())
+        self.tasks.append(asyncio.create_task(self._process_events()))
         
         # Start accepting connections
-        asyncio.create_task(self._accept_connections())
+        self.tasks.append(asyncio.create_task(self._accept_connections()))
         
         self.logger.info("Event manager started successfully")
     
@@ -57,17 +85,36 @@ class EventManager:
         """Stop the event manager"""
         self.logger.info("Stopping event manager")
         self.running = False
+        unregister_local_manager(self.socket_path, self)
+        self.scheduler.close()
+        
+        # Cancel the accept loop before its socket is closed, so that no
+        # pending accept outlives the socket it was waiting on
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
         
         # Close all client connections
-        for client_id, client_socket in self.clients.items():
+        for client_id, client in list(self.clients.items()):
             try:
-                client_socket.close()
+                client.close()
             except Exception as e:
                 self.logger.warning(f"Error closing client {client_id}: {e}")
         
+        # Stop reading from clients, including any still in their handshake
+        client_tasks = list(self.client_tasks.values())
+        for task in client_tasks:
+            task.cancel()
+        await asyncio.gather(*client_tasks, return_exceptions=True)
+        self.client_tasks = {}
+        
         # Close server socket
         if self.server_socket:
             self.server_socket.close()
+        
+        if self.journal:
+            self.journal.close()
             
         # Remove socket file
         if os.path.exists(self.socket_path):
@@ -80,73 +127,193 @@ class EventManager:
         while self.running:
             try:
                 client_socket, _ = await asyncio.get_event_loop().sock_accept(self.server_socket)
-                client_id = f"client_{len(self.clients)}"
-                self.clients[client_id] = client_socket
+                client_socket.setblocking(False)
+                client_id = self._next_client_id()
                 
                 self.logger.debug(f"New client connected: {client_id}")
                 
-                # Start handling client messages
-                asyncio.create_task(self._handle_client(client_id, client_socket))
+                # Start handling client messages; the client is registered
+                # for broadcasts once its handshake completes
+                self.client_tasks[client_id] = asyncio.create_task(self._handle_client(client_id, client_socket))
                 
             except Exception as e:
                 if self.running:
                     self.logger.error(f"Error accepting connection: {e}")
                 await asyncio.sleep(0.1)
     
+    def _next_client_id(self) -> str:
+        """Allocate an id for a new client"""
+        client_id = f"client_{self.next_client_number}"
+        self.next_client_number += 1
+        return client_id
+    
     async def _handle_client(self, client_id: str, client_socket: socket.socket):
         """Handle messages from a specific client"""
+        reader = FrameReader(client_socket, self.config.EVENT_BUFFER_SIZE, self.config.EVENT_MAX_FRAME_SIZE)
         try:
             while self.running:
-                data = await asyncio.get_event_loop().sock_recv(client_socket, self.config.EVENT_BUFFER_SIZE)
-                if not data:
+                frames = await reader.read_frames()
+                if frames is None:
                     break
                 
-                try:
-                    event_json = data.decode('utf-8')
-                    event = GemmaEvent.from_json(event_json)
-                    await self._add_event(event)
-                except Exception as e:
-                    self.logger.error(f"Error processing event from {client_id}: {e}")
+                for kind, payload in frames:
+                    try:
+                        if kind == FRAME_CONTROL:
+                            await self._handle_control(client_id, client_socket, decode_control(payload))
+                        elif kind == FRAME_EVENT and client_id in self.clients:
+                            codec = self.clients[client_id].codec
+                            await self._add_event(codec.decode(payload), payload, codec.name, origin=client_id)
+                        else:
+                            self.logger.warning(f"Dropping frame from {client_id} received before handshake")
+                    except Exception as e:
+                        self.logger.error(f"Error processing event from {client_id}: {e}")
                     
         except Exception as e:
             self.logger.error(f"Error handling client {client_id}: {e}")
         finally:
             # Clean up client connection
-            if client_id in self.clients:
-                del self.clients[client_id]
+            self._remove_client(client_id)
             try:
                 client_socket.close()
             except:
                 pass
+            self.client_tasks.pop(client_id, None)
             self.logger.debug(f"Client {client_id} disconnected")
     
-    async def _add_event(self, event: GemmaEvent):
-        """Add event to priority queue"""
-        # Insert event based on priority (higher priority first)
-        inserted = False
-        for i, existing_event in enumerate(self.priority_queue):
-            if event.priority > existing_event.priority:
-                self.priority_queue.insert(i, event)
-                inserted = True
-                break
+    async def _handle_control(self, client_id: str, client_socket: socket.socket, message: Dict[str, Any]):
+        """Handle a control message from a client"""
+        message_type = message.get('type')
+        
+        if message_type == 'hello':
+            codec_name = negotiate_codec(message.get('codecs', []))
+            if codec_name is None:
+                raise ValueError(f"No common codec with {client_id}: {message.get('codecs')}")
+            
+            client = ClientConnection(
+                client_id,
+                message.get('name', 'unknown'),
+                client_socket,
+                get_codec(codec_name),
+                subscriptions=self._parse_subscriptions(message.get('subscriptions')),
+                max_queue_size=self.config.EVENT_CLIENT_QUEUE_SIZE,
+                droppable_types=self.droppable_types,
+                credit_window=self.config.EVENT_PRODUCER_CREDITS
+            )
+            
+            # Register only after the welcome is written so that no
+            # event can reach the client ahead of it
+            await write_control(client_socket, {
+                'type': 'welcome',
+                'client_id': client_id,
+                'codec': codec_name,
+                'credits': client.credit_window
+            })
+            self.clients[client_id] = client
+            client.start()
+            
+            self.logger.debug(f"Client {client_id} ({client.name}) using codec {codec_name}, "
+                              f"subscribed to {client.get_statistics()['subscriptions']}")
+            
+        elif message_type == 'subscribe' and client_id in self.clients:
+            self._update_subscriptions(client_id, message.get('event_types'))
+            
+        else:
+            self.logger.warning(f"Unknown control message from {client_id}: {message_type}")
+    
+    def _update_subscriptions(self, client_id: str, event_types: Optional[List[str]]):
+        """Replace the event types routed to a client"""
+        client = self.clients[client_id]
+        client.set_subscriptions(self._parse_subscriptions(event_types))
+        self.logger.debug(f"Client {client_id} ({client.name}) subscribed to "
+                          f"{client.get_statistics()['subscriptions']}")
+            
+    # Local transport
+    
+    def connect_local(self, name: str, subscriptions: Optional[List[str]]) -> LocalClientConnection:
+        """Register a client running in this process"""
+        if not self.running:
+            raise ConnectionError("Event manager is not running")
         
-        if not inserted:
-            self.priority_queue.append(event)
+        client_id = self._next_client_id()
+        client = LocalClientConnection(
+            client_id,
+            name,
+            subscriptions=self._parse_subscriptions(subscriptions),
+            max_queue_size=self.config.EVENT_CLIENT_QUEUE_SIZE,
+            droppable_types=self.droppable_types,
+            credit_window=self.config.EVENT_PRODUCER_CREDITS
+        )
+        self.clients[client_id] = client
         
-        # Also add to regular queue for backwards compatibility
-        await self.event_queue.put(event)
+        self.logger.debug(f"Local client {client_id} ({name}) connected, "
+                          f"subscribed to {client.get_statistics()['subscriptions']}")
+        return client
+    
+    async def submit_local_event(self, client_id: str, event: GemmaEvent):
+        """Accept an event from a local client"""
+        await self._add_event(event, origin=client_id)
+    
+    def handle_local_control(self, client_id: str, message: Dict[str, Any]):
+        """Handle a control message from a local client"""
+        if message.get('type') == 'subscribe' and client_id in self.clients:
+            self._update_subscriptions(client_id, message.get('event_types'))
+        else:
+            self.logger.warning(f"Unknown control message from {client_id}: {message.get('type')}")
+    
+    def disconnect_local(self, client_id: str):
+        """Forget a local client that has disconnected"""
+        self._remove_client(client_id)
+        self.logger.debug(f"Local client {client_id} disconnected")
+    
+    def _parse_subscriptions(self, event_types: Optional[List[str]]) -> Optional[List[EventType]]:
+        """Convert subscribed event type values, ignoring unknown ones"""
+        if event_types is None:
+            return None
+        
+        subscriptions = []
+        for value in event_types:
+            try:
+                subscriptions.append(EventType(value))
+            except ValueError:
+                self.logger.warning(f"Ignoring subscription to unknown event type: {value}")
+        return subscriptions
+    
+    def _remove_client(self, client_id: str):
+        """Forget a disconnected client"""
+        client = self.clients.pop(client_id, None)
+        if client:
+            client.close()
+    
+    async def _add_event(self, event: GemmaEvent, payload: Optional[bytes] = None,
+                         codec_name: Optional[str] = None, origin: Optional[str] = None):
+        """Add event to priority queue, journaling it first if enabled.
+        
+        `payload` is the event as received, encoded with `codec_name`, which
+        lets the journal store it without encoding it again. `origin` is the
+        id of the client that sent the event, which is granted a new credit
+        once the event leaves the queue.
+        """
+        if self.journal:
+            self.journal.append(event, payload, codec_name)
+        
+        if not self.scheduler.put(event, origin):
+            self.logger.debug(f"Dropped {event.event_type} event, queue is full")
+    
+    def _release_credit(self, client_id: str):
+        """Return a flow control credit to the client an event came from"""
+        client = self.clients.get(client_id)
+        if client:
+            client.release_credit()
     
     async def _process_events(self):
         """Process events from the queue"""
         while self.running:
             try:
-                # Process priority queue first
-                if self.priority_queue:
-                    event = self.priority_queue.pop(0)
-                    await self._handle_event(event)
-                else:
-                    # Wait for new events
-                    await asyncio.sleep(0.01)
+                # Wait for the highest priority event
+                event = await self.scheduler.get()
+                if event is None:
+                    break
+                await self._handle_event(event)
                     
             except Exception as e:
                 self.logger.error(f"Error processing events: {e}")
@@ -154,6 +321,8 @@ class EventManager:
     
     async def _handle_event(self, event: GemmaEvent):
         """Handle a specific event by calling registered handlers"""
+        event.mark("event_manager")
+        
         if event.event_type in self.handlers:
             for handler in self.handlers[event.event_type]:
                 try:
@@ -164,28 +333,37 @@ class EventManager:
                 except Exception as e:
                     self.logger.error(f"Error in event handler: {e}")
         
-        # Broadcast event to all connected clients
-        await self._broadcast_event(event)
+        # Route event to subscribed clients
+        self._route_event(event)
     
-    async def _broadcast_event(self, event: GemmaEvent):
-        """Broadcast event to all connected clients"""
+    def _route_event(self, event: GemmaEvent):
+        """Queue an event for every client subscribed to its type"""
         if not self.clients:
             return
         
-        event_json = event.to_json().encode('utf-8')
+        # Encode once per codec in use; local clients take the event as is
+        encoded: Dict[str, list] = {}
         
-        # Send to all clients
-        disconnected_clients = []
-        for client_id, client_socket in self.clients.items():
+        for client_id, client in list(self.clients.items()):
+            if client.closed:
+                self._remove_client(client_id)
+                continue
+            
+            if not client.is_subscribed(event.event_type):
+                continue
+            
             try:
-                await asyncio.get_event_loop().sock_sendall(client_socket, event_json)
+                payload = None
+                if client.codec is not None:
+                    codec_name = client.codec.name
+                    if codec_name not in encoded:
+                        encoded[codec_name] = client.codec.encode(event)
+                    payload = encoded[codec_name]
+                
+                if not client.enqueue(event, payload):
+                    self.logger.debug(f"Dropped {event.event_type} for slow client {client_id}")
             except Exception as e:
-                self.logger.warning(f"Error sending to client {client_id}: {e}")
-                disconnected_clients.append(client_id)
-        
-        # Remove disconnected clients
-        for client_id in disconnected_clients:
-            del self.clients[client_id]
+                self.logger.warning(f"Error routing event to client {client_id}: {e}")
     
     def register_handler(self, event_type: EventType, handler: Callable):
         """Register an event handler"""
@@ -210,9 +388,11 @@ class EventManager:
         await self._add_event(event)
         self.logger.debug(f"Published event: {event.event_type}")
     
-    async def get_next_event(self) -> Optional[GemmaEvent]:
-        """Get the next event from the queue"""
-        try:
-            return await asyncio.wait_for(self.event_queue.get(), timeout=1.0)
-        except asyncio.TimeoutError:
-            return None
\ No newline at end of file
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get event manager statistics"""
+        return {
+            'running': self.running,
+            'clients': {client_id: client.get_statistics() for client_id, client in self.clients.items()},
+            'scheduler': self.scheduler.get_statistics(),
+            'journal': self.journal.get_statistics() if self.journal else None
+        }
\ No newline at end of file
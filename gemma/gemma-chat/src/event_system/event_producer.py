@@ -1,32 +1,98 @@
 """Event producer for sending events to the event manager"""
 
 import asyncio
-import socket
 import logging
-from typing import Optional
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
 
-from .event_types import GemmaEvent
+from .event_types import GemmaEvent, EventType
+from .protocol import FRAME_CONTROL
+from .transport import EventTransport, open_transport
 from ..config import Config
 
+# Flow control policies, applied per event type when the producer has run
+# out of credits
+POLICY_LATEST = "latest"  # Keep only the newest pending event of the type
+POLICY_DROP = "drop"      # Drop the event
+POLICY_QUEUE = "queue"    # Hold the event until credits arrive
+POLICY_BLOCK = "block"    # Hold the event and make the caller wait until it is sent
+FLOW_POLICIES = (POLICY_LATEST, POLICY_DROP, POLICY_QUEUE, POLICY_BLOCK)
+
+def parse_flow_policies(entries: Iterable[str]) -> Dict[EventType, str]:
+    """Parse "event_type:policy" configuration entries"""
+    policies = {}
+    for entry in entries:
+        event_type, _, policy = entry.partition(":")
+        if policy not in FLOW_POLICIES:
+            raise ValueError(f"Unknown flow control policy in {entry!r}")
+        policies[EventType(event_type.strip())] = policy
+    return policies
+
+class _PendingEvent:
+    """Event waiting for a credit"""
+    
+    __slots__ = ("event", "sent")
+    
+    def __init__(self, event: GemmaEvent, sent: Optional[asyncio.Future] = None):
+        self.event = event
+        self.sent = sent
+
 class EventProducer:
-    """Produces events and sends them to the event manager"""
+    """Produces events and sends them to the event manager.
+    
+    Sending is flow controlled: the event manager grants credits, one is
+    spent per event sent, and credits come back once the manager has
+    finished with the events. When no credits are left, events are held,
+    coalesced or dropped according to the policy for their type, so a busy
+    manager does not stall the producer's own processing loop.
     
-    def __init__(self, config: Config, producer_name: str = "unknown"):
+    Producers in the event manager's process hand events over directly
+    instead of through the socket, see transport.py.
+    """
+    
+    def __init__(self, config: Config, producer_name: str = "unknown",
+                 flow_policies: Optional[Dict[EventType, str]] = None,
+                 default_policy: Optional[str] = None):
         self.config = config
         self.producer_name = producer_name
         self.logger = logging.getLogger(f"{__name__}.{producer_name}")
         self.socket_path = config.EVENT_SOCKET_PATH
-        self.client_socket: Optional[socket.socket] = None
+        self.transport: Optional[EventTransport] = None
         self.connected = False
+        self.reader_task: Optional[asyncio.Task] = None
+        
+        # Flow control; None means the manager does not limit this producer
+        self.credits: Optional[int] = None
+        self.flow_policies = (flow_policies if flow_policies is not None
+                              else parse_flow_policies(config.EVENT_FLOW_POLICIES))
+        self.default_policy = default_policy or config.EVENT_FLOW_DEFAULT_POLICY
+        self.pending: Deque[_PendingEvent] = deque()
+        self.latest_pending: Dict[EventType, _PendingEvent] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        
+        # Statistics
+        self.sent_events = 0
+        self.deferred_events = 0
+        self.dropped_events: Dict[str, int] = {}
+        self.coalesced_events: Dict[str, int] = {}
     
     async def connect(self) -> bool:
         """Connect to the event manager"""
         try:
-            self.client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            self.client_socket.setblocking(False)
-            await asyncio.get_event_loop().sock_connect(self.client_socket, self.socket_path)
+            self._stop_reader()
+            self._close_transport()
+            transport = open_transport(self.config)
+            welcome = await transport.connect(self.producer_name, subscriptions=[])  # Producers do not receive events
+            self.transport = transport
+            self.credits = welcome.get('credits')
+            
             self.connected = True
-            self.logger.info(f"Connected to event manager")
+            self.reader_task = asyncio.create_task(self._receive_control(transport))
+            self.logger.info(f"Connected to event manager ({transport.name} transport, "
+                             f"codec: {transport.codec_name}, credits: {self.credits})")
+            
+            # Events held while disconnected go out first
+            self._schedule_flush()
             return True
         except Exception as e:
             self.logger.error(f"Failed to connect to event manager: {e}")
@@ -35,17 +101,78 @@ class EventProducer:
     
     async def disconnect(self):
         """Disconnect from the event manager"""
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except:
-                pass
-            self.client_socket = None
+        self._stop_reader()
+        self._release_pending()
+        if self.transport:
+            self._close_transport()
             self.connected = False
             self.logger.info("Disconnected from event manager")
     
+    def _close_transport(self):
+        """Close the current connection, if any"""
+        if self.transport:
+            try:
+                self.transport.close()
+            except Exception:
+                pass
+            self.transport = None
+    
+    def _stop_reader(self):
+        """Stop reading control messages from the current connection"""
+        if self.reader_task and not self.reader_task.done():
+            self.reader_task.cancel()
+        self.reader_task = None
+    
+    def _release_pending(self, blocked_only: bool = False):
+        """Discard held events, waking up callers blocked on them.
+        
+        With `blocked_only`, events held without a waiting caller are kept
+        to be sent after reconnecting.
+        """
+        kept = deque()
+        for entry in self.pending:
+            if entry.sent is not None:
+                if not entry.sent.done():
+                    entry.sent.set_result(False)
+            elif blocked_only:
+                kept.append(entry)
+        
+        self.pending = kept
+        self.latest_pending = {entry.event.event_type: entry for entry in kept
+                               if self.flow_policies.get(entry.event.event_type) == POLICY_LATEST}
+    
+    async def _receive_control(self, transport: EventTransport):
+        """Read credit grants from the event manager"""
+        try:
+            while self.connected:
+                items = await transport.receive()
+                if items is None:
+                    self.logger.warning("Event manager closed the connection")
+                    self.connected = False
+                    self._release_pending(blocked_only=True)
+                    break
+                
+                for kind, message in items:
+                    if kind != FRAME_CONTROL:
+                        continue
+                    if message.get('type') == 'credit' and self.credits is not None:
+                        self.credits += message.get('credits', 0)
+                        self._schedule_flush()
+        
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if self.connected:
+                self.logger.error(f"Error reading from event manager: {e}")
+                self.connected = False
+                self._release_pending(blocked_only=True)
+    
     async def send_event(self, event: GemmaEvent) -> bool:
-        """Send an event to the event manager"""
+        """Send an event to the event manager.
+        
+        Returns False if the event could not be sent or was dropped by flow
+        control. Events held for later sending count as sent.
+        """
         if not self.connected:
             await self.connect()
         
@@ -53,24 +180,92 @@ class EventProducer:
             self.logger.warning("Cannot send event - not connected to event manager")
             return False
         
+        # Set event source
+        event.source = self.producer_name
+        
+        if self.credits is None or (self.credits > 0 and not self.pending):
+            if self.credits is not None:
+                self.credits -= 1
+            return await self._write_event(event)
+        
+        return await self._hold_event(event)
+    
+    async def _write_event(self, event: GemmaEvent) -> bool:
+        """Send an event over the current transport"""
         try:
-            # Set event source
-            event.source = self.producer_name
-            
-            # Send event
-            event_json = event.to_json().encode('utf-8')
-            await asyncio.get_event_loop().sock_sendall(self.client_socket, event_json)
+            await self.transport.send_event(event)
             
+            self.sent_events += 1
             self.logger.debug(f"Sent event: {event.event_type}")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to send event: {e}")
             self.connected = False
             return False
     
+    async def _hold_event(self, event: GemmaEvent) -> bool:
+        """Apply the flow control policy to an event sent without credits"""
+        event_type = event.event_type
+        policy = self.flow_policies.get(event_type, self.default_policy)
+        
+        if policy == POLICY_DROP:
+            self.dropped_events[event_type.value] = self.dropped_events.get(event_type.value, 0) + 1
+            return False
+        
+        if policy == POLICY_LATEST:
+            entry = self.latest_pending.get(event_type)
+            if entry is not None:
+                entry.event = event
+                self.coalesced_events[event_type.value] = self.coalesced_events.get(event_type.value, 0) + 1
+                return True
+        
+        sent = asyncio.get_running_loop().create_future() if policy == POLICY_BLOCK else None
+        entry = _PendingEvent(event, sent)
+        self.pending.append(entry)
+        if policy == POLICY_LATEST:
+            self.latest_pending[event_type] = entry
+        self.deferred_events += 1
+        
+        if sent is not None:
+            return await sent
+        return True
+    
+    def _schedule_flush(self):
+        """Send held events now that credits are available"""
+        if self.pending and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.create_task(self._flush_pending())
+    
+    async def _flush_pending(self):
+        """Send held events in order while credits last"""
+        while self.pending and self.connected and (self.credits is None or self.credits > 0):
+            entry = self.pending.popleft()
+            event_type = entry.event.event_type
+            if self.latest_pending.get(event_type) is entry:
+                del self.latest_pending[event_type]
+            
+            if self.credits is not None:
+                self.credits -= 1
+            sent = await self._write_event(entry.event)
+            if entry.sent is not None and not entry.sent.done():
+                entry.sent.set_result(sent)
+    
     async def ensure_connected(self) -> bool:
         """Ensure connection to event manager"""
         if not self.connected:
             return await self.connect()
-        return True
\ No newline at end of file
+        return True
+    
+    def get_statistics(self) -> Dict[str, object]:
+        """Get producer flow control statistics"""
+        return {
+            'connected': self.connected,
+            'transport': self.transport.name if self.transport else None,
+            'codec': self.transport.codec_name if self.transport else None,
+            'credits': self.credits,
+            'pending_events': len(self.pending),
+            'sent_events': self.sent_events,
+            'deferred_events': self.deferred_events,
+            'dropped_events': dict(self.dropped_events),
+            'coalesced_events': dict(self.coalesced_events)
+        }
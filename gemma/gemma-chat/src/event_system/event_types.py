@@ -1,11 +1,29 @@
 """Event types and data structures for Gemma"""
 
+from copy import copy
 from enum import Enum
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, Optional, List
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Union
+import base64
 import json
 import time
 
+from .tracing import TRACE_STAGES, mark_stage, new_trace
+
+# Binary values (JPEG frames, PCM audio) cannot be represented in JSON, so
+# the JSON form wraps them in an object holding their base64 encoding.
+BYTES_MARKER = "__bytes__"
+
+def _encode_json_value(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {BYTES_MARKER: base64.b64encode(value).decode("ascii")}
+    return value
+
+def _decode_json_value(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1 and BYTES_MARKER in value:
+        return base64.b64decode(value[BYTES_MARKER])
+    return value
+
 class EventType(Enum):
     # Camera events
     CAMERA_FRAME = "camera_frame"
@@ -42,31 +60,60 @@ class GemmaEvent:
     data: Dict[str, Any]
     priority: int = 0  # Higher values = higher priority
     source: str = "unknown"
+    trace: Optional[Dict[str, Any]] = None  # Latency trace, see tracing.py
     
     def __post_init__(self):
         if self.timestamp == 0:
             self.timestamp = time.time()
     
+    def start_trace(self, stage: str):
+        """Start a latency trace at this event"""
+        self.trace = new_trace(stage, self.timestamp)
+    
+    def mark(self, stage: str, once: bool = False):
+        """Mark a stage on the event's trace, if it has one"""
+        mark_stage(self.trace, stage, once=once)
+    
+    def clone(self) -> "GemmaEvent":
+        """Copy of the event whose data and trace can change independently.
+        
+        Data values themselves are shared, so large buffers are not copied.
+        """
+        event = copy(self)
+        event.data = dict(self.data)
+        if self.trace is not None:
+            event.trace = dict(self.trace)
+            if TRACE_STAGES in self.trace:
+                event.trace[TRACE_STAGES] = list(self.trace[TRACE_STAGES])
+        return event
+    
     def to_json(self) -> str:
         """Serialize event to JSON string"""
-        data = asdict(self)
-        data['event_type'] = self.event_type.value
-        return json.dumps(data)
+        return json.dumps({
+            'event_type': self.event_type.value,
+            'timestamp': self.timestamp,
+            'data': {key: _encode_json_value(value) for key, value in self.data.items()},
+            'priority': self.priority,
+            'source': self.source,
+            'trace': self.trace
+        })
     
     @classmethod
-    def from_json(cls, json_str: str) -> "GemmaEvent":
+    def from_json(cls, json_str: Union[str, bytes]) -> "GemmaEvent":
         """Deserialize event from JSON string"""
         data = json.loads(json_str)
         data['event_type'] = EventType(data['event_type'])
+        data['data'] = {key: _decode_json_value(value) for key, value in data['data'].items()}
         return cls(**data)
 
 @dataclass
 class CameraEvent(GemmaEvent):
     """Camera-specific event"""
     def __init__(self, event_type: EventType, frame_data: Optional[bytes] = None, 
-                 detections: Optional[List[Dict]] = None, **kwargs):
+                 detections: Optional[List[Dict]] = None, frame_ref: Optional[Dict] = None, **kwargs):
         data = {
             'frame_data': frame_data,
+            'frame_ref': frame_ref,  # Shared memory slot holding the raw frame
             'detections': detections or []
         }
         super().__init__(event_type, time.time(), data, **kwargs)
@@ -75,9 +122,11 @@ class CameraEvent(GemmaEvent):
 class AudioEvent(GemmaEvent):
     """Audio-specific event"""
     def __init__(self, event_type: EventType, audio_data: Optional[bytes] = None,
-                 wake_word: Optional[str] = None, confidence: float = 0.0, **kwargs):
+                 wake_word: Optional[str] = None, confidence: float = 0.0,
+                 audio_ref: Optional[Dict] = None, **kwargs):
         data = {
             'audio_data': audio_data,
+            'audio_ref': audio_ref,  # Shared memory slot holding the raw PCM
             'wake_word': wake_word,
             'confidence': confidence
         }
@@ -0,0 +1,359 @@
+"""Append-only journal of the events entering the event bus
+
+The journal is a directory of segment files written through mmap. Each
+segment starts with a small header and holds records of
+
+    payload length, receive timestamp, codec id, encoded event
+
+Events arriving from clients are stored in the encoding they arrived in,
+so journaling does not re-encode them. A segment is rotated once it is
+full, and the oldest segments are deleted beyond `max_segments`. Next to
+every segment an index file maps receive timestamps to record offsets
+(one entry every `index_interval` records), so readers can start a replay
+at any point in time without scanning from the start.
+
+Camera frames and audio sent through shared memory only carry a slot
+reference, which does not outlive the session. The journal reads such
+payloads out of their ring when it records the event and stores them
+inline, as the producers send them without shared memory: camera frames
+as JPEG (which needs OpenCV) and audio as raw PCM. Replayed events
+therefore carry their payload.
+"""
+
+import bisect
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .codecs import CODECS, get_codec
+from .event_types import GemmaEvent
+from .protocol import Buffer
+from .shared_frames import resolve_frame_ref
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"GEVJ"
+_VERSION = 1
+_SEGMENT_HEADER = struct.Struct("!4sBd")  # magic, version, creation time
+_RECORD_HEADER = struct.Struct("!IdB")  # payload length, receive timestamp, codec id
+_INDEX_ENTRY = struct.Struct("!dQ")  # receive timestamp, record offset
+
+SEGMENT_SUFFIX = ".journal"
+INDEX_SUFFIX = ".index"
+
+# Stable on-disk ids for the event codecs
+_CODEC_IDS: Dict[str, int] = {"json": 0, "binary": 1, "msgpack": 2}
+_CODEC_NAMES: Dict[int, str] = {code: name for name, code in _CODEC_IDS.items()}
+
+def _segment_path(directory: str, number: int, suffix: str) -> str:
+    return os.path.join(directory, f"{number:08d}{suffix}")
+
+def list_segments(directory: str) -> List[int]:
+    """Numbers of the journal segments in a directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+
+    numbers = []
+    for filename in os.listdir(directory):
+        stem, suffix = os.path.splitext(filename)
+        if suffix == SEGMENT_SUFFIX and stem.isdigit():
+            numbers.append(int(stem))
+    return sorted(numbers)
+
+class EventJournal:
+    """Writes encoded events to rotating memory-mapped segment files"""
+
+    def __init__(self,
+                 directory: str,
+                 segment_size: int = 64 * 1024 * 1024,
+                 max_segments: int = 16,
+                 index_interval: int = 64,
+                 codec_name: str = "binary"):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.index_interval = index_interval
+        self.codec = get_codec(codec_name)
+        self.logger = logging.getLogger(__name__)
+
+        # Current segment
+        self.segment_number = 0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._index_file = None
+        self._offset = 0
+        self._segment_records = 0
+
+        # Statistics
+        self.records_written = 0
+        self.bytes_written = 0
+        self.segments_rotated = 0
+        self.errors = 0
+        self.inlined_payloads = 0
+        self.missing_payloads = 0
+
+    def open(self):
+        """Start a new segment after any already in the directory"""
+        os.makedirs(self.directory, exist_ok=True)
+        existing = list_segments(self.directory)
+        self.segment_number = existing[-1] if existing else 0
+        self._open_segment(self.segment_size)
+        self.logger.info(f"Event journal writing to {self.directory}")
+
+    def _open_segment(self, size: int):
+        """Create and map the next segment file"""
+        self.segment_number += 1
+        path = _segment_path(self.directory, self.segment_number, SEGMENT_SUFFIX)
+
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        _SEGMENT_HEADER.pack_into(self._mmap, 0, _MAGIC, _VERSION, time.time())
+        self._offset = _SEGMENT_HEADER.size
+        self._segment_records = 0
+
+        self._index_file = open(_segment_path(self.directory, self.segment_number, INDEX_SUFFIX), "wb")
+
+        self._prune_segments()
+
+    def _close_segment(self):
+        """Unmap the current segment and trim it to the bytes written"""
+        if self._mmap is None:
+            return
+
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.truncate(self._offset)
+        self._file.close()
+        self._index_file.close()
+        self._mmap = None
+        self._file = None
+        self._index_file = None
+
+    def _prune_segments(self):
+        """Delete the oldest segments beyond the retention limit"""
+        if not self.max_segments:
+            return
+
+        for number in list_segments(self.directory)[:-self.max_segments]:
+            for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                try:
+                    os.unlink(_segment_path(self.directory, number, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def append(self, event: GemmaEvent, payload: Optional[Buffer] = None,
+               codec_name: Optional[str] = None):
+        """Record an event.
+
+        `payload` is the event as already encoded by `codec_name`, when the
+        caller has it; otherwise the event is encoded with the journal codec.
+        """
+        if self._mmap is None:
+            return
+
+        try:
+            inlined = self._inline_shared_payloads(event)
+            if inlined is not event:
+                event, payload = inlined, None
+
+            if payload is None or codec_name not in _CODEC_IDS:
+                parts: Sequence[Buffer] = self.codec.encode(event)
+                codec_name = self.codec.name
+            else:
+                parts = [payload]
+
+            length = sum(len(part) for part in parts)
+            record_size = _RECORD_HEADER.size + length
+
+            if self._offset + record_size > len(self._mmap):
+                self._close_segment()
+                self._open_segment(max(self.segment_size, _SEGMENT_HEADER.size + record_size))
+                self.segments_rotated += 1
+
+            timestamp = time.time()
+            if self._segment_records % self.index_interval == 0:
+                self._index_file.write(_INDEX_ENTRY.pack(timestamp, self._offset))
+
+            _RECORD_HEADER.pack_into(self._mmap, self._offset, length, timestamp, _CODEC_IDS[codec_name])
+            offset = self._offset + _RECORD_HEADER.size
+            for part in parts:
+                self._mmap[offset:offset + len(part)] = part
+                offset += len(part)
+
+            self._offset = offset
+            self._segment_records += 1
+            self.records_written += 1
+            self.bytes_written += record_size
+
+        except Exception as e:
+            self.errors += 1
+            self.logger.error(f"Error writing event to journal: {e}")
+
+    def _inline_shared_payloads(self, event: GemmaEvent) -> GemmaEvent:
+        """Copy of an event with its shared memory payloads read into its data.
+
+        Returns the event itself if it has no shared memory references.
+        """
+        frame_ref = event.data.get('frame_ref')
+        audio_ref = event.data.get('audio_ref')
+        if not frame_ref and not audio_ref:
+            return event
+
+        event = event.clone()
+        if frame_ref:
+            frame = resolve_frame_ref(frame_ref) if CV2_AVAILABLE else None
+            encoded = cv2.imencode('.jpg', frame)[1] if frame is not None else None
+            if encoded is not None:
+                event.data['frame_data'] = encoded.tobytes()
+                event.data['frame_ref'] = None
+                self.inlined_payloads += 1
+            else:
+                self.missing_payloads += 1
+
+        if audio_ref:
+            audio = resolve_frame_ref(audio_ref)
+            if audio is not None:
+                event.data['audio_data'] = audio.tobytes()
+                event.data['audio_ref'] = None
+                self.inlined_payloads += 1
+            else:
+                self.missing_payloads += 1
+        return event
+
+    def close(self):
+        """Flush and close the current segment"""
+        try:
+            self._close_segment()
+        except Exception as e:
+            self.logger.error(f"Error closing event journal: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get journal statistics"""
+        return {
+            'directory': self.directory,
+            'segment': self.segment_number,
+            'segment_offset': self._offset,
+            'records_written': self.records_written,
+            'bytes_written': self.bytes_written,
+            'inlined_payloads': self.inlined_payloads,
+            'missing_payloads': self.missing_payloads,
+            'segments_rotated': self.segments_rotated,
+            'errors': self.errors
+        }
+
+class JournalReader:
+    """Reads events back from a journal directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+
+    def _load_index(self, number: int) -> Tuple[List[float], List[int]]:
+        """Load the timestamp index of a segment"""
+        timestamps: List[float] = []
+        offsets: List[int] = []
+        try:
+            with open(_segment_path(self.directory, number, INDEX_SUFFIX), "rb") as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            return timestamps, offsets
+
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        for timestamp, offset in _INDEX_ENTRY.iter_unpack(data[:usable]):
+            timestamps.append(timestamp)
+            offsets.append(offset)
+        return timestamps, offsets
+
+    def _start_offset(self, number: int, start_time: Optional[float]) -> int:
+        """Offset of the last indexed record at or before `start_time`"""
+        if start_time is None:
+            return _SEGMENT_HEADER.size
+
+        timestamps, offsets = self._load_index(number)
+        position = bisect.bisect_right(timestamps, start_time) - 1
+        return offsets[position] if position >= 0 else _SEGMENT_HEADER.size
+
+    def _segment_bounds(self, number: int) -> Optional[Tuple[float, float]]:
+        """First and last indexed timestamps of a segment"""
+        timestamps, _ = self._load_index(number)
+        if not timestamps:
+            return None
+        return timestamps[0], timestamps[-1]
+
+    def records(self, start_time: Optional[float] = None,
+                end_time: Optional[float] = None) -> Iterator[Tuple[float, str, bytes]]:
+        """Yield (receive timestamp, codec name, payload) for every record in range"""
+        numbers = list_segments(self.directory)
+
+        for position, number in enumerate(numbers):
+            # Skip whole segments that end before the requested start
+            if start_time is not None and position + 1 < len(numbers):
+                bounds = self._segment_bounds(numbers[position + 1])
+                if bounds is not None and bounds[0] <= start_time:
+                    continue
+
+            path = _segment_path(self.directory, number, SEGMENT_SUFFIX)
+            try:
+                with open(path, "rb") as segment_file:
+                    if os.fstat(segment_file.fileno()).st_size < _SEGMENT_HEADER.size:
+                        continue
+                    with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                        magic, version, _ = _SEGMENT_HEADER.unpack_from(view, 0)
+                        if magic != _MAGIC or version != _VERSION:
+                            self.logger.warning(f"Skipping unrecognized journal segment {path}")
+                            continue
+
+                        offset = self._start_offset(number, start_time)
+                        while offset + _RECORD_HEADER.size <= len(view):
+                            length, timestamp, codec_id = _RECORD_HEADER.unpack_from(view, offset)
+                            if length == 0:
+                                break
+
+                            start = offset + _RECORD_HEADER.size
+                            offset = start + length
+                            if offset > len(view):
+                                self.logger.warning(f"Truncated record at the end of {path}")
+                                break
+
+                            if start_time is not None and timestamp < start_time:
+                                continue
+                            if end_time is not None and timestamp > end_time:
+                                return
+
+                            yield timestamp, _CODEC_NAMES.get(codec_id, ""), view[start:offset]
+
+            except OSError as e:
+                self.logger.error(f"Error reading journal segment {path}: {e}")
+
+    def events(self, start_time: Optional[float] = None,
+               end_time: Optional[float] = None) -> Iterator[Tuple[float, GemmaEvent]]:
+        """Yield (receive timestamp, event) for every decodable record in range"""
+        for timestamp, codec_name, payload in self.records(start_time, end_time):
+            codec = CODECS.get(codec_name)
+            if codec is None:
+                self.logger.warning(f"Skipping record encoded with unavailable codec {codec_name!r}")
+                continue
+
+            try:
+                yield timestamp, codec.decode(payload)
+            except Exception as e:
+                self.logger.warning(f"Skipping undecodable journal record: {e}")
+
+    def time_range(self) -> Optional[Tuple[float, float]]:
+        """Approximate first and last receive timestamps in the journal"""
+        numbers = list_segments(self.directory)
+        first = self._segment_bounds(numbers[0]) if numbers else None
+        last = self._segment_bounds(numbers[-1]) if numbers else None
+        if first is None or last is None:
+            return None
+        return first[0], last[1]
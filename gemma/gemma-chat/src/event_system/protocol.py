@@ -0,0 +1,266 @@
+"""Wire protocol for the Unix domain socket event bus
+
+Every message on the bus is a frame: a 4-byte big-endian payload length
+and a 1-byte frame kind, followed by the payload itself. Stream sockets do
+not preserve message boundaries, so the receiving side runs a streaming
+decoder that handles partial reads, several frames coalesced into one read,
+and payloads much larger than the socket read size.
+
+Event frames carry events encoded with the codec negotiated for the
+connection. Control frames always carry a small JSON object:
+
+    client -> manager  {"type": "hello", "name": ..., "codecs": [...],
+                        "subscriptions": [...]}
+    manager -> client  {"type": "welcome", "client_id": ..., "codec": ...,
+                        "credits": ...}
+    client -> manager  {"type": "subscribe", "event_types": [...]}
+    manager -> client  {"type": "credit", "credits": ...}
+
+Subscriptions are lists of EventType values routed to the client; null
+subscribes to every event and an empty list to none, as for producers.
+
+Events sent by clients are flow controlled with credits. The welcome grants
+an initial number of credits, each event sent consumes one, and credit
+messages return them once the manager has finished with the events.
+"""
+
+import asyncio
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# Payload length and frame kind, network byte order
+FRAME_HEADER = struct.Struct("!IB")
+
+# Frame kinds
+FRAME_EVENT = 0
+FRAME_CONTROL = 1
+
+# Payloads up to this size are joined with their header and sent in one
+# call; larger payloads are sent as-is after the header to avoid a copy.
+SMALL_FRAME_SIZE = 64 * 1024
+
+Buffer = Union[bytes, bytearray, memoryview]
+Frame = Tuple[int, Buffer]
+
+class FrameError(Exception):
+    """Raised when the peer sends a malformed or oversized frame"""
+
+async def write_frame(sock: socket.socket, parts: Union[Buffer, Sequence[Buffer]], 
+                      kind: int = FRAME_EVENT):
+    """Write a single length-prefixed frame to a non-blocking socket.
+
+    The payload may be given as a list of buffers, as produced by the
+    event codecs; small parts are coalesced and large ones are written
+    without copying.
+
+    Callers sharing a socket between tasks must serialize calls, otherwise
+    frames from different tasks can interleave on the wire.
+    """
+    if isinstance(parts, (bytes, bytearray, memoryview)):
+        parts = [parts]
+
+    loop = asyncio.get_running_loop()
+    pending = [FRAME_HEADER.pack(sum(len(part) for part in parts), kind)]
+
+    for part in parts:
+        if len(part) <= SMALL_FRAME_SIZE:
+            pending.append(part)
+            continue
+        
+        if pending:
+            await loop.sock_sendall(sock, b"".join(pending))
+        await loop.sock_sendall(sock, part)
+        pending = []
+
+    if pending:
+        await loop.sock_sendall(sock, b"".join(pending))
+
+def encode_control(message: Dict[str, Any]) -> bytes:
+    """Encode a control message payload"""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+def decode_control(payload: Buffer) -> Dict[str, Any]:
+    """Decode a control message payload"""
+    return json.loads(bytes(payload))
+
+async def write_control(sock: socket.socket, message: Dict[str, Any]):
+    """Write a control frame"""
+    await write_frame(sock, encode_control(message), FRAME_CONTROL)
+
+class FrameDecoder:
+    """Incremental decoder turning a byte stream into frame payloads"""
+
+    def __init__(self, max_frame_size: int, large_frame_size: int = SMALL_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.large_frame_size = large_frame_size
+
+        # Bytes received but not yet forming a complete frame
+        self._buffer = bytearray()
+
+        # Large frame currently being filled in place
+        self._frame_kind = FRAME_EVENT
+        self._frame: Optional[bytearray] = None
+        self._frame_view: Optional[memoryview] = None
+        self._frame_filled = 0
+
+    @property
+    def pending_view(self) -> Optional[memoryview]:
+        """Unfilled part of the large frame being received, if any.
+
+        Readers can receive straight into this view instead of going
+        through an intermediate buffer.
+        """
+        if self._frame is None:
+            return None
+        return self._frame_view[self._frame_filled:]
+
+    def advance(self, count: int) -> Optional[Frame]:
+        """Account for `count` bytes written into `pending_view`.
+
+        Returns the completed frame once the last byte has arrived.
+        """
+        self._frame_filled += count
+        if self._frame_filled < len(self._frame):
+            return None
+
+        frame = self._frame
+        self._frame_view.release()
+        self._frame = None
+        self._frame_view = None
+        self._frame_filled = 0
+        return self._frame_kind, frame
+
+    def feed(self, data: Buffer) -> List[Frame]:
+        """Feed received bytes and return every (kind, payload) frame they complete"""
+        frames: List[Frame] = []
+        data = memoryview(data)
+
+        # Finish a large frame first
+        if self._frame is not None:
+            view = self.pending_view
+            count = min(len(view), len(data))
+            view[:count] = data[:count]
+            view.release()
+            frame = self.advance(count)
+            if frame is None:
+                return frames
+            frames.append(frame)
+            data = data[count:]
+
+        self._buffer += data
+        buffer = self._buffer
+        offset = 0
+
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            length, kind = FRAME_HEADER.unpack_from(buffer, offset)
+            if length > self.max_frame_size:
+                raise FrameError(f"Frame of {length} bytes exceeds limit of {self.max_frame_size}")
+
+            start = offset + FRAME_HEADER.size
+            available = len(buffer) - start
+
+            if available >= length:
+                frames.append((kind, bytes(buffer[start:start + length])))
+                offset = start + length
+            elif length > self.large_frame_size:
+                # Allocate the full frame once and let the reader fill it in place
+                self._frame_kind = kind
+                self._frame = bytearray(length)
+                self._frame_view = memoryview(self._frame)
+                self._frame_view[:available] = buffer[start:]
+                self._frame_filled = available
+                offset = len(buffer)
+                break
+            else:
+                break
+
+        del buffer[:offset]
+        return frames
+
+    def reset(self):
+        """Drop any partially received data"""
+        self._buffer = bytearray()
+        if self._frame_view is not None:
+            self._frame_view.release()
+        self._frame = None
+        self._frame_view = None
+        self._frame_filled = 0
+
+class FrameReader:
+    """Reads frames from a non-blocking socket using a FrameDecoder"""
+
+    def __init__(self, sock: socket.socket, buffer_size: int, max_frame_size: int):
+        self.sock = sock
+        self.decoder = FrameDecoder(max_frame_size, large_frame_size=buffer_size)
+        self._scratch = bytearray(buffer_size)
+        self._scratch_view = memoryview(self._scratch)
+
+        # Frames handed back with `unread`, returned before reading again
+        self._backlog: List[Frame] = []
+
+    def unread(self, frames: List[Frame]):
+        """Hand back frames to be returned by the next read"""
+        self._backlog.extend(frames)
+
+    async def read_frames(self) -> Optional[List[Frame]]:
+        """Read from the socket and return the frames completed so far.
+
+        Returns an empty list when a read only produced part of a frame
+        and None once the peer has closed the connection.
+        """
+        if self._backlog:
+            frames, self._backlog = self._backlog, []
+            return frames
+
+        loop = asyncio.get_running_loop()
+
+        # Receive the remainder of a large frame directly into its buffer
+        pending = self.decoder.pending_view
+        if pending is not None:
+            try:
+                count = await loop.sock_recv_into(self.sock, pending)
+            finally:
+                pending.release()
+            if count == 0:
+                return None
+            frame = self.decoder.advance(count)
+            return [frame] if frame is not None else []
+
+        count = await loop.sock_recv_into(self.sock, self._scratch_view)
+        if count == 0:
+            return None
+        return self.decoder.feed(self._scratch_view[:count])
+
+async def client_handshake(sock: socket.socket, reader: FrameReader, name: str,
+                           codecs: Sequence[str], subscriptions: Optional[Sequence[str]] = None,
+                           timeout: float = 5.0) -> Dict[str, Any]:
+    """Announce a client to the event manager and wait for its welcome.
+
+    Returns the welcome message, which names the codec chosen for the
+    connection. Frames received after the welcome in the same read are
+    handed back to the reader.
+    """
+    await write_control(sock, {
+        "type": "hello",
+        "name": name,
+        "codecs": list(codecs),
+        "subscriptions": list(subscriptions) if subscriptions is not None else None
+    })
+
+    async def wait_for_welcome() -> Dict[str, Any]:
+        while True:
+            frames = await reader.read_frames()
+            if frames is None:
+                raise ConnectionError("Event manager closed the connection during handshake")
+            for index, (kind, payload) in enumerate(frames):
+                if kind != FRAME_CONTROL:
+                    raise FrameError("Received an event before the handshake completed")
+                message = decode_control(payload)
+                if message.get("type") == "welcome":
+                    # The manager may already have sent events or credits
+                    reader.unread(frames[index + 1:])
+                    return message
+
+    return await asyncio.wait_for(wait_for_welcome(), timeout=timeout)
@@ -0,0 +1,201 @@
+"""Bounded priority scheduler for the event manager"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from .event_types import EventType, GemmaEvent
+
+class _Entry:
+    """Heap entry ordered by (priority, sequence)"""
+
+    __slots__ = ("sort_key", "event", "origin", "alive")
+
+    def __init__(self, priority: int, sequence: int, event: GemmaEvent, origin: Any = None):
+        # Higher priority first, then arrival order
+        self.sort_key = (-priority, sequence)
+        self.event = event
+        self.origin = origin
+        self.alive = True
+
+    def __lt__(self, other: "_Entry") -> bool:
+        return self.sort_key < other.sort_key
+
+class EventScheduler:
+    """Priority queue of events keyed by (priority, sequence).
+
+    Consumers wait on an asyncio.Event instead of polling. The queue is
+    bounded: once `max_size` events are queued, the oldest queued event of
+    a droppable type is evicted to make room, and an incoming droppable
+    event is dropped if nothing can be evicted. Other event types are never
+    dropped, so the bound can be exceeded by them under sustained overload.
+
+    Event types in `coalesce_types` only keep their latest queued event;
+    a newer one replaces the older in place of queuing behind it.
+
+    Removed entries are marked dead and skipped when popped, which keeps
+    every operation O(log n).
+
+    Events can be tagged with an origin when queued; `on_release` is called
+    with that origin whenever an event leaves the queue, whether it was
+    handed out, dropped, evicted or coalesced. The event manager uses this
+    to return flow control credits to producers.
+    """
+
+    def __init__(self,
+                 max_size: int = 256,
+                 droppable_types: Iterable[EventType] = (),
+                 coalesce_types: Iterable[EventType] = (),
+                 on_release: Optional[Callable[[Any], None]] = None):
+        self.max_size = max_size
+        self.droppable_types = set(droppable_types)
+        self.coalesce_types = set(coalesce_types)
+        self.on_release = on_release
+        self.logger = logging.getLogger(__name__)
+
+        self._heap: List[_Entry] = []
+        self._sequence = itertools.count()
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+
+        # Droppable entries in arrival order, for eviction
+        self._droppable: Deque[_Entry] = deque()
+
+        # Latest queued entry per coalesced event type
+        self._latest: Dict[EventType, _Entry] = {}
+
+        # Statistics
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflowed = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, event: GemmaEvent, origin: Any = None) -> bool:
+        """Queue an event. Returns False if it was dropped."""
+        event_type = event.event_type
+
+        if event_type in self.coalesce_types:
+            previous = self._latest.get(event_type)
+            if previous is not None and previous.alive:
+                self._discard(previous)
+                self.coalesced += 1
+
+        if self._size >= self.max_size and not self._evict_droppable():
+            if event_type in self.droppable_types:
+                self.dropped += 1
+                self._release(origin)
+                return False
+            self.overflowed += 1
+
+        entry = _Entry(event.priority, next(self._sequence), event, origin)
+        heapq.heappush(self._heap, entry)
+        self._size += 1
+        self.enqueued += 1
+
+        if event_type in self.droppable_types:
+            self._droppable.append(entry)
+        if event_type in self.coalesce_types:
+            self._latest[event_type] = entry
+
+        self._compact()
+        self._ready.set()
+        return True
+
+    def get_nowait(self) -> Optional[GemmaEvent]:
+        """Pop the highest priority event, or None if the queue is empty"""
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if not entry.alive:
+                continue
+
+            entry.alive = False
+            self._size -= 1
+            if self._latest.get(entry.event.event_type) is entry:
+                del self._latest[entry.event.event_type]
+            self._release(entry.origin)
+            return entry.event
+
+        self._ready.clear()
+        return None
+
+    async def get(self) -> Optional[GemmaEvent]:
+        """Wait for and pop the highest priority event.
+
+        Returns None once the scheduler has been closed.
+        """
+        while not self._closed:
+            event = self.get_nowait()
+            if event is not None:
+                return event
+            await self._ready.wait()
+        return None
+
+    def close(self):
+        """Wake up waiting consumers and stop handing out events"""
+        self._closed = True
+        self._ready.set()
+
+    def clear(self):
+        """Drop every queued event"""
+        for entry in self._heap:
+            if entry.alive:
+                entry.alive = False
+                self._release(entry.origin)
+        self._heap = []
+        self._size = 0
+        self._droppable.clear()
+        self._latest.clear()
+        self._ready.clear()
+
+    def _discard(self, entry: _Entry):
+        """Mark a queued entry as removed"""
+        entry.alive = False
+        self._size -= 1
+        self._release(entry.origin)
+
+    def _release(self, origin: Any):
+        """Report that an event from `origin` left the queue"""
+        if origin is not None and self.on_release is not None:
+            try:
+                self.on_release(origin)
+            except Exception as e:
+                self.logger.error(f"Error releasing event from {origin}: {e}")
+
+    def _compact(self):
+        """Drop dead entries once they outnumber the live ones"""
+        limit = 2 * max(self._size, self.max_size)
+
+        if len(self._heap) > limit:
+            self._heap = [entry for entry in self._heap if entry.alive]
+            heapq.heapify(self._heap)
+
+        if len(self._droppable) > limit:
+            self._droppable = deque(entry for entry in self._droppable if entry.alive)
+
+    def _evict_droppable(self) -> bool:
+        """Evict the oldest queued droppable event, if any"""
+        while self._droppable:
+            entry = self._droppable.popleft()
+            if entry.alive:
+                self._discard(entry)
+                self.dropped += 1
+                return True
+        return False
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Get scheduler statistics"""
+        return {
+            'queue_size': self._size,
+            'max_size': self.max_size,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'overflowed': self.overflowed
+        }
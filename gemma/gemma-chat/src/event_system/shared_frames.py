@@ -0,0 +1,257 @@
+"""Shared-memory ring buffer for camera frames and audio payloads
+
+Producers write raw frames or PCM into fixed-size slots of a ring held in
+`multiprocessing.shared_memory`; events then carry only a small reference
+(ring name, slot, sequence number, length, dtype and shape) instead of the
+payload itself. Readers in this or another process map the same segment and
+read the slot in place.
+
+Memory layout:
+
+    ring header   magic, slot count, slot size, latest sequence
+    slot i        sequence, length, dtype, shape, then payload bytes
+
+Slots are reused round-robin, so a reference is only valid until the writer
+wraps around to its slot again. Each write clears the slot sequence before
+copying and sets it afterwards (a seqlock), which lets readers detect a
+slot that was overwritten while they were using it.
+"""
+
+import logging
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"GFRM"
+_RING_HEADER = struct.Struct("<4sIIQ")  # magic, slot count, slot size, latest sequence
+_SLOT_HEADER = struct.Struct("<QQ8s3I")  # sequence, length, dtype, shape
+_SLOT_DATA_OFFSET = 64  # Keeps payloads cache-line aligned
+
+# Rings opened by this process, so that in-process readers share the writer's mapping
+_open_rings: Dict[str, "SharedFrameRing"] = {}
+
+class SharedFrameRing:
+    """Fixed-size slot ring in shared memory"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self.buffer = shm.buf
+
+        magic, self.slot_count, self.slot_size, _ = _RING_HEADER.unpack_from(self.buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Shared memory segment {self.name} is not a frame ring")
+
+        self.slot_stride = _SLOT_DATA_OFFSET + self.slot_size
+        self.sequence = self.latest_sequence()
+
+        # Statistics
+        self.frames_written = 0
+        self.stale_reads = 0
+
+    @classmethod
+    def create(cls, name: str, slot_count: int, slot_size: int) -> "SharedFrameRing":
+        """Create a ring, replacing any stale segment left with the same name"""
+        size = _SLOT_DATA_OFFSET + slot_count * (_SLOT_DATA_OFFSET + slot_size)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        _RING_HEADER.pack_into(shm.buf, 0, _MAGIC, slot_count, slot_size, 0)
+        for slot in range(slot_count):
+            _SLOT_HEADER.pack_into(shm.buf, cls._slot_offset(slot, slot_size), 0, 0, b"", 0, 0, 0)
+
+        ring = cls(shm, owner=True)
+        _open_rings[name] = ring
+        logger.info(f"Created shared frame ring {name}: {slot_count} slots of {slot_size} bytes")
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameRing":
+        """Open an existing ring, reusing this process's mapping if there is one"""
+        ring = _open_rings.get(name)
+        if ring is not None:
+            return ring
+
+        shm = shared_memory.SharedMemory(name=name)
+        # Only the creating process may unlink the segment; without this the
+        # resource tracker of a reader process would remove it on exit.
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        ring = cls(shm, owner=False)
+        _open_rings[name] = ring
+        return ring
+
+    @staticmethod
+    def _slot_offset(slot: int, slot_size: int) -> int:
+        return _SLOT_DATA_OFFSET + slot * (_SLOT_DATA_OFFSET + slot_size)
+
+    def _slot_header_offset(self, slot: int) -> int:
+        return _SLOT_DATA_OFFSET + slot * self.slot_stride
+
+    def latest_sequence(self) -> int:
+        """Sequence number of the most recently completed write"""
+        return _RING_HEADER.unpack_from(self.buffer, 0)[3]
+
+    def write(self, data: Any) -> Dict[str, Any]:
+        """Copy a payload into the next slot and return a reference to it.
+
+        `data` may be a numpy array, whose dtype and shape are recorded so
+        readers get an array back, or any bytes-like object.
+        """
+        dtype = b"bytes"
+        shape: Tuple[int, ...] = ()
+        if NUMPY_AVAILABLE and isinstance(data, np.ndarray):
+            if len(data.shape) > 3:
+                raise ValueError(f"Arrays of more than 3 dimensions are not supported: {data.shape}")
+            data = np.ascontiguousarray(data)
+            dtype = data.dtype.str.encode("ascii")
+            shape = data.shape
+
+        payload = memoryview(data).cast("B")
+        length = len(payload)
+        if length > self.slot_size:
+            raise ValueError(f"Payload of {length} bytes does not fit slots of {self.slot_size} bytes")
+
+        self.sequence += 1
+        sequence = self.sequence
+        slot = (sequence - 1) % self.slot_count
+        header_offset = self._slot_header_offset(slot)
+        data_offset = header_offset + _SLOT_DATA_OFFSET
+        padded_shape = tuple(shape) + (0,) * (3 - len(shape))
+
+        # Invalidate the slot, copy the payload, then publish it
+        _SLOT_HEADER.pack_into(self.buffer, header_offset, 0, length, dtype, *padded_shape)
+        self.buffer[data_offset:data_offset + length] = payload
+        _SLOT_HEADER.pack_into(self.buffer, header_offset, sequence, length, dtype, *padded_shape)
+        struct.pack_into("<Q", self.buffer, _RING_HEADER.size - 8, sequence)
+
+        self.frames_written += 1
+        return {
+            'ring': self.name,
+            'slot': slot,
+            'sequence': sequence,
+            'length': length,
+            'dtype': dtype.decode("ascii"),
+            'shape': list(shape)
+        }
+
+    def is_current(self, ref: Dict[str, Any]) -> bool:
+        """Check that a referenced slot has not been overwritten"""
+        header_offset = self._slot_header_offset(ref['slot'])
+        sequence = _SLOT_HEADER.unpack_from(self.buffer, header_offset)[0]
+        return sequence == ref['sequence']
+
+    def view(self, ref: Dict[str, Any]) -> Optional[Any]:
+        """Map a referenced payload without copying.
+
+        Returns a numpy array for array payloads and a memoryview otherwise,
+        or None if the slot has already been reused. The view aliases the
+        ring, so callers that keep it must re-check `is_current` after use
+        or take a copy.
+        """
+        if not self.is_current(ref):
+            self.stale_reads += 1
+            return None
+
+        data_offset = self._slot_header_offset(ref['slot']) + _SLOT_DATA_OFFSET
+        payload = self.buffer[data_offset:data_offset + ref['length']]
+
+        if ref['dtype'] == "bytes" or not NUMPY_AVAILABLE:
+            return payload
+        return np.frombuffer(payload, dtype=np.dtype(ref['dtype'])).reshape(ref['shape'])
+
+    def copy(self, ref: Dict[str, Any]) -> Optional[Any]:
+        """Copy a referenced payload out of the ring.
+
+        Returns None if the slot was reused before or during the copy.
+        """
+        payload = self.view(ref)
+        if payload is None:
+            return None
+
+        data = payload.copy() if NUMPY_AVAILABLE and isinstance(payload, np.ndarray) else bytes(payload)
+        if not self.is_current(ref):
+            self.stale_reads += 1
+            return None
+        return data
+
+    def latest_ref(self) -> Optional[Dict[str, Any]]:
+        """Reference to the most recently written payload, if any"""
+        sequence = self.latest_sequence()
+        if sequence == 0:
+            return None
+
+        slot = (sequence - 1) % self.slot_count
+        _, length, dtype, *shape = _SLOT_HEADER.unpack_from(self.buffer, self._slot_header_offset(slot))
+        dtype = dtype.rstrip(b"\0").decode("ascii")
+        return {
+            'ring': self.name,
+            'slot': slot,
+            'sequence': sequence,
+            'length': length,
+            'dtype': dtype,
+            'shape': [dim for dim in shape if dim] if dtype != "bytes" else []
+        }
+
+    def close(self):
+        """Unmap the ring and remove it if this process created it"""
+        _open_rings.pop(self.name, None)
+        self.buffer = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            logger.warning(f"Error closing shared frame ring {self.name}: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get ring statistics"""
+        return {
+            'name': self.name,
+            'slot_count': self.slot_count,
+            'slot_size': self.slot_size,
+            'latest_sequence': self.latest_sequence(),
+            'frames_written': self.frames_written,
+            'stale_reads': self.stale_reads
+        }
+
+def resolve_frame_ref(ref: Optional[Dict[str, Any]], copy: bool = True,
+                      fallback_latest: bool = False) -> Optional[Any]:
+    """Read the payload behind a frame reference carried by an event.
+
+    With `fallback_latest`, a reference whose slot has been reused resolves
+    to the newest payload in the ring instead. Returns None if the reference
+    is missing, the ring cannot be opened, or the slot has been reused.
+    """
+    if not ref:
+        return None
+
+    try:
+        ring = SharedFrameRing.attach(ref['ring'])
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Cannot open shared frame ring {ref.get('ring')}: {e}")
+        return None
+
+    data = ring.copy(ref) if copy else ring.view(ref)
+    if data is None and fallback_latest:
+        latest = ring.latest_ref()
+        if latest is not None:
+            data = ring.copy(latest) if copy else ring.view(latest)
+    return data
@@ -0,0 +1,192 @@
+"""Latency tracing across Gemma components
+
+A trace is started where an interaction enters the system (speech, a wake
+word or typed text) and travels on `GemmaEvent.trace` through every
+component that handles it. Each component marks its stage with a wall-clock
+timestamp, so stages recorded in different processes on the same host stay
+comparable. A trace is a plain dict so that every event codec can carry it:
+
+    {"id": "3f2a...", "stages": [["sound_processor", 1718000000.12], ...]}
+
+Marking a stage also records two latencies into the process-wide
+LatencyRecorder: the time since the trace started and the time since the
+previous stage. The recorder keeps them in HDR-style histograms, which have
+bounded relative error and constant memory however many samples arrive.
+"""
+
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Keys of a trace dict
+TRACE_ID = "id"
+TRACE_STAGES = "stages"
+
+# Stages marked once per trace that the recorder remembers
+MARKED_ONCE_LIMIT = 4096
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds.
+
+    Values below `2 ** sub_bucket_bits` are counted exactly; above that each
+    power-of-two range is split into `2 ** (sub_bucket_bits - 1)` linear
+    buckets, so percentiles are accurate to about 2 ** -(sub_bucket_bits - 1)
+    relative error. Values above `2 ** max_bits` microseconds are clamped.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 6, max_bits: int = 32):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count // 2
+        self.max_value = (1 << max_bits) - 1
+        self.counts = [0] * (self.sub_bucket_count + (max_bits - sub_bucket_bits) * self.half_count)
+
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+
+    def _value(self, index: int) -> int:
+        """Midpoint of the values counted in a bucket"""
+        if index < self.sub_bucket_count:
+            return index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.half_count + 1
+        sub_bucket = offset % self.half_count + self.half_count
+        return (sub_bucket << shift) + (1 << (shift - 1))
+
+    def record(self, seconds: float):
+        """Record a latency given in seconds"""
+        value = min(max(int(seconds * 1_000_000), 0), self.max_value)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def percentile(self, percent: float) -> float:
+        """Latency in seconds at a percentile, or 0 if nothing was recorded"""
+        if self.count == 0:
+            return 0.0
+
+        target = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self._value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def reset(self):
+        """Drop every recorded value"""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def get_summary(self) -> Dict[str, float]:
+        """Count, mean, extremes and common percentiles, in seconds"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count / 1_000_000 if self.count else 0.0,
+            'min': (self.min or 0) / 1_000_000,
+            'max': self.max / 1_000_000,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+class LatencyRecorder:
+    """Per-stage latency histograms for the current process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.since_start: Dict[str, LatencyHistogram] = {}
+        self.since_previous: Dict[str, LatencyHistogram] = {}
+
+        # (trace id, stage) pairs already marked, oldest first
+        self.marked_once: "OrderedDict[Any, None]" = OrderedDict()
+
+    def first_mark(self, trace_id: str, stage: str) -> bool:
+        """Whether a stage is marked for the first time on any copy of a trace"""
+        with self.lock:
+            if (trace_id, stage) in self.marked_once:
+                return False
+            self.marked_once[(trace_id, stage)] = None
+            if len(self.marked_once) > MARKED_ONCE_LIMIT:
+                self.marked_once.popitem(last=False)
+            return True
+
+    def record(self, stage: str, since_start: float, since_previous: float):
+        """Record the latencies at which a trace reached a stage"""
+        with self.lock:
+            if stage not in self.since_start:
+                self.since_start[stage] = LatencyHistogram()
+                self.since_previous[stage] = LatencyHistogram()
+            self.since_start[stage].record(since_start)
+            self.since_previous[stage].record(since_previous)
+
+    def reset(self):
+        """Drop every recorded latency"""
+        with self.lock:
+            self.since_start.clear()
+            self.since_previous.clear()
+            self.marked_once.clear()
+
+    def get_summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Latency summaries per stage, ordered by median time since trace start"""
+        with self.lock:
+            stages = sorted(self.since_start, key=lambda stage: self.since_start[stage].percentile(50))
+            return {
+                stage: {
+                    'since_start': self.since_start[stage].get_summary(),
+                    'since_previous': self.since_previous[stage].get_summary()
+                }
+                for stage in stages
+            }
+
+_recorder = LatencyRecorder()
+
+def get_latency_recorder() -> LatencyRecorder:
+    """Get the latency recorder of this process"""
+    return _recorder
+
+def new_trace(stage: str, timestamp: Optional[float] = None) -> Dict[str, Any]:
+    """Start a trace at its first stage"""
+    return {
+        TRACE_ID: uuid.uuid4().hex,
+        TRACE_STAGES: [[stage, timestamp if timestamp is not None else time.time()]]
+    }
+
+def mark_stage(trace: Optional[Dict[str, Any]], stage: str, timestamp: Optional[float] = None,
+               once: bool = False):
+    """Add a stage timestamp to a trace and record its latencies.
+
+    Does nothing for events without a trace. With `once`, a stage is not
+    marked again if it is already present on the trace or was marked on
+    another copy of it, such as the trace of each sentence of a streamed
+    response.
+    """
+    if not trace:
+        return
+
+    stages: List[List[Any]] = trace.setdefault(TRACE_STAGES, [])
+    if once and any(name == stage for name, _ in stages):
+        return
+    if once and TRACE_ID in trace and not _recorder.first_mark(trace[TRACE_ID], stage):
+        return
+
+    timestamp = timestamp if timestamp is not None else time.time()
+    if stages:
+        _recorder.record(stage, timestamp - stages[0][1], timestamp - stages[-1][1])
+    stages.append([stage, timestamp])
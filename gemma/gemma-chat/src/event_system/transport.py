@@ -0,0 +1,211 @@
+"""Transports connecting producers and consumers to the event manager
+
+Components in their own process reach the event manager through its Unix
+domain socket: events are encoded with the negotiated codec and framed as
+described in protocol.py. Components running in the same interpreter as
+the manager skip all of that and use a local transport, which hands event
+objects to the manager and takes routed events from an in-memory queue.
+Both transports deliver the same (kind, item) pairs to their callers, with
+events already decoded and control messages as dicts, so producers and
+consumers work the same over either.
+
+A running manager registers itself by socket path, and open_transport()
+picks the local transport whenever the manager for the configured path is
+in this process.
+"""
+
+import asyncio
+import logging
+import socket
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .codecs import EventCodec, get_codec, supported_codecs
+from .event_types import GemmaEvent
+from .protocol import (FRAME_CONTROL, FRAME_EVENT, FrameReader, client_handshake,
+                       decode_control, write_control, write_frame)
+from ..config import Config
+
+if TYPE_CHECKING:
+    from .client_connection import LocalClientConnection
+    from .event_manager import EventManager
+
+logger = logging.getLogger(__name__)
+
+# Event managers running in this process, by socket path
+_local_managers: Dict[str, "EventManager"] = {}
+
+def register_local_manager(socket_path: str, manager: "EventManager"):
+    """Make a running event manager reachable without its socket"""
+    _local_managers[socket_path] = manager
+
+def unregister_local_manager(socket_path: str, manager: "EventManager"):
+    """Forget an event manager that is stopping"""
+    if _local_managers.get(socket_path) is manager:
+        del _local_managers[socket_path]
+
+def get_local_manager(socket_path: str) -> Optional["EventManager"]:
+    """Get the running event manager for a socket path in this process"""
+    manager = _local_managers.get(socket_path)
+    return manager if manager is not None and manager.running else None
+
+class EventTransport:
+    """Connection from a client to the event manager"""
+
+    name = "none"
+
+    def __init__(self):
+        self.codec_name: Optional[str] = None
+
+    async def connect(self, client_name: str, subscriptions: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Connect and return the manager's welcome message"""
+        raise NotImplementedError
+
+    async def send_event(self, event: GemmaEvent):
+        """Send an event to the manager"""
+        raise NotImplementedError
+
+    async def send_control(self, message: Dict[str, Any]):
+        """Send a control message to the manager"""
+        raise NotImplementedError
+
+    async def receive(self) -> Optional[List[Tuple[int, Any]]]:
+        """Wait for (kind, item) pairs from the manager; None once closed"""
+        raise NotImplementedError
+
+    def close(self):
+        """Close the connection"""
+        raise NotImplementedError
+
+class SocketTransport(EventTransport):
+    """Transport over the event manager's Unix domain socket"""
+
+    name = "socket"
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+        self.socket_path = config.EVENT_SOCKET_PATH
+        self.client_socket: Optional[socket.socket] = None
+        self.reader: Optional[FrameReader] = None
+        self.codec: Optional[EventCodec] = None
+
+        # Frames from concurrent senders must not interleave
+        self.send_lock = asyncio.Lock()
+
+    async def connect(self, client_name: str, subscriptions: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Connect to the socket and negotiate the event codec"""
+        self.client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client_socket.setblocking(False)
+        try:
+            await asyncio.get_running_loop().sock_connect(self.client_socket, self.socket_path)
+
+            self.reader = FrameReader(
+                self.client_socket, self.config.EVENT_BUFFER_SIZE, self.config.EVENT_MAX_FRAME_SIZE
+            )
+            welcome = await client_handshake(
+                self.client_socket, self.reader, client_name, supported_codecs(self.config.EVENT_CODECS),
+                subscriptions=subscriptions
+            )
+        except Exception:
+            self.close()
+            raise
+
+        self.codec = get_codec(welcome['codec'])
+        self.codec_name = self.codec.name
+        return welcome
+
+    async def send_event(self, event: GemmaEvent):
+        """Encode and write an event"""
+        payload = self.codec.encode(event)
+        async with self.send_lock:
+            await write_frame(self.client_socket, payload)
+
+    async def send_control(self, message: Dict[str, Any]):
+        """Write a control message"""
+        async with self.send_lock:
+            await write_control(self.client_socket, message)
+
+    async def receive(self) -> Optional[List[Tuple[int, Any]]]:
+        """Read frames and decode them"""
+        frames = await self.reader.read_frames()
+        if frames is None:
+            return None
+
+        items = []
+        for kind, payload in frames:
+            try:
+                if kind == FRAME_EVENT:
+                    items.append((kind, self.codec.decode(payload)))
+                elif kind == FRAME_CONTROL:
+                    items.append((kind, decode_control(payload)))
+            except Exception as e:
+                logger.error(f"Error decoding frame from event manager: {e}")
+        return items
+
+    def close(self):
+        """Close the socket"""
+        if self.client_socket:
+            try:
+                self.client_socket.close()
+            except OSError:
+                pass
+            self.client_socket = None
+
+class LocalTransport(EventTransport):
+    """Transport to an event manager in the same process.
+
+    Events are passed as objects, without encoding, framing or a socket
+    round trip. Each side gets its own copy of an event's data and trace so
+    that changes made after sending do not leak across, as they cannot over
+    a socket; large values such as frame buffers are shared.
+    """
+
+    name = "local"
+
+    def __init__(self, manager: "EventManager"):
+        super().__init__()
+        self.manager = manager
+        self.connection: Optional["LocalClientConnection"] = None
+        self.codec_name = "local"
+
+    async def connect(self, client_name: str, subscriptions: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Register with the manager as a local client"""
+        self.connection = self.manager.connect_local(client_name, subscriptions)
+        return {
+            'type': 'welcome',
+            'client_id': self.connection.client_id,
+            'codec': self.codec_name,
+            'credits': self.connection.credit_window
+        }
+
+    async def send_event(self, event: GemmaEvent):
+        """Hand a copy of the event to the manager"""
+        if self.connection is None or self.connection.closed:
+            raise ConnectionError("Local event manager connection is closed")
+        await self.manager.submit_local_event(self.connection.client_id, event.clone())
+
+    async def send_control(self, message: Dict[str, Any]):
+        """Pass a control message to the manager"""
+        if self.connection is None or self.connection.closed:
+            raise ConnectionError("Local event manager connection is closed")
+        self.manager.handle_local_control(self.connection.client_id, message)
+
+    async def receive(self) -> Optional[List[Tuple[int, Any]]]:
+        """Take the messages queued for this client"""
+        if self.connection is None:
+            return None
+        return await self.connection.receive()
+
+    def close(self):
+        """Leave the manager"""
+        if self.connection is not None:
+            self.manager.disconnect_local(self.connection.client_id)
+            self.connection = None
+
+def open_transport(config: Config) -> EventTransport:
+    """Choose the transport for connecting to the configured event manager"""
+    if config.EVENT_LOCAL_TRANSPORT:
+        manager = get_local_manager(config.EVENT_SOCKET_PATH)
+        if manager is not None:
+            return LocalTransport(manager)
+    return SocketTransport(config)
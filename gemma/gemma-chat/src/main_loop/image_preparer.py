@@ -0,0 +1,187 @@
+"""Camera image preparation for multimodal inference
+
+Frames reach the model interface as shared memory references (or JPEG
+bytes) on every turn, usually the same frame again or an unchanged scene.
+Preparing a frame, which means reading it out of the ring, decoding,
+downscaling to the vision input size and encoding as a base64 JPEG data
+URL, is therefore done once per frame and cached by its sequence number
+(or content hash for inline bytes).
+
+Each prepared frame also gets a perceptual hash (dHash). A frame whose
+hash is within a few bits of the image last sent to the model shows the
+same scene, so it is not sent again until `resend_interval` has passed;
+the prompt says the view is unchanged instead, which saves the request
+payload and the server's vision encoder.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ..event_system import resolve_frame_ref
+
+# dHash grid; the hash has HASH_SIZE * HASH_SIZE bits
+HASH_SIZE = 8
+
+@dataclass
+class PreparedImage:
+    """A frame ready to send to the model"""
+    key: Tuple
+    data_url: str
+    size: Tuple[int, int]
+    phash: int
+    encoded_bytes: int
+
+def perceptual_hash(image: Image.Image) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale image"""
+    pixels = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hash_distance(a: int, b: int) -> int:
+    """Number of bits in which two perceptual hashes differ"""
+    # int.bit_count needs Python 3.10
+    return bin(a ^ b).count("1")
+
+class ImagePreparer:
+    """Downscales, hashes and encodes camera frames once per frame"""
+    
+    def __init__(self,
+                 target_size: int = 768,
+                 jpeg_quality: int = 85,
+                 unchanged_distance: int = 4,
+                 resend_interval: float = 60.0,
+                 cache_size: int = 16):
+        self.target_size = target_size
+        self.jpeg_quality = jpeg_quality
+        self.unchanged_distance = unchanged_distance
+        self.resend_interval = resend_interval
+        self.cache_size = cache_size
+        self.logger = logging.getLogger(__name__)
+        
+        # Prepared frames by frame key, least recently used first
+        self.cache: "OrderedDict[Tuple, PreparedImage]" = OrderedDict()
+        
+        # Image the model saw last
+        self.last_sent_hash: Optional[int] = None
+        self.last_sent_time = 0.0
+        
+        # Statistics
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.images_sent = 0
+        self.images_skipped = 0
+        self.prepare_times = deque(maxlen=100)
+        self.encoded_sizes = deque(maxlen=100)
+    
+    def _frame_key(self, image_data: Any) -> Optional[Tuple]:
+        """Cache key of a frame: its ring sequence, or a hash of its content"""
+        if isinstance(image_data, dict):
+            return ('ref', image_data.get('ring'), image_data.get('sequence'))
+        if isinstance(image_data, np.ndarray):
+            return ('array', image_data.shape, hashlib.blake2b(np.ascontiguousarray(image_data), digest_size=16).digest())
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            return ('bytes', hashlib.blake2b(image_data, digest_size=16).digest())
+        return None
+    
+    def prepare(self, image_data: Any) -> Optional[PreparedImage]:
+        """Prepared form of a frame reference, raw BGR frame or encoded image"""
+        key = self._frame_key(image_data)
+        if key is None:
+            return None
+        
+        prepared = self.cache.get(key)
+        if prepared is not None:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return prepared
+        
+        self.cache_misses += 1
+        start_time = time.time()
+        try:
+            image = self._load(image_data)
+            if image is None:
+                return None
+            
+            # Downscale once to the vision input size, keeping the aspect ratio
+            image.thumbnail((self.target_size, self.target_size), Image.BILINEAR)
+            
+            buffered = io.BytesIO()
+            image.save(buffered, format="JPEG", quality=self.jpeg_quality)
+            encoded = buffered.getvalue()
+            prepared = PreparedImage(
+                key=key,
+                data_url=f"data:image/jpeg;base64,{base64.b64encode(encoded).decode()}",
+                size=image.size,
+                phash=perceptual_hash(image),
+                encoded_bytes=len(encoded)
+            )
+        
+        except Exception as e:
+            self.logger.error(f"Error preparing image: {e}")
+            return None
+        
+        self.cache[key] = prepared
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        
+        self.prepare_times.append(time.time() - start_time)
+        self.encoded_sizes.append(prepared.encoded_bytes)
+        return prepared
+    
+    def _load(self, image_data: Any) -> Optional[Image.Image]:
+        """Decode a frame into an RGB image"""
+        if isinstance(image_data, dict):
+            # Newest frame if the referenced slot has been reused
+            image_data = resolve_frame_ref(image_data, fallback_latest=True)
+            if image_data is None:
+                return None
+        
+        if isinstance(image_data, np.ndarray):
+            return Image.fromarray(np.ascontiguousarray(image_data[..., ::-1]))
+        
+        image = Image.open(io.BytesIO(image_data))
+        # JPEG can decode straight at a reduced scale
+        image.draft("RGB", (self.target_size, self.target_size))
+        return image.convert("RGB")
+    
+    def should_send(self, prepared: PreparedImage) -> bool:
+        """Whether the model needs the image, or has just seen the same scene"""
+        now = time.time()
+        if (self.last_sent_hash is not None
+                and hash_distance(prepared.phash, self.last_sent_hash) <= self.unchanged_distance
+                and now - self.last_sent_time < self.resend_interval):
+            self.images_skipped += 1
+            return False
+        
+        self.last_sent_hash = prepared.phash
+        self.last_sent_time = now
+        self.images_sent += 1
+        return True
+    
+    def forget_sent(self):
+        """Send the next image whatever it shows, e.g. after the history was cleared"""
+        self.last_sent_hash = None
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get image preparation statistics"""
+        avg_prepare_time = sum(self.prepare_times) / len(self.prepare_times) if self.prepare_times else 0
+        avg_encoded_bytes = sum(self.encoded_sizes) / len(self.encoded_sizes) if self.encoded_sizes else 0
+        return {
+            'target_size': self.target_size,
+            'cached_images': len(self.cache),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'images_sent': self.images_sent,
+            'images_skipped': self.images_skipped,
+            'avg_prepare_time': avg_prepare_time,
+            'avg_encoded_bytes': avg_encoded_bytes
+        }
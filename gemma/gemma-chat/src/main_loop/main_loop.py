@@ -3,12 +3,13 @@
 import asyncio
 import logging
 import time
+from collections import deque
 from typing import Dict, Any, Optional, List
 import numpy as np
 
 from .model_interface import ModelInterface
 from .response_processor import ResponseProcessor
-from ..event_system import EventConsumer, EventManager, EventType, GemmaEvent
+from ..event_system import EventConsumer, EventManager, EventType, GemmaEvent, mark_stage, resolve_frame_ref
 from ..memory_system import MemoryManager
 from ..config import Config
 
@@ -29,11 +30,12 @@ class MainLoop:
         self.running = False
         self.processing_active = False
         
-        # Current multimodal input
+        # Current multimodal input (image and audio may be shared memory references)
         self.current_text = None
         self.current_image = None
         self.current_audio = None
         self.current_context = {}
+        self.current_trace: Optional[Dict[str, Any]] = None  # Trace of the triggering input
         
         # Event handling
         self.pending_events = []
@@ -43,7 +45,7 @@ class MainLoop:
         # Performance tracking
         self.total_inferences = 0
         self.total_processing_time = 0
-        self.response_times = []
+        self.response_times = deque(maxlen=100)
         
         # State tracking
         self.wake_word_active = False
@@ -152,17 +154,21 @@ class MainLoop:
     def _update_current_state(self, events: List[GemmaEvent]):
         """Update current multimodal state based on events"""
         for event in events:
+            if event.trace:
+                event.mark("main_loop")
+                self.current_trace = event.trace
+            
             if event.event_type == EventType.TEXT_INPUT:
                 self.current_text = event.data.get('text')
                 self.current_context['text_timestamp'] = event.timestamp
                 
             elif event.event_type == EventType.CAMERA_FRAME:
-                self.current_image = event.data.get('frame_data')
+                self.current_image = event.data.get('frame_ref') or event.data.get('frame_data')
                 self.current_context['camera_timestamp'] = event.timestamp
                 self.current_context['detections'] = event.data.get('detections', [])
                 
             elif event.event_type == EventType.SPEECH_DETECTED:
-                self.current_audio = event.data.get('audio_data')
+                self.current_audio = event.data.get('audio_ref') or event.data.get('audio_data')
                 self.current_context['audio_timestamp'] = event.timestamp
                 self.current_context['speech_confidence'] = event.data.get('confidence', 0)
                 
@@ -209,22 +215,44 @@ class MainLoop:
             context = self.current_context.copy()
             context['wake_word_active'] = self.wake_word_active
             context['speech_active'] = self.speech_active
+            trace = self.current_trace
             
             # Get memory context if we have text input
             if self.current_text:
                 memory_context = await self.memory_manager.get_memory_context(self.current_text, context)
                 context.update(memory_context)
+                mark_stage(trace, "memory_context")
+            
+            # Read shared memory payloads only now that they are needed; the
+            # model interface reads a camera frame only if it has not
+            # prepared that frame already
+            image_data = self.current_image
+            audio_data = self._resolve_payload(self.current_audio)
             
-            # Generate response
-            response = await self.model_interface.process_multimodal_input(
-                text_input=self.current_text,
-                image_data=self.current_image,
-                audio_data=self.current_audio,
-                context=context
-            )
+            if self.model_interface.stream_responses:
+                # Generate and process the response together, so speech
+                # starts before generation has finished
+                deltas = self.model_interface.stream_multimodal_input(
+                    text_input=self.current_text,
+                    image_data=image_data,
+                    audio_data=audio_data,
+                    context=context,
+                    trace=trace
+                )
+                result = await self.response_processor.process_stream(deltas, context, trace=trace)
+                response = result['original_response']
+            else:
+                # Generate response
+                response = await self.model_interface.process_multimodal_input(
+                    text_input=self.current_text,
+                    image_data=image_data,
+                    audio_data=audio_data,
+                    context=context,
+                    trace=trace
+                )
             
-            # Process response
-            await self.response_processor.process_response(response, context)
+                # Process response
+                await self.response_processor.process_response(response, context, trace=trace)
             
             # Process conversation for memory
             if self.current_text:
@@ -238,9 +266,6 @@ class MainLoop:
             self.total_processing_time += inference_time
             self.response_times.append(inference_time)
             
-            if len(self.response_times) > 100:
-                self.response_times.pop(0)
-            
             self.logger.info(f"Inference completed in {inference_time:.2f}s")
             
             # Reset state
@@ -250,10 +275,21 @@ class MainLoop:
             self.logger.error(f"Error in inference: {e}")
             self._reset_current_state()
     
+    def _resolve_payload(self, payload: Any) -> Any:
+        """Copy a shared memory payload out of its ring; inline payloads pass through"""
+        if not isinstance(payload, dict):
+            return payload
+        
+        data = resolve_frame_ref(payload)
+        if data is None:
+            self.logger.debug(f"Shared payload from {payload.get('ring')} is no longer available")
+        return data
+    
     def _reset_current_state(self):
         """Reset current multimodal state after processing"""
         self.current_text = None
         self.current_audio = None
+        self.current_trace = None
         # Keep image for context but mark as processed
         self.current_context.pop('text_timestamp', None)
         self.current_context.pop('audio_timestamp', None)
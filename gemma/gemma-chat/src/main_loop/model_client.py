@@ -0,0 +1,221 @@
+"""Managed HTTP client for the model API
+
+Each configured backend (the API URL and an optional fallback) gets its
+own long-lived aiohttp session with a tuned connector: pooled keep-alive
+connections and cached DNS lookups, or a Unix socket connector for a
+server on the same host (`unix:///path/to/socket`).
+
+Backend health is tracked with a circuit breaker. A background prober
+checks `/health` on every backend, and failed requests count as well:
+after `failure_threshold` consecutive failures the circuit opens and
+requests skip the backend until a probe succeeds again. Requests never
+wait for a health check; they go to the first backend whose circuit is
+closed and fail over to the next one at once if the connection fails.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+UNIX_SCHEME = "unix://"
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"  # Requests are sent
+CIRCUIT_OPEN = "open"      # Requests skip the backend until a probe succeeds
+
+class ModelUnavailableError(Exception):
+    """Raised when no model backend can take a request"""
+
+class ModelBackend:
+    """One model server with its connection pool and circuit breaker"""
+    
+    def __init__(self, url: str, max_connections: int, failure_threshold: int):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.max_connections = max_connections
+        self.session: Optional[aiohttp.ClientSession] = None
+        
+        # Requests to a Unix socket still need an HTTP URL
+        if url.startswith(UNIX_SCHEME):
+            self.socket_path = url[len(UNIX_SCHEME):]
+            self.base_url = "http://localhost"
+        else:
+            self.socket_path = None
+            self.base_url = url.rstrip("/")
+        
+        # Circuit breaker
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        
+        # Statistics
+        self.requests = 0
+        self.failures = 0
+        self.health_latency = 0.0
+    
+    def open_session(self):
+        """Create the session and its connection pool"""
+        if self.socket_path:
+            connector = aiohttp.UnixConnector(path=self.socket_path, limit=self.max_connections,
+                                              keepalive_timeout=60)
+        else:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60,
+                                             ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector)
+    
+    @property
+    def available(self) -> bool:
+        """Whether requests may be sent to this backend"""
+        return self.state == CIRCUIT_CLOSED
+    
+    def record_success(self):
+        """Close the circuit after a successful request or probe"""
+        self.consecutive_failures = 0
+        self.state = CIRCUIT_CLOSED
+    
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if it opened the circuit"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == CIRCUIT_CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.time()
+            return True
+        return False
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get backend statistics"""
+        return {
+            'url': self.url,
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened_at': self.opened_at,
+            'requests': self.requests,
+            'failures': self.failures,
+            'health_latency': self.health_latency
+        }
+
+class ModelClient:
+    """HTTP client that spreads model requests over healthy backends"""
+    
+    def __init__(self,
+                 urls: List[str],
+                 max_connections: int = 8,
+                 health_interval: float = 5.0,
+                 health_timeout: float = 2.0,
+                 failure_threshold: int = 3):
+        self.backends = [ModelBackend(url, max_connections, failure_threshold) for url in urls if url]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.logger = logging.getLogger(__name__)
+        
+        self.started = False
+        self.prober_task: Optional[asyncio.Task] = None
+        
+        # Statistics
+        self.failovers = 0
+    
+    @property
+    def healthy(self) -> bool:
+        """Whether any backend can take requests"""
+        return any(backend.available for backend in self.backends)
+    
+    async def start(self):
+        """Open the sessions and start probing; returns at once"""
+        if self.started:
+            return
+        self.started = True
+        for backend in self.backends:
+            backend.open_session()
+        self.prober_task = asyncio.create_task(self._probe_loop())
+    
+    async def close(self):
+        """Stop probing and close the sessions"""
+        if self.prober_task is not None:
+            self.prober_task.cancel()
+            self.prober_task = None
+        for backend in self.backends:
+            if backend.session is not None:
+                await backend.session.close()
+                backend.session = None
+        self.started = False
+    
+    async def _probe_loop(self):
+        """Check the health of every backend periodically"""
+        while True:
+            try:
+                await asyncio.gather(*(self._probe(backend) for backend in self.backends))
+                await asyncio.sleep(self.health_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error in health prober: {e}")
+                await asyncio.sleep(self.health_interval)
+    
+    async def _probe(self, backend: ModelBackend):
+        """Check one backend's health and update its circuit"""
+        start_time = time.time()
+        try:
+            async with backend.session.get(f"{backend.base_url}/health",
+                                           timeout=aiohttp.ClientTimeout(total=self.health_timeout)) as response:
+                healthy = response.status == 200
+        except Exception:
+            healthy = False
+        backend.health_latency = time.time() - start_time
+        
+        if healthy:
+            if not backend.available:
+                self.logger.info(f"Model API at {backend.url} is healthy again")
+            backend.record_success()
+        elif backend.record_failure():
+            self.logger.warning(f"Model API at {backend.url} is unavailable")
+    
+    async def post(self, path: str, **kwargs) -> aiohttp.ClientResponse:
+        """POST to the first available backend, failing over on connection errors.
+        
+        Returns once the response headers arrive; use the response as an
+        async context manager to release its connection. Raises
+        ModelUnavailableError if no backend could be reached.
+        """
+        await self.start()
+        
+        candidates = [backend for backend in self.backends if backend.available]
+        last_error: Optional[Exception] = None
+        for index, backend in enumerate(candidates):
+            if index > 0:
+                self.failovers += 1
+            backend.requests += 1
+            try:
+                response = await backend.session.post(f"{backend.base_url}{path}", **kwargs)
+            except aiohttp.ClientConnectionError as e:
+                last_error = e
+                if backend.record_failure():
+                    self.logger.warning(f"Model API at {backend.url} is unavailable")
+                continue
+            except asyncio.TimeoutError:
+                backend.record_failure()
+                raise
+            
+            # Server errors go to the next backend if there is one
+            if response.status >= 500:
+                backend.record_failure()
+                if index < len(candidates) - 1:
+                    self.logger.warning(f"Model API at {backend.url} failed with {response.status}, failing over")
+                    response.release()
+                    continue
+            else:
+                backend.record_success()
+            return response
+        
+        raise ModelUnavailableError(f"No model API available: {last_error}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get client statistics"""
+        return {
+            'healthy': self.healthy,
+            'failovers': self.failovers,
+            'backends': [backend.get_statistics() for backend in self.backends]
+        }
@@ -2,14 +2,16 @@
 
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
 import time
-import base64
-import io
 import json
-from PIL import Image
-import aiohttp
+import numpy as np
 
+from .image_preparer import ImagePreparer, PreparedImage
+from .model_client import ModelClient, ModelUnavailableError
+from .prompt_builder import PromptBuilder, TokenCounter
+from ..event_system import mark_stage
 from ..config import Config
 
 class ModelInterface:
@@ -25,43 +27,54 @@ class ModelInterface:
         self.max_history = getattr(config, 'MAX_HISTORY', 10)
         self.max_new_tokens = getattr(config, 'MAX_NEW_TOKENS', 100)
         self.temperature = getattr(config, 'TEMPERATURE', 0.7)
+        self.stream_responses = getattr(config, 'STREAM_RESPONSES', True)
         
-        # HTTP session for API calls
-        self.session = None
+        # HTTP client for API calls, with failover to a second server
+        self.client = ModelClient(
+            [self.api_url, getattr(config, 'API_FALLBACK_URL', '')],
+            max_connections=getattr(config, 'API_MAX_CONNECTIONS', 8),
+            health_interval=getattr(config, 'API_HEALTH_INTERVAL', 5.0),
+            failure_threshold=getattr(config, 'API_FAILURE_THRESHOLD', 3)
+        )
         
-        # Conversation history
-        self.conversation_history: List[Dict[str, Any]] = []
+        # Conversation history, kept within a token budget
         self.system_prompt = self._get_system_prompt()
+        self.prompt_builder = PromptBuilder(
+            self.system_prompt,
+            TokenCounter(getattr(config, 'TOKENIZER_NAME', None),
+                         cache_dir=getattr(config, 'MODEL_CACHE_DIR', './models')),
+            token_budget=getattr(config, 'PROMPT_TOKEN_BUDGET', 4096),
+            response_budget=self.max_new_tokens,
+            summary_budget=getattr(config, 'PROMPT_SUMMARY_TOKENS', 256),
+            context_budget=getattr(config, 'PROMPT_CONTEXT_TOKENS', 512),
+            max_messages=self.max_history * 2
+        )
+        
+        # Camera frames, downscaled and encoded once per frame
+        self.image_preparer = ImagePreparer(
+            target_size=getattr(config, 'VISION_INPUT_SIZE', 768),
+            jpeg_quality=getattr(config, 'VISION_JPEG_QUALITY', 85),
+            unchanged_distance=getattr(config, 'VISION_UNCHANGED_DISTANCE', 4),
+            resend_interval=getattr(config, 'VISION_RESEND_INTERVAL', 60.0)
+        )
         
         # Performance tracking
         self.inference_count = 0
         self.total_inference_time = 0
         self.last_inference_time = 0
-        
-        # API health status
-        self.api_healthy = False
-    
-    async def _initialize_session(self):
-        """Initialize HTTP session and check API health"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        
-        try:
-            async with self.session.get(f"{self.api_url}/health", timeout=5) as response:
-                if response.status == 200:
-                    self.api_healthy = True
-                    self.logger.info(f"Connected to API at {self.api_url}")
-                else:
-                    self.api_healthy = False
-                    self.logger.warning(f"API health check failed: {response.status}")
-        except Exception as e:
-            self.api_healthy = False
-            self.logger.error(f"Failed to connect to API: {e}")
-    
-    async def _ensure_session(self):
-        """Ensure HTTP session is initialized"""
-        if self.session is None or not self.api_healthy:
-            await self._initialize_session()
+        self.streamed_responses = 0
+        self.first_token_times = deque(maxlen=100)
+        self.prompt_tokens = deque(maxlen=100)
+        
+    @property
+    def conversation_history(self) -> List[Dict[str, Any]]:
+        """Messages kept for the next prompts"""
+        return self.prompt_builder.history
+        
+    @property
+    def api_healthy(self) -> bool:
+        """Whether a model server is available, as last seen by the client"""
+        return self.client.healthy
     
     def _get_system_prompt(self) -> str:
         """Get system prompt for Gemma"""
@@ -84,9 +97,10 @@ Current capabilities:
     
     async def process_multimodal_input(self, 
                                      text_input: Optional[str] = None,
-                                     image_data: Optional[bytes] = None,
-                                     audio_data: Optional[bytes] = None,
-                                     context: Optional[Dict[str, Any]] = None) -> str:
+                                     image_data: Optional[Union[bytes, np.ndarray, Dict[str, Any]]] = None,
+                                     audio_data: Optional[Union[bytes, np.ndarray]] = None,
+                                     context: Optional[Dict[str, Any]] = None,
+                                     trace: Optional[Dict[str, Any]] = None) -> str:
         """Process multimodal input and generate response"""
         start_time = time.time()
         
@@ -95,7 +109,9 @@ Current capabilities:
             input_data = self._prepare_input(text_input, image_data, audio_data, context)
             
             # Generate response
+            mark_stage(trace, "model_request")
             response = await self._generate_response(input_data)
+            mark_stage(trace, "model_response")
             
             # Update conversation history
             self._update_conversation_history(input_data, response)
@@ -114,8 +130,55 @@ Current capabilities:
             self.logger.error(f"Error in multimodal processing: {e}")
             return "I apologize, but I encountered an error processing your request."
     
-    def _prepare_input(self, text_input: Optional[str], image_data: Optional[bytes], 
-                      audio_data: Optional[bytes], context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    async def stream_multimodal_input(self,
+                                      text_input: Optional[str] = None,
+                                      image_data: Optional[Union[bytes, np.ndarray, Dict[str, Any]]] = None,
+                                      audio_data: Optional[Union[bytes, np.ndarray]] = None,
+                                      context: Optional[Dict[str, Any]] = None,
+                                      trace: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Process multimodal input and yield the response text as it is generated"""
+        start_time = time.time()
+        chunks = []
+        input_data = None
+        
+        try:
+            # Prepare input
+            input_data = self._prepare_input(text_input, image_data, audio_data, context)
+            
+            # Stream response
+            mark_stage(trace, "model_request")
+            async for delta in self._generate_response_stream(input_data):
+                if not chunks:
+                    mark_stage(trace, "model_first_token")
+                    self.first_token_times.append(time.time() - start_time)
+                chunks.append(delta)
+                yield delta
+            mark_stage(trace, "model_response")
+            
+        except Exception as e:
+            self.logger.error(f"Error in multimodal streaming: {e}")
+            if not chunks:
+                message = "I apologize, but I encountered an error processing your request."
+                chunks.append(message)
+                yield message
+        
+        finally:
+            # Update conversation history with whatever was generated
+            if input_data is not None and chunks:
+                self._update_conversation_history(input_data, "".join(chunks).strip())
+            
+            # Track performance
+            inference_time = time.time() - start_time
+            self.inference_count += 1
+            self.streamed_responses += 1
+            self.total_inference_time += inference_time
+            self.last_inference_time = inference_time
+            
+            self.logger.debug(f"Streamed response in {inference_time:.2f}s")
+    
+    def _prepare_input(self, text_input: Optional[str], image_data: Optional[Union[bytes, np.ndarray, Dict[str, Any]]], 
+                      audio_data: Optional[Union[bytes, np.ndarray]],
+                      context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         """Prepare multimodal input for the model"""
         input_data = {
             'text': text_input or "",
@@ -125,50 +188,38 @@ Current capabilities:
             'timestamp': time.time()
         }
         
-        # Process image data
-        if image_data:
-            try:
-                image = Image.open(io.BytesIO(image_data))
-                input_data['image'] = image
-                input_data['image_description'] = self._describe_image(image)
-            except Exception as e:
-                self.logger.error(f"Error processing image: {e}")
+        # Process image data: shared memory frame references, raw BGR frames or encoded bytes
+        if image_data is not None and len(image_data) > 0:
+            prepared = self.image_preparer.prepare(image_data)
+            if prepared is not None:
+                # An unchanged scene is not sent to the model again
+                if self.image_preparer.should_send(prepared):
+                    input_data['image'] = prepared
+                    input_data['image_description'] = self._describe_image(prepared)
+                else:
+                    input_data['image_unchanged'] = True
         
         # Process audio data
-        if audio_data:
+        if audio_data is not None and len(audio_data) > 0:
             input_data['audio'] = audio_data
             input_data['audio_description'] = "Audio input received"
         
         return input_data
     
-    def _describe_image(self, image: Image.Image) -> str:
+    def _describe_image(self, image: PreparedImage) -> str:
         """Basic image description (placeholder)"""
         # In a real implementation, this would use vision capabilities
         return f"Image of size {image.size[0]}x{image.size[1]}"
     
     async def _generate_response(self, input_data: Dict[str, Any]) -> str:
         """Generate response from input data using OpenAI API"""
-        await self._ensure_session()
-        
-        if not self.api_healthy:
-            return self._mock_response(input_data)
-        
         try:
-            # Build messages for OpenAI API format
-            messages = self._build_openai_messages(input_data)
-            
             # Prepare API request
-            payload = {
-                "model": self.model_name,
-                "messages": messages,
-                "max_new_tokens": self.max_new_tokens,
-                "temperature": self.temperature,
-                "stream": False
-            }
+            payload = self._build_payload(input_data, stream=False)
             
             # Make API request
-            async with self.session.post(
-                f"{self.api_url}/v1/chat/completions",
+            async with await self.client.post(
+                "/v1/chat/completions",
                 json=payload,
                 timeout=30
             ) as response:
@@ -185,6 +236,9 @@ Current capabilities:
                     self.logger.error(f"API request failed: {response.status} - {error_text}")
                     return "I apologize, but I'm having trouble connecting to the model right now."
             
+        except ModelUnavailableError as e:
+            self.logger.debug(f"{e}, using mock response")
+            return self._mock_response(input_data)
         except asyncio.TimeoutError:
             self.logger.error("API request timed out")
             return "I apologize, but the response is taking too long. Please try again."
@@ -192,6 +246,77 @@ Current capabilities:
             self.logger.error(f"Error calling API: {e}")
             return "I apologize, but I encountered an error processing your request."
     
+    async def _generate_response_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Generate response from input data as a stream of text deltas"""
+        streamed = False
+        try:
+            # Prepare API request
+            payload = self._build_payload(input_data, stream=True)
+            
+            # Make API request and read server-sent events as they arrive
+            try:
+                response = await self.client.post("/v1/chat/completions", json=payload, timeout=30)
+            except ModelUnavailableError as e:
+                self.logger.debug(f"{e}, using mock response")
+                yield self._mock_response(input_data)
+                return
+            
+            async with response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"API request failed: {response.status} - {error_text}")
+                    yield "I apologize, but I'm having trouble connecting to the model right now."
+                    return
+                
+                async for delta in self._iter_sse_deltas(response.content):
+                    streamed = True
+                    yield delta
+            
+            if not streamed:
+                self.logger.warning("No content in streamed API response")
+                yield "I apologize, but I didn't receive a proper response."
+            
+        except asyncio.TimeoutError:
+            self.logger.error("API request timed out")
+            if not streamed:
+                yield "I apologize, but the response is taking too long. Please try again."
+        except Exception as e:
+            self.logger.error(f"Error calling API: {e}")
+            if not streamed:
+                yield "I apologize, but I encountered an error processing your request."
+    
+    async def _iter_sse_deltas(self, lines: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Yield the content deltas of an OpenAI-style server-sent event stream"""
+        async for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue  # Blank separators, comments and other fields
+            
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                self.logger.warning(f"Skipping malformed stream chunk: {data[:100]!r}")
+                continue
+            
+            for choice in chunk.get('choices') or []:
+                content = (choice.get('delta') or {}).get('content')
+                if content:
+                    yield content
+    
+    def _build_payload(self, input_data: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        """Build the chat completion request body"""
+        return {
+            "model": self.model_name,
+            "messages": self._build_openai_messages(input_data),
+            "max_new_tokens": self.max_new_tokens,
+            "temperature": self.temperature,
+            "stream": stream
+        }
+    
     def _mock_response(self, input_data: Dict[str, Any]) -> str:
         """Mock response for testing"""
         text = input_data.get('text', '')
@@ -223,30 +348,22 @@ Current capabilities:
         return random.choice(responses)
     
     def _build_openai_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Build messages array for OpenAI API format"""
-        messages = []
-        
-        # Add system message with context
-        system_content = self._build_system_content(input_data)
-        messages.append({"role": "system", "content": system_content})
-        
-        # Add recent conversation history
-        for msg in self.conversation_history[-5:]:  # Last 5 messages
-            if msg['type'] == 'user':
-                messages.append({"role": "user", "content": msg['content']})
-            elif msg['type'] == 'assistant':
-                messages.append({"role": "assistant", "content": msg['content']})
-        
-        # Add current user input
-        user_content = self._build_user_content(input_data)
-        if user_content:
-            messages.append({"role": "user", "content": user_content})
-        
+        """Build messages array for OpenAI API format.
+        
+        The system prompt, summary and history come first and stay the same
+        across turns; this turn's context goes with the current input.
+        """
+        self.prompt_builder.counter.load_in_background()
+        messages = self.prompt_builder.build(
+            self._build_user_content(input_data),
+            self._build_context_lines(input_data)
+        )
+        self.prompt_tokens.append(self.prompt_builder.last_prompt_tokens)
         return messages
     
-    def _build_system_content(self, input_data: Dict[str, Any]) -> str:
-        """Build system message content with context"""
-        content_parts = [self.system_prompt]
+    def _build_context_lines(self, input_data: Dict[str, Any]) -> List[str]:
+        """Build the volatile context of this turn, most important first"""
+        content_parts = []
         
         # Add memory context if available
         context = input_data.get('context', {})
@@ -260,11 +377,6 @@ Current capabilities:
             for fact in context['important_facts']:
                 content_parts.append(f"- {fact}")
         
-        if context.get('long_term_facts'):
-            content_parts.append("\nRelevant long-term memories:")
-            for fact in context['long_term_facts']:
-                content_parts.append(f"- {fact}")
-        
         # Add current multimodal input context
         if context.get('wake_word_active'):
             content_parts.append(f"\nNote: User activated with wake word '{context.get('wake_word', 'unknown')}'")
@@ -274,7 +386,7 @@ Current capabilities:
             if detected_objects:
                 content_parts.append(f"Currently visible: {', '.join(detected_objects)}")
         
-        return "\n".join(content_parts)
+        return content_parts
     
     def _build_user_content(self, input_data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
         """Build user message content for multimodal input"""
@@ -284,21 +396,14 @@ Current capabilities:
         if input_data.get('text'):
             content.append({"type": "text", "text": input_data['text']})
         
-        # Add image content if available
+        # Add image content if available, already encoded by the image preparer
         if input_data.get('image'):
-            try:
-                # Convert PIL Image to base64
-                buffered = io.BytesIO()
-                input_data['image'].save(buffered, format="JPEG")
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
-                content.append({
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_str}"}
-                })
-            except Exception as e:
-                self.logger.error(f"Error encoding image: {e}")
-                content.append({"type": "text", "text": "[Image could not be processed]"})
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": input_data['image'].data_url}
+            })
+        elif input_data.get('image_unchanged'):
+            content.append({"type": "text", "text": "[Camera view unchanged since the last image]"})
         
         # Add audio description if available
         if input_data.get('audio_description'):
@@ -317,23 +422,8 @@ Current capabilities:
         if input_data.get('audio'):
             user_content.append("[AUDIO]")
         
-        if user_content:
-            self.conversation_history.append({
-                'type': 'user',
-                'content': ' | '.join(user_content),
-                'timestamp': input_data['timestamp']
-            })
-        
-        # Add assistant response
-        self.conversation_history.append({
-            'type': 'assistant',
-            'content': response,
-            'timestamp': time.time()
-        })
-        
-        # Trim history
-        if len(self.conversation_history) > self.max_history * 2:
-            self.conversation_history = self.conversation_history[-self.max_history * 2:]
+        # Add the exchange; old turns move into the summary once over budget
+        self.prompt_builder.add_turn(' | '.join(user_content), response, input_data['timestamp'])
     
     def get_conversation_history(self) -> List[Dict[str, Any]]:
         """Get conversation history"""
@@ -341,30 +431,41 @@ Current capabilities:
     
     def clear_conversation_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.prompt_builder.clear()
+        self.image_preparer.forget_sent()
         self.logger.info("Conversation history cleared")
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get model interface statistics"""
         avg_inference_time = (self.total_inference_time / self.inference_count 
                              if self.inference_count > 0 else 0)
+        avg_first_token_time = (sum(self.first_token_times) / len(self.first_token_times)
+                                if self.first_token_times else 0)
+        avg_prompt_tokens = (sum(self.prompt_tokens) / len(self.prompt_tokens)
+                             if self.prompt_tokens else 0)
         
         return {
             'model_name': self.model_name,
             'api_url': self.api_url,
             'api_healthy': self.api_healthy,
+            'api_client': self.client.get_statistics(),
             'inference_count': self.inference_count,
             'total_inference_time': self.total_inference_time,
             'avg_inference_time': avg_inference_time,
             'last_inference_time': self.last_inference_time,
+            'stream_responses': self.stream_responses,
+            'streamed_responses': self.streamed_responses,
+            'avg_first_token_time': avg_first_token_time,
             'conversation_length': len(self.conversation_history),
             'max_history': self.max_history,
+            'last_prompt_tokens': self.prompt_tokens[-1] if self.prompt_tokens else 0,
+            'avg_prompt_tokens': avg_prompt_tokens,
+            'prompt': self.prompt_builder.get_statistics(),
+            'images': self.image_preparer.get_statistics(),
             'max_new_tokens': self.max_new_tokens,
             'temperature': self.temperature
         }
     
     async def cleanup(self):
         """Cleanup resources"""
-        if self.session:
-            await self.session.close()
-            self.session = None
\ No newline at end of file
+        await self.client.close()
\ No newline at end of file
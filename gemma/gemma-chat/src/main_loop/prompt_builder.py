@@ -0,0 +1,240 @@
+"""Token-budgeted prompt layout for the model API
+
+Prompts are laid out so that as much as possible stays identical from
+turn to turn, letting servers with prefix caching (vLLM, SGLang) reuse
+the KV cache of everything before the first change:
+
+    system prompt              never changes
+    summary of earlier turns   changes only when turns are evicted
+    recent turns               only grows until turns are evicted
+    current user message       volatile context (memory facts,
+                               detections), then the input
+
+History is trimmed by tokens, not messages. When it outgrows its budget
+the oldest turns are evicted until it is back under a fraction of the
+budget, and they are folded into the summary, so the prefix changes once
+every several turns instead of on every turn.
+"""
+
+import asyncio
+import logging
+import math
+import textwrap
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+try:
+    from transformers import AutoTokenizer
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+MESSAGE_OVERHEAD = 4  # Role and turn markers per message
+IMAGE_TOKENS = 256  # Tokens the model spends on an image
+CHARS_PER_TOKEN = 4  # Estimate when no tokenizer is available
+SUMMARY_LINE_WIDTH = 120  # Characters kept of each summarized message
+
+class TokenCounter:
+    """Counts tokens with the model's tokenizer, remembering recent counts.
+    
+    The tokenizer is loaded in the background on first use; until it is
+    ready, and if it cannot be loaded, tokens are estimated from length.
+    """
+    
+    def __init__(self, tokenizer_name: Optional[str] = None, cache_dir: str = "./models",
+                 cache_size: int = 4096):
+        self.tokenizer_name = tokenizer_name
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger(__name__)
+        self.tokenizer = None
+        self.load_started = False
+        
+        # The same history messages are counted again on every turn
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+    
+    def load_in_background(self):
+        """Start loading the tokenizer on a worker thread; returns at once"""
+        if self.load_started or not self.tokenizer_name or not TRANSFORMERS_AVAILABLE:
+            return
+        self.load_started = True
+        future = asyncio.get_running_loop().run_in_executor(None, self._load_tokenizer)
+        future.add_done_callback(self._tokenizer_loaded)
+    
+    def _load_tokenizer(self):
+        return AutoTokenizer.from_pretrained(self.tokenizer_name, cache_dir=self.cache_dir)
+    
+    def _tokenizer_loaded(self, future: asyncio.Future):
+        """Switch from estimates to the tokenizer (runs on the event loop)"""
+        if future.cancelled():
+            return
+        try:
+            self.tokenizer = future.result()
+        except Exception as e:
+            self.logger.warning(f"Could not load tokenizer {self.tokenizer_name}, estimating tokens: {e}")
+            return
+        self.count.cache_clear()
+        self.logger.info(f"Counting prompt tokens with {self.tokenizer_name}")
+    
+    def _count(self, text: str) -> int:
+        """Number of tokens in a text"""
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class PromptBuilder:
+    """Keeps conversation history within a token budget and lays out prompts"""
+    
+    def __init__(self,
+                 system_prompt: str,
+                 counter: TokenCounter,
+                 token_budget: int = 4096,
+                 response_budget: int = 100,
+                 summary_budget: int = 256,
+                 context_budget: int = 512,
+                 max_messages: int = 40,
+                 low_water: float = 0.75):
+        self.system_prompt = system_prompt
+        self.counter = counter
+        self.token_budget = token_budget
+        self.response_budget = response_budget
+        self.summary_budget = summary_budget
+        self.max_messages = max_messages
+        self.low_water = low_water
+        self.logger = logging.getLogger(__name__)
+        
+        # What is left for history once everything else has its share
+        self.history_budget = max(0, token_budget - response_budget - summary_budget - context_budget
+                                  - self._message_tokens(system_prompt))
+        
+        # History entries: type, content, timestamp and tokens
+        self.history: List[Dict[str, Any]] = []
+        self.history_tokens = 0
+        self.summary_lines: List[str] = []
+        
+        # Statistics
+        self.evicted_messages = 0
+        self.summary_updates = 0
+        self.last_prompt_tokens = 0
+        self.last_prefix_tokens = 0
+    
+    def _message_tokens(self, content: str) -> int:
+        return self.counter.count(content) + MESSAGE_OVERHEAD
+    
+    def _content_tokens(self, content: List[Dict[str, Any]]) -> int:
+        """Tokens of multimodal message content"""
+        tokens = MESSAGE_OVERHEAD
+        for part in content:
+            if part.get('type') == 'text':
+                tokens += self.counter.count(part['text'])
+            else:
+                tokens += IMAGE_TOKENS
+        return tokens
+    
+    def add_turn(self, user_content: Optional[str], assistant_content: str,
+                 timestamp: Optional[float] = None):
+        """Add an exchange to the history, evicting old turns if it no longer fits"""
+        if user_content:
+            self._append('user', user_content, timestamp or time.time())
+        self._append('assistant', assistant_content, time.time())
+        
+        if self.history_tokens > self.history_budget or len(self.history) > self.max_messages:
+            self._evict()
+    
+    def _append(self, message_type: str, content: str, timestamp: float):
+        tokens = self._message_tokens(content)
+        self.history.append({
+            'type': message_type,
+            'content': content,
+            'timestamp': timestamp,
+            'tokens': tokens
+        })
+        self.history_tokens += tokens
+    
+    def _evict(self):
+        """Move the oldest turns into the summary, well below the budget"""
+        token_target = self.history_budget * self.low_water
+        message_target = int(self.max_messages * self.low_water)
+        
+        evicted = []
+        while self.history and (self.history_tokens > token_target or len(self.history) > message_target):
+            evicted.append(self.history.pop(0))
+            self.history_tokens -= evicted[-1]['tokens']
+        
+        # Never start the history with a reply whose question is gone
+        while self.history and self.history[0]['type'] == 'assistant':
+            evicted.append(self.history.pop(0))
+            self.history_tokens -= evicted[-1]['tokens']
+        
+        self.evicted_messages += len(evicted)
+        self._summarize(evicted)
+    
+    def _summarize(self, entries: List[Dict[str, Any]]):
+        """Fold evicted messages into the rolling summary"""
+        for entry in entries:
+            speaker = "User" if entry['type'] == 'user' else "Gemma"
+            text = textwrap.shorten(entry['content'], width=SUMMARY_LINE_WIDTH, placeholder="...")
+            self.summary_lines.append(f"- {speaker}: {text}")
+        
+        # The oldest lines go first once the summary is over its budget
+        while self.summary_lines and self.counter.count("\n".join(self.summary_lines)) > self.summary_budget:
+            self.summary_lines.pop(0)
+        self.summary_updates += 1
+    
+    def _system_content(self) -> str:
+        if not self.summary_lines:
+            return self.system_prompt
+        return self.system_prompt + "\n\nEarlier in this conversation:\n" + "\n".join(self.summary_lines)
+    
+    def build(self, user_content: Optional[List[Dict[str, Any]]], context_lines: List[str]) -> List[Dict[str, Any]]:
+        """Build the messages of a prompt.
+        
+        `context_lines` is the volatile context of this turn. It goes into
+        the final user message ahead of the input, dropping lines from the
+        end if the prompt would exceed the budget.
+        """
+        # Stable prefix
+        messages = [{"role": "system", "content": self._system_content()}]
+        for entry in self.history:
+            role = "user" if entry['type'] == 'user' else "assistant"
+            messages.append({"role": role, "content": entry['content']})
+        prefix_tokens = self._message_tokens(messages[0]['content']) + self.history_tokens
+        
+        # Volatile suffix
+        input_tokens = self._content_tokens(user_content or [])
+        available = self.token_budget - self.response_budget - prefix_tokens - input_tokens
+        context_lines = list(context_lines)
+        while context_lines and self.counter.count("\n".join(context_lines)) > available:
+            context_lines.pop()
+        
+        content = []
+        if context_lines:
+            content.append({"type": "text", "text": "\n".join(context_lines)})
+        content.extend(user_content or [])
+        if content:
+            messages.append({"role": "user", "content": content})
+        
+        self.last_prefix_tokens = prefix_tokens
+        self.last_prompt_tokens = prefix_tokens + (self._content_tokens(content) if content else 0)
+        return messages
+    
+    def clear(self):
+        """Forget the history and the summary"""
+        self.history = []
+        self.history_tokens = 0
+        self.summary_lines = []
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get prompt builder statistics"""
+        return {
+            'tokenizer': 'model' if self.counter.tokenizer is not None else 'estimate',
+            'token_budget': self.token_budget,
+            'history_budget': self.history_budget,
+            'history_messages': len(self.history),
+            'history_tokens': self.history_tokens,
+            'summary_lines': len(self.summary_lines),
+            'evicted_messages': self.evicted_messages,
+            'summary_updates': self.summary_updates,
+            'last_prompt_tokens': self.last_prompt_tokens,
+            'last_prefix_tokens': self.last_prefix_tokens
+        }
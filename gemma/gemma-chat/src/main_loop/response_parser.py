@@ -0,0 +1,112 @@
+"""Incremental parser for model responses
+
+Model responses mark speech with quotes, actions with asterisks and memory
+items with [MEMORY:...]:
+
+    *waves* "Hello there. How are you?" [MEMORY: the user waved back]
+
+The parser consumes the response in deltas as it streams in and reports
+each piece the moment it is complete, so speech can start while the rest
+is still being generated. Quoted speech is reported a sentence at a time:
+at every sentence end inside an open quote and when the quote closes.
+
+The three markups are tracked independently, exactly as three separate
+regular expressions would match them, so an action containing a quote
+yields both. Markup still open when the response ends is dropped.
+"""
+
+from typing import Dict, List
+
+MEMORY_PREFIX = "[MEMORY:"
+SENTENCE_ENDINGS = ".!?"
+
+class ResponseParser:
+    """State machine that extracts sentences, actions and memory items from deltas"""
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        
+        # Quoted speech
+        self.in_quote = False
+        self.quote_buffer: List[str] = []
+        
+        # Actions between asterisks
+        self.in_action = False
+        self.action_buffer: List[str] = []
+        
+        # Memory items; number of prefix characters matched so far
+        self.memory_matched = 0
+        self.in_memory = False
+        self.memory_buffer: List[str] = []
+        
+        # Everything completed so far
+        self.sentences: List[str] = []
+        self.actions: List[str] = []
+        self.memory_items: List[str] = []
+    
+    @property
+    def text(self) -> str:
+        """Response text consumed so far"""
+        return "".join(self.chunks)
+    
+    def feed(self, delta: str) -> Dict[str, List[str]]:
+        """Consume a delta and return the sentences, actions and memory items it completed"""
+        self.chunks.append(delta)
+        sentences: List[str] = []
+        actions: List[str] = []
+        memory_items: List[str] = []
+        
+        for char in delta:
+            # Quoted speech, split at sentence ends
+            if char == '"':
+                if self.in_quote:
+                    self._emit(self.quote_buffer, sentences)
+                self.in_quote = not self.in_quote
+            elif self.in_quote:
+                if char.isspace() and self.quote_buffer and self.quote_buffer[-1] in SENTENCE_ENDINGS:
+                    self._emit(self.quote_buffer, sentences)
+                self.quote_buffer.append(char)
+            
+            # Actions
+            if char == '*':
+                if self.in_action:
+                    self._emit(self.action_buffer, actions)
+                self.in_action = not self.in_action
+            elif self.in_action:
+                self.action_buffer.append(char)
+            
+            # Memory items
+            if self.in_memory:
+                if char == ']':
+                    self._emit(self.memory_buffer, memory_items)
+                    self.in_memory = False
+                else:
+                    self.memory_buffer.append(char)
+            elif self.memory_matched and char == MEMORY_PREFIX[self.memory_matched]:
+                self.memory_matched += 1
+                if self.memory_matched == len(MEMORY_PREFIX):
+                    self.memory_matched = 0
+                    self.in_memory = True
+            else:
+                self.memory_matched = 1 if char == '[' else 0
+        
+        self.sentences.extend(sentences)
+        self.actions.extend(actions)
+        self.memory_items.extend(memory_items)
+        return {'sentences': sentences, 'actions': actions, 'memory_items': memory_items}
+    
+    def _emit(self, buffer: List[str], items: List[str]):
+        """Move a buffered piece into `items` unless it is blank"""
+        item = "".join(buffer).strip()
+        buffer.clear()
+        if item:
+            items.append(item)
+    
+    def components(self) -> Dict[str, object]:
+        """Everything completed so far, in the form of a parsed response"""
+        return {
+            'sentences': list(self.sentences),
+            'actions': list(self.actions),
+            'memory_items': list(self.memory_items),
+            'plain_text': self.text
+        }
@@ -2,10 +2,11 @@
 
 import logging
 import re
-from typing import List, Dict, Any, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import time
 
-from ..event_system import EventProducer, EventType, TTSEvent
+from .response_parser import ResponseParser
+from ..event_system import EventProducer, EventType, TTSEvent, mark_stage
 from ..config import Config
 
 class ResponseProcessor:
@@ -25,6 +26,7 @@ class ResponseProcessor:
         
         # Processing statistics
         self.processed_responses = 0
+        self.streamed_responses = 0
         self.total_sentences = 0
         self.total_actions = 0
         self.total_memory_items = 0
@@ -41,16 +43,18 @@ class ResponseProcessor:
         """Disconnect from event system"""
         await self.event_producer.disconnect()
     
-    async def process_response(self, response: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def process_response(self, response: str, context: Optional[Dict[str, Any]] = None,
+                               trace: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a model response and extract components"""
         start_time = time.time()
         
         try:
             # Parse response components
             components = self._parse_response(response)
+            mark_stage(trace, "response_processor")
             
             # Process each component type
-            await self._process_tts_sentences(components['sentences'])
+            await self._process_tts_sentences(components['sentences'], trace)
             await self._process_actions(components['actions'])
             await self._process_memory_items(components['memory_items'])
             
@@ -86,30 +90,80 @@ class ResponseProcessor:
                 'error': str(e)
             }
     
-    def _parse_response(self, response: str) -> Dict[str, Any]:
-        """Parse response into components"""
-        components = {
-            'sentences': [],
-            'actions': [],
-            'memory_items': [],
-            'plain_text': response
-        }
+    async def process_stream(self, deltas: AsyncIterator[str], context: Optional[Dict[str, Any]] = None,
+                             trace: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Process a model response while it streams in.
         
-        # Extract quoted sentences (for TTS)
-        quoted_matches = self.quoted_pattern.findall(response)
-        components['sentences'] = [sentence.strip() for sentence in quoted_matches if sentence.strip()]
+        Each delta goes through an incremental parser, and whatever it
+        completes is handled at once: a quoted sentence is queued for TTS
+        when it ends or its quote closes, so the first sentence is spoken
+        while the rest is still being generated, and actions and memory
+        items go out as soon as they close.
+        """
+        start_time = time.time()
+        parser = ResponseParser()
         
-        # Extract actions (marked with asterisks)
-        action_matches = self.action_pattern.findall(response)
-        components['actions'] = [action.strip() for action in action_matches if action.strip()]
+        try:
+            async for delta in deltas:
+                items = parser.feed(delta)
+                if items['sentences']:
+                    mark_stage(trace, "response_processor", once=True)
+                await self._process_tts_sentences(items['sentences'], trace)
+                await self._process_actions(items['actions'])
+                await self._process_memory_items(items['memory_items'])
         
-        # Extract memory items (marked with [MEMORY:...])
-        memory_matches = self.memory_pattern.findall(response)
-        components['memory_items'] = [item.strip() for item in memory_matches if item.strip()]
+        except Exception as e:
+            self.logger.error(f"Error reading response stream: {e}")
+        
+        response = parser.text
         
-        return components
+        try:
+            # Everything complete has been handled already
+            components = parser.components()
+            mark_stage(trace, "response_processor", once=True)
+            
+            # Create processing result
+            result = {
+                'original_response': response,
+                'components': components,
+                'processing_time': time.time() - start_time,
+                'timestamp': time.time(),
+                'context': context or {},
+                'streamed': True
+            }
+            
+            # Update statistics
+            self.streamed_responses += 1
+            self._update_statistics(components)
+            
+            # Add to history
+            self._add_to_history(result)
+            
+            self.logger.debug(f"Processed streamed response with {len(components['sentences'])} sentences, "
+                            f"{len(components['actions'])} actions, "
+                            f"{len(components['memory_items'])} memory items")
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Error processing response: {e}")
+            return {
+                'original_response': response,
+                'components': {'sentences': [], 'actions': [], 'memory_items': [], 'plain_text': response},
+                'processing_time': time.time() - start_time,
+                'timestamp': time.time(),
+                'context': context or {},
+                'streamed': True,
+                'error': str(e)
+            }
+    
+    def _parse_response(self, response: str) -> Dict[str, Any]:
+        """Parse response into components"""
+        parser = ResponseParser()
+        parser.feed(response)
+        return parser.components()
     
-    async def _process_tts_sentences(self, sentences: List[str]):
+    async def _process_tts_sentences(self, sentences: List[str], trace: Optional[Dict[str, Any]] = None):
         """Process sentences for TTS"""
         if not sentences:
             return
@@ -122,7 +176,8 @@ class ResponseProcessor:
                 # Send TTS event
                 tts_event = TTSEvent(
                     event_type=EventType.QUEUE_SENTENCES,
-                    sentences=valid_sentences
+                    sentences=valid_sentences,
+                    trace=trace
                 )
                 await self.event_producer.send_event(tts_event)
                 
@@ -236,6 +291,7 @@ class ResponseProcessor:
         """Get processing statistics"""
         return {
             'processed_responses': self.processed_responses,
+            'streamed_responses': self.streamed_responses,
             'total_sentences': self.total_sentences,
             'total_actions': self.total_actions,
             'total_memory_items': self.total_memory_items,
@@ -0,0 +1,216 @@
+"""Fact distillation in a pool of worker processes
+
+Model inference for distillation is slow and holds the GIL, so it runs in
+worker processes, each with its own FactDistiller and model, instead of on
+the event loop that also drives audio, camera and responses. Exchanges are
+submitted without waiting and wait in a bounded queue; when the queue is
+full the oldest exchange is dropped, because distillation is background
+work and must never hold up a response. Every exchange that arrives while
+the workers are busy is coalesced into the next job, which distills them
+all with one batched generation. The facts of each exchange come back as
+a FACT_DISTILLED event.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .fact_distiller import FactDistiller
+from ..event_system import EventType, GemmaEvent
+
+# Context keys the distiller reads; everything else (frames, audio) stays
+# in this process
+CONTEXT_KEYS = ('wake_word_active', 'wake_word', 'speech_active', 'speech_confidence')
+
+# Distiller of the current worker process
+_worker_distiller: Optional[FactDistiller] = None
+
+def _initialize_worker(model_name: str, cache_dir: str):
+    """Load the distillation model in a worker process"""
+    global _worker_distiller
+    _worker_distiller = FactDistiller(model_name=model_name, cache_dir=cache_dir)
+
+def _distill_in_worker(turns: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+    """Distill a batch of exchanges in a worker process"""
+    return _worker_distiller.distill_batch(turns)
+
+def portable_context(context: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The part of a context the distiller uses, small enough to send to a worker"""
+    if not context:
+        return None
+    portable = {key: context[key] for key in CONTEXT_KEYS if key in context}
+    if context.get('detections'):
+        portable['detections'] = [
+            {'class_name': detection.get('class_name'), 'confidence': detection.get('confidence', 0)}
+            for detection in context['detections']
+        ]
+    return portable
+
+class DistillationPool:
+    """Distills facts from conversation exchanges in worker processes"""
+    
+    def __init__(self,
+                 on_distilled: Callable[[GemmaEvent], Awaitable[None]],
+                 model_name: str = "microsoft/DialoGPT-medium",
+                 cache_dir: str = "./models",
+                 workers: int = 1,
+                 queue_size: int = 32,
+                 max_batch: int = 8):
+        self.on_distilled = on_distilled
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_batch = max_batch
+        self.logger = logging.getLogger(__name__)
+        
+        # Jobs
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.free_workers = asyncio.Semaphore(workers)
+        self.dispatcher_task: Optional[asyncio.Task] = None
+        self.jobs: Set[asyncio.Task] = set()
+        
+        # Statistics
+        self.submitted_turns = 0
+        self.dropped_turns = 0
+        self.jobs_completed = 0
+        self.failed_jobs = 0
+        self.distilled_facts = 0
+        self.batch_sizes = deque(maxlen=100)
+        self.job_times = deque(maxlen=100)
+        self.queue_delays = deque(maxlen=100)
+    
+    def start(self):
+        """Start the worker processes and the dispatcher"""
+        if self.dispatcher_task is not None:
+            return
+        self._start_executor()
+        self.dispatcher_task = asyncio.create_task(self._dispatch_loop())
+        self.logger.info(f"Started {self.workers} fact distillation worker(s)")
+    
+    def _start_executor(self):
+        # Spawned rather than forked: the parent runs threads of its own
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(self.model_name, self.cache_dir)
+        )
+    
+    async def close(self):
+        """Stop the dispatcher and the worker processes"""
+        if self.dispatcher_task is not None:
+            self.dispatcher_task.cancel()
+            self.dispatcher_task = None
+        for job in list(self.jobs):
+            job.cancel()
+        if self.jobs:
+            await asyncio.gather(*self.jobs, return_exceptions=True)
+        # Cancelling the jobs cancelled their work that had not started
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+    
+    def submit(self,
+               user_input: str,
+               assistant_response: str,
+               context: Optional[Dict[str, Any]] = None):
+        """Queue an exchange for distillation without waiting for it"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped_turns += 1
+            self.logger.warning("Distillation queue full, dropped the oldest exchange")
+        self.queue.put_nowait((user_input, assistant_response, portable_context(context), time.time()))
+        self.submitted_turns += 1
+    
+    async def _dispatch_loop(self):
+        """Hand queued exchanges to free workers in batches"""
+        while True:
+            try:
+                turn = await self.queue.get()
+                await self.free_workers.acquire()
+                
+                # Take everything that queued up while the workers were busy
+                turns = [turn]
+                while len(turns) < self.max_batch and not self.queue.empty():
+                    turns.append(self.queue.get_nowait())
+                
+                job = asyncio.create_task(self._run_job(turns))
+                self.jobs.add(job)
+                job.add_done_callback(self.jobs.discard)
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error in distillation dispatcher: {e}")
+                await asyncio.sleep(0.1)
+    
+    async def _run_job(self, turns: List[Tuple]):
+        """Distill a batch of exchanges in a worker and publish the facts"""
+        start_time = time.time()
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                executor, _distill_in_worker, [turn[:3] for turn in turns]
+            )
+        except BrokenProcessPool as e:
+            self.failed_jobs += 1
+            # Other jobs on the same workers fail too; restart only once
+            if self.executor is executor:
+                self.logger.error(f"Distillation worker died, restarting workers: {e}")
+                executor.shutdown(wait=False)
+                self._start_executor()
+            return
+        except Exception as e:
+            self.failed_jobs += 1
+            self.logger.error(f"Error in distillation job: {e}")
+            return
+        finally:
+            self.free_workers.release()
+        
+        self.jobs_completed += 1
+        self.batch_sizes.append(len(turns))
+        self.job_times.append(time.time() - start_time)
+        
+        for (user_input, _, _, queued_at), facts in zip(turns, results):
+            self.queue_delays.append(start_time - queued_at)
+            self.distilled_facts += len(facts)
+            event = GemmaEvent(
+                event_type=EventType.FACT_DISTILLED,
+                timestamp=time.time(),
+                data={
+                    'facts': [fact.to_dict() for fact in facts],
+                    'user_input': user_input,
+                    'queued_at': queued_at
+                },
+                source="fact_distiller"
+            )
+            try:
+                await self.on_distilled(event)
+            except Exception as e:
+                self.logger.error(f"Error handling distilled facts: {e}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get distillation pool statistics"""
+        def average(values):
+            return sum(values) / len(values) if values else 0
+        
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'jobs_in_flight': len(self.jobs),
+            'submitted_turns': self.submitted_turns,
+            'dropped_turns': self.dropped_turns,
+            'jobs_completed': self.jobs_completed,
+            'failed_jobs': self.failed_jobs,
+            'distilled_facts': self.distilled_facts,
+            'avg_batch_size': average(self.batch_sizes),
+            'avg_job_time': average(self.job_times),
+            'avg_queue_delay': average(self.queue_delays)
+        }
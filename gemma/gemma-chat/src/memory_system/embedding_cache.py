@@ -0,0 +1,210 @@
+"""Two-tier cache of text embeddings keyed by content hash
+
+Recently used embeddings are kept in an in-memory LRU. Behind it is an
+on-disk tier in a directory per model name and embedding dimension, so
+changing the model never serves stale vectors. The directory holds
+
+    vectors.bin  fixed-width float32 rows, memory-mapped
+    keys.bin     the 16-byte content hash of each row, memory-mapped
+    meta.json    model name, dimension, capacity and next row to write
+
+The disk tier is a ring: once `disk_capacity` rows are written, the
+oldest row is overwritten. A row's key is cleared before its vector is
+overwritten and written after it, so a crash can lose the entry being
+written but never pairs a key with a wrong vector.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+KEY_SIZE = 16
+
+def content_key(text: str) -> bytes:
+    """Content hash of a text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+class EmbeddingCache:
+    """Caches embeddings in an LRU backed by memory-mapped files"""
+    
+    # Rows written between updates of the saved next row
+    META_INTERVAL = 256
+    
+    def __init__(self,
+                 directory: Optional[str],
+                 model_name: str,
+                 dimension: int,
+                 memory_size: int = 2048,
+                 disk_capacity: int = 100000):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.memory_size = memory_size
+        self.disk_capacity = disk_capacity
+        self.logger = logging.getLogger(__name__)
+        
+        # In-memory tier
+        self.memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # Encoding runs on an executor thread while queries look up on the loop
+        self.lock = threading.Lock()
+        
+        # On-disk tier
+        self.directory = None
+        self.vectors: Optional[np.memmap] = None
+        self.keys: Optional[np.memmap] = None
+        self.rows: Dict[bytes, int] = {}
+        self.next_row = 0
+        
+        # Statistics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if directory and disk_capacity > 0:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self.directory = os.path.join(directory, f"{safe_name}_{dimension}")
+            self._open_disk_tier()
+    
+    def _open_disk_tier(self):
+        """Open or create the memory-mapped files"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            meta_path = os.path.join(self.directory, "meta.json")
+            vectors_path = os.path.join(self.directory, "vectors.bin")
+            keys_path = os.path.join(self.directory, "keys.bin")
+            
+            meta = {}
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            
+            # Start over if the files were written for another layout
+            expected_sizes = {vectors_path: self.disk_capacity * self.dimension * 4,
+                              keys_path: self.disk_capacity * KEY_SIZE}
+            valid = (meta.get('model_name') == self.model_name
+                     and meta.get('dimension') == self.dimension
+                     and meta.get('capacity') == self.disk_capacity
+                     and all(os.path.exists(path) and os.path.getsize(path) == size
+                             for path, size in expected_sizes.items()))
+            mode = "r+" if valid else "w+"
+            
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode,
+                                     shape=(self.disk_capacity, self.dimension))
+            self.keys = np.memmap(keys_path, dtype=np.uint8, mode=mode,
+                                  shape=(self.disk_capacity, KEY_SIZE))
+            
+            if valid:
+                self.next_row = meta.get('next_row', 0) % self.disk_capacity
+                for row in np.flatnonzero(self.keys.any(axis=1)):
+                    self.rows[self.keys[row].tobytes()] = int(row)
+            self._write_meta()
+            
+            self.logger.info(f"Opened embedding cache with {len(self.rows)} entries: {self.directory}")
+        
+        except Exception as e:
+            self.logger.error(f"Error opening embedding cache, using memory only: {e}")
+            self.vectors = None
+            self.keys = None
+            self.rows = {}
+    
+    def _write_meta(self):
+        meta = {
+            'model_name': self.model_name,
+            'dimension': self.dimension,
+            'capacity': self.disk_capacity,
+            'next_row': self.next_row
+        }
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+    
+    def _remember(self, key: bytes, embedding: np.ndarray):
+        """Put an embedding in the LRU, evicting the least recently used"""
+        self.memory[key] = embedding
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Cached embedding of a text, or None"""
+        key = content_key(text)
+        with self.lock:
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return embedding
+            
+            row = self.rows.get(key)
+            if row is not None:
+                embedding = np.array(self.vectors[row])
+                self._remember(key, embedding)
+                self.disk_hits += 1
+                return embedding
+            
+            self.misses += 1
+            return None
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached embeddings of texts, None for each miss"""
+        return [self.get(text) for text in texts]
+    
+    def put(self, text: str, embedding: np.ndarray):
+        """Cache the embedding of a text"""
+        key = content_key(text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self.lock:
+            self._remember(key, embedding)
+            if self.vectors is None or key in self.rows:
+                return
+            
+            # Overwrite the oldest row once the ring is full
+            row = self.next_row
+            old_key = self.keys[row].tobytes()
+            if self.rows.get(old_key) == row:
+                del self.rows[old_key]
+            
+            # The row has no key while its vector changes
+            self.keys[row] = 0
+            self.vectors[row] = embedding
+            self.keys[row] = np.frombuffer(key, dtype=np.uint8)
+            self.rows[key] = row
+            self.next_row = (row + 1) % self.disk_capacity
+            if self.next_row % self.META_INTERVAL == 0:
+                self._write_meta()
+    
+    def flush(self):
+        """Write the disk tier out"""
+        with self.lock:
+            if self.vectors is None:
+                return
+            try:
+                self.vectors.flush()
+                self.keys.flush()
+                self._write_meta()
+            except Exception as e:
+                self.logger.error(f"Error flushing embedding cache: {e}")
+    
+    def close(self):
+        """Flush and unmap the disk tier"""
+        self.flush()
+        with self.lock:
+            self.vectors = None
+            self.keys = None
+    
+    def get_statistics(self) -> Dict[str, float]:
+        """Get cache statistics"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_entries': len(self.memory),
+            'disk_entries': len(self.rows),
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        }
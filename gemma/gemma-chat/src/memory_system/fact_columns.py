@@ -0,0 +1,90 @@
+"""Columnar storage of the numeric fields of facts"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from .fact_distiller import Fact
+
+class FactColumns:
+    """Per-fact values kept in NumPy arrays, one row per fact id.
+    
+    Scoring and filtering over all facts then become vectorized array
+    expressions instead of Python loops over Fact objects. Categories and
+    sources are stored as small integer codes. Rows of removed facts stay
+    in place, marked as not live, until their id is reused.
+    """
+    
+    COLUMNS = ('live', 'importance', 'confidence', 'timestamp', 'access_count', 'last_access', 'category', 'source')
+    
+    def __init__(self, capacity: int = 128):
+        # Rows in use are below size
+        self.size = 0
+        self.capacity = capacity
+        
+        self.live = np.zeros(capacity, dtype=bool)
+        self.importance = np.zeros(capacity, dtype=np.float64)
+        self.confidence = np.zeros(capacity, dtype=np.float64)
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.access_count = np.zeros(capacity, dtype=np.int32)
+        self.last_access = np.zeros(capacity, dtype=np.float64)
+        self.category = np.zeros(capacity, dtype=np.int16)
+        self.source = np.zeros(capacity, dtype=np.int16)
+        
+        # Code tables
+        self.category_codes: Dict[str, int] = {}
+        self.category_names: List[str] = []
+        self.source_codes: Dict[str, int] = {}
+        self.source_names: List[str] = []
+    
+    def _grow(self, capacity: int):
+        """Grow every column to a new capacity"""
+        self.capacity = capacity
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+    
+    def _code(self, codes: Dict[str, int], names: List[str], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+    
+    def category_code(self, category: str) -> int:
+        """Code of a category, or -1 if no fact has it"""
+        return self.category_codes.get(category, -1)
+    
+    def source_code(self, source: str) -> int:
+        """Code of a source, or -1 if no fact has it"""
+        return self.source_codes.get(source, -1)
+    
+    def set_row(self, row: int, fact: Fact, now: float):
+        """Fill the row of a fact id"""
+        if row >= self.capacity:
+            self._grow(max(row + 1, self.capacity * 2))
+        
+        self.live[row] = True
+        self.importance[row] = fact.importance
+        self.confidence[row] = fact.confidence
+        self.timestamp[row] = fact.timestamp
+        self.access_count[row] = 0
+        self.last_access[row] = now
+        self.category[row] = self._code(self.category_codes, self.category_names, fact.category)
+        self.source[row] = self._code(self.source_codes, self.source_names, fact.source)
+        self.size = max(self.size, row + 1)
+    
+    def release(self, row: int):
+        """Mark the row of a removed fact as not live"""
+        self.live[row] = False
+    
+    def clear(self):
+        """Remove every row"""
+        self.size = 0
+        self.live[:] = False
+        self.category_codes = {}
+        self.category_names = []
+        self.source_codes = {}
+        self.source_names = []
@@ -3,7 +3,8 @@
 import logging
 import asyncio
 import time
-from typing import List, Dict, Any, Optional, Set
+from collections import deque
+from typing import List, Dict, Any, Optional, Set, Tuple
 import re
 from dataclasses import dataclass
 
@@ -46,7 +47,8 @@ class Fact:
 class FactDistiller:
     """Distills facts from conversations and events using AI model"""
     
-    def __init__(self, model_name: str = "microsoft/DialoGPT-medium", cache_dir: str = "./models"):
+    def __init__(self, model_name: str = "microsoft/DialoGPT-medium", cache_dir: str = "./models",
+                 load_model: bool = True):
         self.model_name = model_name
         self.cache_dir = cache_dir
         self.logger = logging.getLogger(__name__)
@@ -84,11 +86,12 @@ class FactDistiller:
         }
         
         # Initialize model
-        self._initialize_model()
+        if load_model:
+            self._initialize_model()
         
         # Statistics
         self.distilled_facts = 0
-        self.processing_times = []
+        self.processing_times = deque(maxlen=100)
     
     def _initialize_model(self):
         """Initialize the fact distillation model"""
@@ -102,6 +105,10 @@ class FactDistiller:
                 self.model_name,
                 cache_dir=self.cache_dir
             )
+            # Batched generation pads prompts on the left
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = "left"
             
             # For now, use a simple text generation model
             # In production, this would be a specialized fact extraction model
@@ -124,68 +131,56 @@ class FactDistiller:
                                             assistant_response: str,
                                             context: Optional[Dict[str, Any]] = None) -> List[Fact]:
         """Distill facts from a conversation exchange"""
+        return self.distill_batch([(user_input, assistant_response, context)])[0]
+    
+    def distill_batch(self,
+                      turns: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[List[Fact]]:
+        """Distill facts from several (user input, response, context) exchanges.
+        
+        The texts of all exchanges go through the model in one batched
+        generation. Returns the facts of each exchange in order.
+        """
         start_time = time.time()
         
         try:
-            facts = []
+            facts = [[] for _ in turns]
+            prompts = []  # (exchange index, source, prompt)
             
-            # Extract facts from user input
-            user_facts = await self._extract_facts_from_text(
-                user_input, 
-                source="user_input",
-                context=context
-            )
-            facts.extend(user_facts)
+            for index, (user_input, assistant_response, context) in enumerate(turns):
+                for text, source in ((user_input, "user_input"), (assistant_response, "assistant_response")):
+                    if not text or not text.strip():
+                        continue
+                    
+                    # Pattern-based extraction
+                    facts[index].extend(self._extract_with_patterns(text, source))
+                    
+                    if self.distillation_pipeline:
+                        prompts.append((index, source, self._create_fact_extraction_prompt(text, context)))
             
-            # Extract facts from assistant response
-            response_facts = await self._extract_facts_from_text(
-                assistant_response,
-                source="assistant_response", 
-                context=context
-            )
-            facts.extend(response_facts)
+            # AI-based extraction
+            if prompts:
+                generated_texts = self._generate([prompt for _, _, prompt in prompts])
+                for (index, source, _), generated_text in zip(prompts, generated_texts):
+                    facts[index].extend(self._parse_generated_facts(generated_text, source))
             
             # Extract contextual facts
-            if context:
-                context_facts = await self._extract_contextual_facts(context)
-                facts.extend(context_facts)
+            for index, (_, _, context) in enumerate(turns):
+                if context:
+                    facts[index].extend(self._extract_contextual_facts(context))
             
             # Update statistics
             processing_time = time.time() - start_time
             self.processing_times.append(processing_time)
-            self.distilled_facts += len(facts)
+            self.distilled_facts += sum(len(turn_facts) for turn_facts in facts)
             
-            if len(self.processing_times) > 100:
-                self.processing_times.pop(0)
-            
-            self.logger.debug(f"Distilled {len(facts)} facts in {processing_time:.2f}s")
+            self.logger.debug(f"Distilled {sum(len(turn_facts) for turn_facts in facts)} facts "
+                              f"from {len(turns)} exchanges in {processing_time:.2f}s")
             
             return facts
             
         except Exception as e:
             self.logger.error(f"Error distilling facts: {e}")
-            return []
-    
-    async def _extract_facts_from_text(self, 
-                                     text: str, 
-                                     source: str,
-                                     context: Optional[Dict[str, Any]] = None) -> List[Fact]:
-        """Extract facts from text using patterns and AI"""
-        facts = []
-        
-        if not text or not text.strip():
-            return facts
-        
-        # Pattern-based extraction
-        pattern_facts = self._extract_with_patterns(text, source)
-        facts.extend(pattern_facts)
-        
-        # AI-based extraction
-        if self.distillation_pipeline:
-            ai_facts = await self._extract_with_ai(text, source, context)
-            facts.extend(ai_facts)
-        
-        return facts
+            return [[] for _ in turns]
     
     def _extract_with_patterns(self, text: str, source: str) -> List[Fact]:
         """Extract facts using regex patterns"""
@@ -212,35 +207,22 @@ class FactDistiller:
         
         return facts
     
-    async def _extract_with_ai(self, 
-                             text: str, 
-                             source: str,
-                             context: Optional[Dict[str, Any]] = None) -> List[Fact]:
-        """Extract facts using AI model"""
+    def _generate(self, prompts: List[str]) -> List[str]:
+        """Generate fact extractions for a batch of prompts"""
         try:
-            # Create a prompt for fact extraction
-            prompt = self._create_fact_extraction_prompt(text, context)
-            
-            # Generate fact extraction
-            result = self.distillation_pipeline(
-                prompt,
-                max_length=len(prompt.split()) + 50,
+            results = self.distillation_pipeline(
+                prompts,
+                max_new_tokens=50,
                 num_return_sequences=1,
                 temperature=0.3,
-                do_sample=True
+                do_sample=True,
+                batch_size=len(prompts)
             )
-            
-            if result and len(result) > 0:
-                generated_text = result[0]['generated_text']
-                
-                # Parse extracted facts
-                facts = self._parse_generated_facts(generated_text, source)
-                return facts
+            return [result[0]['generated_text'] if result else "" for result in results]
             
         except Exception as e:
             self.logger.error(f"Error in AI fact extraction: {e}")
-        
-        return []
+            return []
     
     def _create_fact_extraction_prompt(self, text: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Create prompt for AI fact extraction"""
@@ -281,7 +263,7 @@ Important facts:
         
         return facts
     
-    async def _extract_contextual_facts(self, context: Dict[str, Any]) -> List[Fact]:
+    def _extract_contextual_facts(self, context: Dict[str, Any]) -> List[Fact]:
         """Extract facts from context information"""
         facts = []
         
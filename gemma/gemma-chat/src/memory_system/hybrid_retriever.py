@@ -0,0 +1,133 @@
+"""Hybrid retrieval over immediate and long-term memory"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .fact_distiller import Fact
+from .immediate_memory import ImmediateMemory
+from .long_term_memory import LongTermMemory
+
+class HybridRetriever:
+    """Fuses keyword hits from immediate memory with vector hits from long-term memory.
+    
+    Both memories are searched concurrently and their rankings are merged
+    with reciprocal-rank fusion: a fact scores the sum of
+    weight / (rrf_k + rank) over every ranking it appears in. Facts with
+    the same text from both memories count as one.
+    
+    The long-term search runs on a worker thread while immediate memory,
+    an in-process index that cannot be interrupted, is searched on the
+    event loop; the long-term search then gets whatever is left of the
+    latency budget. A long-term search still running when the budget is
+    spent is abandoned, and it is skipped altogether while abandoned
+    searches still occupy every worker.
+    """
+    
+    def __init__(self,
+                 immediate_memory: ImmediateMemory,
+                 long_term_memory: LongTermMemory,
+                 latency_budget: float = 0.03,
+                 rrf_k: int = 60,
+                 immediate_weight: float = 1.0,
+                 long_term_weight: float = 1.0,
+                 similarity_threshold: float = 0.3):
+        self.immediate_memory = immediate_memory
+        self.long_term_memory = long_term_memory
+        self.latency_budget = latency_budget
+        self.rrf_k = rrf_k
+        self.immediate_weight = immediate_weight
+        self.long_term_weight = long_term_weight
+        self.similarity_threshold = similarity_threshold
+        self.logger = logging.getLogger(__name__)
+        
+        # Statistics
+        self.retrievals = 0
+        self.immediate_overruns = 0
+        self.long_term_timeouts = 0
+        self.retrieval_times = deque(maxlen=100)
+    
+    async def retrieve(self,
+                       query: str,
+                       context: Optional[Dict[str, Any]] = None,
+                       max_facts: int = 5,
+                       extra_queries: Optional[List[str]] = None) -> List[Fact]:
+        """Retrieve the best facts for a query from both memories within the latency budget.
+        
+        `extra_queries`, such as detected object names, are searched in
+        long-term memory next to the query, each as its own ranking.
+        """
+        start_time = time.time()
+        self.retrievals += 1
+        candidates = max_facts * 2
+        
+        queries = list(dict.fromkeys([query] + [q for q in extra_queries or [] if q]))
+        long_term_task = asyncio.create_task(
+            self.long_term_memory.search_facts_batch(queries, k=candidates,
+                                                     similarity_threshold=self.similarity_threshold,
+                                                     skip_if_busy=True)
+        )
+        
+        try:
+            # Let the long-term search reach its worker thread first
+            await asyncio.sleep(0)
+            
+            # Accesses are counted only for the facts that are returned
+            immediate_facts = await self.immediate_memory.retrieve_relevant_facts(
+                query, context, candidates, count_access=False
+            )
+            rankings = [(self.immediate_weight, immediate_facts)]
+            
+            remaining = self.latency_budget - (time.time() - start_time)
+            if remaining <= 0:
+                self.immediate_overruns += 1
+            done, _ = await asyncio.wait({long_term_task}, timeout=max(remaining, 0))
+            
+            if long_term_task in done:
+                if not long_term_task.exception():
+                    per_query, _ = long_term_task.result()
+                    rankings.extend((self.long_term_weight, facts) for facts in per_query)
+            else:
+                # Give up on the search; it is cancelled if it has not started
+                long_term_task.cancel()
+                self.long_term_timeouts += 1
+                self.logger.debug(f"Memory retrieval budget of {self.latency_budget * 1000:.0f}ms "
+                                  f"exceeded, skipped long-term memory")
+            
+            facts = self._fuse(rankings)[:max_facts]
+            self.immediate_memory.record_access(facts)
+            return facts
+        
+        except Exception as e:
+            long_term_task.cancel()
+            self.logger.error(f"Error in hybrid retrieval: {e}")
+            return []
+        
+        finally:
+            self.retrieval_times.append(time.time() - start_time)
+    
+    def _fuse(self, rankings: List) -> List[Fact]:
+        """Merge (weight, facts) rankings with reciprocal-rank fusion"""
+        scores: Dict[str, float] = {}
+        facts: Dict[str, Fact] = {}
+        for weight, ranking in rankings:
+            for rank, fact in enumerate(ranking, start=1):
+                key = fact.content.strip().lower()
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank)
+                facts.setdefault(key, fact)
+        return [facts[key] for key in sorted(scores, key=scores.get, reverse=True)]
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get retriever statistics"""
+        avg_retrieval_time = (sum(self.retrieval_times) / len(self.retrieval_times)
+                              if self.retrieval_times else 0)
+        return {
+            'retrievals': self.retrievals,
+            'latency_budget': self.latency_budget,
+            'immediate_overruns': self.immediate_overruns,
+            'long_term_timeouts': self.long_term_timeouts,
+            'avg_retrieval_time': avg_retrieval_time,
+            'max_retrieval_time': max(self.retrieval_times, default=0)
+        }
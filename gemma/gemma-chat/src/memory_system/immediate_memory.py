@@ -3,32 +3,61 @@
 import logging
 import asyncio
 import time
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional
 from collections import defaultdict
 import heapq
 from dataclasses import asdict
 
+import numpy as np
+
 from .fact_distiller import Fact, FactDistiller
+from .fact_columns import FactColumns
+from .minhash import MinHashIndex
+from .text_index import TextIndex
+
+# Archival weight of each category (higher = kept longer)
+CATEGORY_WEIGHTS = {
+    'personal': 1.0,
+    'preferences': 0.8,
+    'abilities': 0.9,
+    'objects': 0.3,
+    'actions': 0.4,
+    'temporal': 0.5,
+    'spatial': 0.6,
+    'general': 0.5
+}
 
 class ImmediateMemory:
     """Manages immediate memory with fact storage and retrieval"""
     
-    def __init__(self, max_facts: int = 100, relevance_threshold: float = 0.3):
+    def __init__(self, max_facts: int = 100, relevance_threshold: float = 0.3,
+                 duplicate_threshold: float = 0.8):
         self.max_facts = max_facts
         self.relevance_threshold = relevance_threshold
+        self.duplicate_threshold = duplicate_threshold
         self.logger = logging.getLogger(__name__)
         
-        # Fact storage
-        self.facts: List[Fact] = []
-        self.facts_by_category: Dict[str, List[Fact]] = defaultdict(list)
-        self.facts_by_source: Dict[str, List[Fact]] = defaultdict(list)
+        # Fact storage: a slot map whose slot numbers are the fact ids. Ids
+        # of archived facts go on the free list and are reused, so a fact
+        # keeps its id for as long as it is in memory
+        self.slots: List[Optional[Fact]] = []
+        self.free_slots: List[int] = []
+        self.fact_count = 0
+        self.facts_by_category: Dict[str, Dict[int, Fact]] = defaultdict(dict)
+        self.facts_by_source: Dict[str, Dict[int, Fact]] = defaultdict(dict)
+        
+        # Numeric fact fields and access tracking as columns, one row per
+        # fact id, for vectorized scoring
+        self.columns = FactColumns()
         
-        # Fact index for quick lookup
-        self.fact_index: Dict[str, Set[int]] = defaultdict(set)  # keyword -> fact indices
+        # Full-text index over fact contents, keyed by fact id
+        self.text_index = TextIndex()
         
-        # Access tracking for importance scoring
-        self.fact_access_count: Dict[int, int] = defaultdict(int)
-        self.last_access_time: Dict[int, float] = {}
+        # Near-duplicate index over fact contents, keyed by fact id
+        self.duplicate_index = MinHashIndex(threshold=duplicate_threshold)
+        
+        # Text matches reranked with importance, recency and context boosts
+        self.rerank_candidates = 50
         
         # Memory statistics
         self.total_facts_added = 0
@@ -40,6 +69,25 @@ class ImmediateMemory:
         self.archived_facts: List[Fact] = []
         self.max_archived = 500
     
+    def __len__(self) -> int:
+        return self.fact_count
+    
+    @property
+    def facts(self) -> List[Fact]:
+        """Facts in memory, oldest first"""
+        return self._facts_in_order(np.flatnonzero(self.columns.live[:self.columns.size]))
+    
+    def _facts_in_order(self, fact_ids: np.ndarray) -> List[Fact]:
+        """Facts with the given ids, oldest first"""
+        fact_ids = fact_ids[np.argsort(self.columns.timestamp[fact_ids], kind='stable')]
+        return [self.slots[fact_id] for fact_id in fact_ids]
+    
+    def get_fact(self, fact_id: int) -> Optional[Fact]:
+        """Get the fact with an id, or None if it is no longer in memory"""
+        if 0 <= fact_id < len(self.slots):
+            return self.slots[fact_id]
+        return None
+    
     async def add_fact(self, fact: Fact) -> bool:
         """Add a fact to immediate memory"""
         try:
@@ -48,27 +96,30 @@ class ImmediateMemory:
                 self.logger.debug(f"Skipping duplicate fact: {fact.content}")
                 return False
             
-            # Add to main storage
-            fact_index = len(self.facts)
-            self.facts.append(fact)
+            # Add to main storage, reusing a free slot if there is one
+            if self.free_slots:
+                fact_id = self.free_slots.pop()
+                self.slots[fact_id] = fact
+            else:
+                fact_id = len(self.slots)
+                self.slots.append(fact)
+            self.fact_count += 1
             
             # Add to category index
-            self.facts_by_category[fact.category].append(fact)
+            self.facts_by_category[fact.category][fact_id] = fact
             
             # Add to source index
-            self.facts_by_source[fact.source].append(fact)
-            
-            # Update keyword index
-            self._update_fact_index(fact, fact_index)
+            self.facts_by_source[fact.source][fact_id] = fact
             
-            # Initialize access tracking
-            self.fact_access_count[fact_index] = 0
-            self.last_access_time[fact_index] = time.time()
+            # Update columns and text indices
+            self.columns.set_row(fact_id, fact, time.time())
+            self.text_index.add(fact_id, fact.content)
+            self.duplicate_index.add(fact_id, fact.content)
             
             self.total_facts_added += 1
             
             # Check if we need to archive old facts
-            if len(self.facts) > self.max_facts:
+            if self.fact_count > self.max_facts:
                 await self._archive_old_facts()
             
             self.logger.debug(f"Added fact: {fact.content[:50]}...")
@@ -89,30 +140,41 @@ class ImmediateMemory:
     async def retrieve_relevant_facts(self, 
                                     query: str, 
                                     context: Optional[Dict[str, Any]] = None,
-                                    max_facts: int = 10) -> List[Fact]:
-        """Retrieve facts relevant to a query"""
+                                    max_facts: int = 10,
+                                    count_access: bool = True) -> List[Fact]:
+        """Retrieve facts relevant to a query.
+        
+        Candidates are the best BM25 matches from the text index; their text
+        scores, relative to the best match, are then combined with the
+        importance, recency, access and context boosts. Without
+        `count_access`, the caller counts an access to the facts it uses
+        with `record_access`.
+        """
         try:
             self.retrieval_count += 1
+            if max_facts <= 0:
+                return []
             
-            # Calculate relevance scores for all facts
-            scored_facts = []
-            query_lower = query.lower()
+            fact_ids, text_scores = self.text_index.search_arrays(query, max(self.rerank_candidates, max_facts))
+            if len(fact_ids) == 0:
+                return []
             
-            for i, fact in enumerate(self.facts):
-                relevance_score = self._calculate_relevance(fact, query_lower, context, i)
-                
-                if relevance_score >= self.relevance_threshold:
-                    scored_facts.append((relevance_score, i, fact))
+            # Rerank the candidates
+            now = time.time()
+            scores = text_scores / text_scores[0] + self._calculate_boosts(fact_ids, context, now)
+            
+            relevant = np.flatnonzero(scores >= self.relevance_threshold)
+            if len(relevant) > max_facts:
+                relevant = relevant[np.argpartition(scores[relevant], -max_facts)[-max_facts:]]
             
             # Sort by relevance score (descending)
-            scored_facts.sort(key=lambda x: x[0], reverse=True)
+            top_ids = fact_ids[relevant[np.argsort(scores[relevant])[::-1]]]
             
             # Update access tracking
-            relevant_facts = []
-            for score, fact_index, fact in scored_facts[:max_facts]:
-                self.fact_access_count[fact_index] += 1
-                self.last_access_time[fact_index] = time.time()
-                relevant_facts.append(fact)
+            if count_access:
+                self.columns.access_count[top_ids] += 1
+                self.columns.last_access[top_ids] = now
+            relevant_facts = [self.slots[fact_id] for fact_id in top_ids]
             
             self.logger.debug(f"Retrieved {len(relevant_facts)} relevant facts for query: {query[:30]}...")
             return relevant_facts
@@ -121,238 +183,164 @@ class ImmediateMemory:
             self.logger.error(f"Error retrieving facts: {e}")
             return []
     
-    def _calculate_relevance(self, 
-                           fact: Fact, 
-                           query_lower: str,
-                           context: Optional[Dict[str, Any]],
-                           fact_index: int) -> float:
-        """Calculate relevance score for a fact"""
-        score = 0.0
-        fact_content_lower = fact.content.lower()
-        
-        # Keyword matching
-        query_words = set(query_lower.split())
-        fact_words = set(fact_content_lower.split())
-        
-        # Exact word matches
-        word_matches = len(query_words.intersection(fact_words))
-        if word_matches > 0:
-            score += word_matches * 0.3
-        
-        # Partial word matches
-        for query_word in query_words:
-            for fact_word in fact_words:
-                if query_word in fact_word or fact_word in query_word:
-                    score += 0.1
-        
-        # Boost based on fact importance
-        score += fact.importance * 0.2
+    def record_access(self, facts: List[Fact]):
+        """Count an access to facts that were retrieved and used"""
+        used = {id(fact) for fact in facts}
+        fact_ids = [fact_id for fact_id, fact in enumerate(self.slots) if fact is not None and id(fact) in used]
+        if fact_ids:
+            self.columns.access_count[fact_ids] += 1
+            self.columns.last_access[fact_ids] = time.time()
+    
+    def _calculate_boosts(self, 
+                          rows: np.ndarray, 
+                          context: Optional[Dict[str, Any]],
+                          now: float) -> np.ndarray:
+        """Calculate the part of the relevance of facts that does not depend on the query text"""
+        columns = self.columns
         
-        # Boost based on fact confidence
-        score += fact.confidence * 0.1
+        # Boost based on fact importance and confidence
+        scores = columns.importance[rows] * 0.2 + columns.confidence[rows] * 0.1
         
         # Boost recent facts
-        age_hours = (time.time() - fact.timestamp) / 3600
-        if age_hours < 1:
-            score += 0.2
-        elif age_hours < 24:
-            score += 0.1
+        age_hours = (now - columns.timestamp[rows]) / 3600
+        scores += np.where(age_hours < 1, 0.2, np.where(age_hours < 24, 0.1, 0.0))
         
         # Boost frequently accessed facts
-        access_boost = min(self.fact_access_count[fact_index] * 0.05, 0.2)
-        score += access_boost
+        scores += np.minimum(columns.access_count[rows] * 0.05, 0.2)
         
         # Context-based boosting
         if context:
+            categories = columns.category[rows]
+            
             # Boost facts from same source
-            if fact.source == context.get('last_source'):
-                score += 0.1
+            if context.get('last_source') is not None:
+                scores += (columns.source[rows] == columns.source_code(context['last_source'])) * 0.1
             
             # Boost facts from same category as recent activity
-            if fact.category == context.get('active_category'):
-                score += 0.1
+            if context.get('active_category') is not None:
+                scores += (categories == columns.category_code(context['active_category'])) * 0.1
             
             # Boost object-related facts if objects are detected
-            if context.get('detections') and fact.category == 'objects':
-                score += 0.15
+            if context.get('detections'):
+                scores += (categories == columns.category_code('objects')) * 0.15
         
-        return score
+        return scores
     
     def _is_duplicate(self, new_fact: Fact) -> bool:
-        """Check if a fact is a duplicate"""
-        new_content_lower = new_fact.content.lower()
-        
-        for existing_fact in self.facts:
-            existing_content_lower = existing_fact.content.lower()
-            
-            # Exact match
-            if new_content_lower == existing_content_lower:
-                return True
-            
-            # High similarity (simple check)
-            if self._similarity_score(new_content_lower, existing_content_lower) > 0.8:
-                return True
-        
-        return False
-    
-    def _similarity_score(self, text1: str, text2: str) -> float:
-        """Calculate simple similarity score between two texts"""
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
+        """Check if a fact is a duplicate.
         
-        return intersection / union if union > 0 else 0.0
-    
-    def _update_fact_index(self, fact: Fact, fact_index: int):
-        """Update keyword index for fast fact lookup"""
-        words = fact.content.lower().split()
-        for word in words:
-            # Remove punctuation
-            word = ''.join(c for c in word if c.isalnum())
-            if len(word) > 2:  # Only index words longer than 2 characters
-                self.fact_index[word].add(fact_index)
+        A fact is a duplicate if its text matches a stored fact ignoring
+        case, or if the Jaccard similarity of their word sets is above
+        `duplicate_threshold`.
+        """
+        return self.duplicate_index.find_duplicate(new_fact.content) is not None
     
     async def _archive_old_facts(self):
         """Archive old facts to make room for new ones"""
         try:
-            # Calculate archival scores for all facts
-            archival_candidates = []
-            
-            for i, fact in enumerate(self.facts):
-                archival_score = self._calculate_archival_score(fact, i)
-                archival_candidates.append((archival_score, i, fact))
+            archival_scores = self._calculate_archival_scores()
             
-            # Sort by archival score (ascending - lower scores get archived first)
-            archival_candidates.sort(key=lambda x: x[0])
+            # Archive the lowest scoring facts until we're under the limit
+            facts_to_archive = min(self.fact_count - self.max_facts + 10, self.fact_count)  # Archive a few extra
+            if facts_to_archive <= 0:
+                return
+            lowest = np.argpartition(archival_scores, facts_to_archive - 1)[:facts_to_archive]
             
-            # Archive facts until we're under the limit
-            facts_to_archive = len(self.facts) - self.max_facts + 10  # Archive a few extra
-            
-            archived_indices = set()
-            for i in range(min(facts_to_archive, len(archival_candidates))):
-                score, fact_index, fact = archival_candidates[i]
-                self.archived_facts.append(fact)
-                archived_indices.add(fact_index)
-                self.total_facts_archived += 1
+            archived = self._facts_in_order(lowest)
+            self.archived_facts.extend(archived)
+            self.total_facts_archived += len(archived)
             
             # Remove archived facts from active memory
-            self._remove_facts_by_indices(archived_indices)
+            for fact_id in lowest:
+                self._remove_fact(int(fact_id))
             
             # Trim archived facts if too many
             if len(self.archived_facts) > self.max_archived:
                 self.archived_facts = self.archived_facts[-self.max_archived:]
             
             self.archival_decisions += 1
-            self.logger.info(f"Archived {len(archived_indices)} facts")
+            self.logger.info(f"Archived {len(archived)} facts")
             
         except Exception as e:
             self.logger.error(f"Error archiving facts: {e}")
     
-    def _calculate_archival_score(self, fact: Fact, fact_index: int) -> float:
-        """Calculate score for archival decision (lower = more likely to archive)"""
-        score = 0.0
+    def _calculate_archival_scores(self) -> np.ndarray:
+        """Calculate scores of all fact ids for archival decisions (lower = more likely to archive).
+        
+        Free ids score infinity so that they are never picked.
+        """
+        columns = self.columns
+        size = columns.size
+        now = time.time()
         
         # Age factor (older facts more likely to be archived)
-        age_hours = (time.time() - fact.timestamp) / 3600
-        score -= age_hours * 0.1
+        scores = (now - columns.timestamp[:size]) / 3600 * -0.1
         
         # Importance factor (important facts less likely to be archived)
-        score += fact.importance * 100
+        scores += columns.importance[:size] * 100
         
         # Access frequency factor
-        score += self.fact_access_count[fact_index] * 10
+        scores += columns.access_count[:size] * 10
         
         # Recent access factor
-        if fact_index in self.last_access_time:
-            hours_since_access = (time.time() - self.last_access_time[fact_index]) / 3600
-            score -= hours_since_access * 0.05
+        scores -= (now - columns.last_access[:size]) / 3600 * 0.05
         
         # Category factor (some categories more important)
-        category_weights = {
-            'personal': 1.0,
-            'preferences': 0.8,
-            'abilities': 0.9,
-            'objects': 0.3,
-            'actions': 0.4,
-            'temporal': 0.5,
-            'spatial': 0.6,
-            'general': 0.5
-        }
-        score += category_weights.get(fact.category, 0.5) * 50
+        category_weights = np.array([CATEGORY_WEIGHTS.get(name, 0.5) for name in columns.category_names])
+        scores += category_weights[columns.category[:size]] * 50
         
-        return score
+        scores[~columns.live[:size]] = np.inf
+        return scores
     
-    def _remove_facts_by_indices(self, indices_to_remove: Set[int]):
-        """Remove facts by their indices and update all data structures"""
-        # Create mapping of old indices to new indices
-        index_mapping = {}
-        new_facts = []
-        
-        for old_index, fact in enumerate(self.facts):
-            if old_index not in indices_to_remove:
-                new_index = len(new_facts)
-                index_mapping[old_index] = new_index
-                new_facts.append(fact)
-        
-        # Update main facts list
-        self.facts = new_facts
-        
-        # Rebuild category and source indices
-        self.facts_by_category = defaultdict(list)
-        self.facts_by_source = defaultdict(list)
-        
-        for fact in self.facts:
-            self.facts_by_category[fact.category].append(fact)
-            self.facts_by_source[fact.source].append(fact)
-        
-        # Rebuild keyword index
-        self.fact_index = defaultdict(set)
-        for new_index, fact in enumerate(self.facts):
-            self._update_fact_index(fact, new_index)
-        
-        # Update access tracking with new indices
-        new_access_count = defaultdict(int)
-        new_last_access = {}
-        
-        for old_index, new_index in index_mapping.items():
-            if old_index in self.fact_access_count:
-                new_access_count[new_index] = self.fact_access_count[old_index]
-            if old_index in self.last_access_time:
-                new_last_access[new_index] = self.last_access_time[old_index]
-        
-        self.fact_access_count = new_access_count
-        self.last_access_time = new_last_access
+    def _remove_fact(self, fact_id: int):
+        """Remove a fact from memory and every index, freeing its id"""
+        fact = self.slots[fact_id]
+        self.slots[fact_id] = None
+        self.free_slots.append(fact_id)
+        self.fact_count -= 1
+        
+        # Drop the fact from the category and source indices
+        for index, key in ((self.facts_by_category, fact.category), (self.facts_by_source, fact.source)):
+            facts = index[key]
+            del facts[fact_id]
+            if not facts:
+                del index[key]
+        
+        self.columns.release(fact_id)
+        self.text_index.remove(fact_id)
+        self.duplicate_index.remove(fact_id)
     
     def get_facts_by_category(self, category: str) -> List[Fact]:
         """Get all facts from a specific category"""
-        return self.facts_by_category[category].copy()
+        return list(self.facts_by_category.get(category, {}).values())
     
     def get_facts_by_source(self, source: str) -> List[Fact]:
         """Get all facts from a specific source"""
-        return self.facts_by_source[source].copy()
+        return list(self.facts_by_source.get(source, {}).values())
     
     def get_recent_facts(self, hours: float = 1.0) -> List[Fact]:
         """Get facts from the last N hours"""
         cutoff_time = time.time() - (hours * 3600)
-        return [fact for fact in self.facts if fact.timestamp >= cutoff_time]
+        columns = self.columns
+        fact_ids = np.flatnonzero(columns.live[:columns.size] & (columns.timestamp[:columns.size] >= cutoff_time))
+        return self._facts_in_order(fact_ids)
     
     def get_important_facts(self, min_importance: float = 0.7) -> List[Fact]:
         """Get facts above a certain importance threshold"""
-        return [fact for fact in self.facts if fact.importance >= min_importance]
+        columns = self.columns
+        fact_ids = np.flatnonzero(columns.live[:columns.size] & (columns.importance[:columns.size] >= min_importance))
+        return self._facts_in_order(fact_ids)
     
     def clear_memory(self):
         """Clear all facts from memory"""
-        self.facts = []
-        self.facts_by_category = defaultdict(list)
-        self.facts_by_source = defaultdict(list)
-        self.fact_index = defaultdict(set)
-        self.fact_access_count = defaultdict(int)
-        self.last_access_time = {}
+        self.slots = []
+        self.free_slots = []
+        self.fact_count = 0
+        self.facts_by_category = defaultdict(dict)
+        self.facts_by_source = defaultdict(dict)
+        self.columns.clear()
+        self.text_index.clear()
+        self.duplicate_index.clear()
         self.logger.info("Cleared immediate memory")
     
     def get_statistics(self) -> Dict[str, Any]:
@@ -361,7 +349,7 @@ class ImmediateMemory:
         source_counts = {src: len(facts) for src, facts in self.facts_by_source.items()}
         
         return {
-            'total_facts': len(self.facts),
+            'total_facts': self.fact_count,
             'max_facts': self.max_facts,
             'facts_by_category': category_counts,
             'facts_by_source': source_counts,
@@ -370,8 +358,8 @@ class ImmediateMemory:
             'archived_facts_count': len(self.archived_facts),
             'retrieval_count': self.retrieval_count,
             'archival_decisions': self.archival_decisions,
-            'memory_utilization': len(self.facts) / self.max_facts,
-            'keyword_index_size': len(self.fact_index)
+            'memory_utilization': self.fact_count / self.max_facts,
+            'keyword_index_size': len(self.text_index.postings)
         }
     
     def export_facts(self) -> List[Dict[str, Any]]:
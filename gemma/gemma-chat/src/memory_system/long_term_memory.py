@@ -1,20 +1,22 @@
-"""Long-term memory using Milvus and Neo4j"""
+"""Long-term memory using a vector store (Milvus or local) and Neo4j"""
 
 import logging
 import asyncio
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 import json
+import os
+import re
+import threading
+import zlib
 import numpy as np
 
+from .embedding_cache import EmbeddingCache
 from .fact_distiller import Fact
-
-try:
-    from pymilvus import connections, Collection, CollectionSchema, FieldSchema, DataType, utility
-    MILVUS_AVAILABLE = True
-except ImportError:
-    MILVUS_AVAILABLE = False
-    logging.warning("PyMilvus not available, using mock vector storage")
+from .text_index import tokenize
+from .vector_store import VectorStore, MilvusVectorStore, LocalVectorStore, SearchFilter, MILVUS_AVAILABLE
 
 try:
     from neo4j import GraphDatabase
@@ -39,7 +41,18 @@ class LongTermMemory:
                  neo4j_uri: str = "bolt://localhost:7687",
                  neo4j_user: str = "neo4j",
                  neo4j_password: str = "password",
-                 embedding_model: str = "all-MiniLM-L6-v2"):
+                 embedding_model: str = "all-MiniLM-L6-v2",
+                 batch_size: int = 64,
+                 batch_window: float = 0.05,
+                 flush_interval: float = 5.0,
+                 max_queue_size: int = 10000,
+                 embedding_cache_dir: Optional[str] = "data/embeddings",
+                 embedding_cache_size: int = 2048,
+                 embedding_disk_cache_size: int = 100000,
+                 vector_backend: str = "auto",
+                 vector_store_dir: Optional[str] = "data/vectors",
+                 vector_exact_limit: int = 20000,
+                 search_workers: int = 2):
         
         self.milvus_host = milvus_host
         self.milvus_port = milvus_port
@@ -47,28 +60,67 @@ class LongTermMemory:
         self.neo4j_user = neo4j_user
         self.neo4j_password = neo4j_password
         self.embedding_model_name = embedding_model
+        self.vector_backend = vector_backend
+        self.vector_store_dir = vector_store_dir
+        self.vector_exact_limit = vector_exact_limit
         
         self.logger = logging.getLogger(__name__)
         
         # Database connections
-        self.milvus_collection = None
+        self.vector_store: Optional[VectorStore] = None
         self.neo4j_driver = None
         self.embedding_model = None
         
+        # Embeddings of previously encoded texts, by model
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_size = embedding_cache_size
+        self.embedding_disk_cache_size = embedding_disk_cache_size
+        
         # Collection configuration
         self.collection_name = "gemma_facts"
         self.embedding_dim = 384  # Default for all-MiniLM-L6-v2
         
+        # Write-behind ingestion: facts are queued and stored in batches of up
+        # to batch_size, collected for at most batch_window seconds. The vector
+        # store is flushed every flush_interval seconds rather than after each
+        # insert
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.flush_interval = flush_interval
+        self.ingest_queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.ingest_task: Optional[asyncio.Task] = None
+        # Set whenever a fact is queued, so a timed wait never takes one off the queue
+        self.fact_queued = asyncio.Event()
+        self.last_vector_flush = time.time()
+        
+        # Blocking database and embedding calls run on this executor so that
+        # they do not stall the event loop. A single worker keeps writes in
+        # order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="long_term_memory")
+        # Searches get their own workers so they never wait behind a batch
+        # write. A search abandoned by its caller still occupies a worker
+        # until it finishes, so searches running is tracked per worker
+        self.search_workers = search_workers
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="long_term_search")
+        self.search_lock = threading.Lock()
+        self.searches_running = 0
+        
         # Statistics
         self.stored_facts = 0
         self.retrieved_facts = 0
-        self.embedding_times = []
-        self.storage_times = []
-        self.retrieval_times = []
+        self.skipped_searches = 0
+        self.embedding_times = deque(maxlen=100)
+        self.storage_times = deque(maxlen=100)
+        self.retrieval_times = deque(maxlen=100)
+        self.batch_times = deque(maxlen=100)
+        self.batch_sizes = deque(maxlen=100)
+        self.batches_stored = 0
+        self.failed_facts = 0
         
         # Initialize components
         self._initialize_embeddings()
-        self._initialize_milvus()
+        self._initialize_vector_store()
         self._initialize_neo4j()
     
     def _initialize_embeddings(self):
@@ -78,63 +130,53 @@ class LongTermMemory:
                 self.embedding_model = SentenceTransformer(self.embedding_model_name)
                 self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
                 self.logger.info(f"Loaded embedding model: {self.embedding_model_name}")
+                
+                self.embedding_cache = EmbeddingCache(
+                    self.embedding_cache_dir,
+                    self.embedding_model_name,
+                    self.embedding_dim,
+                    memory_size=self.embedding_cache_size,
+                    disk_capacity=self.embedding_disk_cache_size
+                )
             else:
                 self.logger.warning("Using mock embedding model")
         except Exception as e:
             self.logger.error(f"Error loading embedding model: {e}")
             self.embedding_model = None
     
-    def _initialize_milvus(self):
-        """Initialize Milvus vector database"""
-        try:
-            if not MILVUS_AVAILABLE:
-                self.logger.warning("Using mock vector storage")
+    def _initialize_vector_store(self):
+        """Initialize the vector store: Milvus if reachable, else a local store"""
+        if self.vector_backend in ("auto", "milvus"):
+            try:
+                if MILVUS_AVAILABLE:
+                    self.vector_store = MilvusVectorStore(self.milvus_host, self.milvus_port,
+                                                          self.collection_name, self.embedding_dim)
+                    return
+            except Exception as e:
+                self.logger.error(f"Error connecting to Milvus: {e}")
+            
+            if self.vector_backend == "milvus":
+                self.logger.warning("Milvus not available, long-term memory will not store vectors")
                 return
             
-            # Connect to Milvus
-            connections.connect("default", host=self.milvus_host, port=self.milvus_port)
-            
-            # Create collection if it doesn't exist
-            if not utility.has_collection(self.collection_name):
-                self._create_milvus_collection()
-            
-            # Load collection
-            self.milvus_collection = Collection(self.collection_name)
-            self.milvus_collection.load()
-            
-            self.logger.info(f"Connected to Milvus collection: {self.collection_name}")
-            
+        try:
+            # Vectors of different embedding models must not be compared, so
+            # each model, or the hashed mock embeddings, gets its own directory
+            directory = None
+            if self.vector_store_dir:
+                model_name = self.embedding_model_name if self.embedding_model else "hashed"
+                safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+                directory = os.path.join(self.vector_store_dir, f"{safe_name}_{self.embedding_dim}")
+            
+            self.vector_store = LocalVectorStore(
+                self.embedding_dim,
+                directory=directory,
+                exact_limit=self.vector_exact_limit
+            )
+            self.logger.info(f"Using local vector store with {len(self.vector_store)} vectors")
         except Exception as e:
-            self.logger.error(f"Error connecting to Milvus: {e}")
-            self.milvus_collection = None
-    
-    def _create_milvus_collection(self):
-        """Create Milvus collection schema"""
-        fields = [
-            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-            FieldSchema(name="fact_id", dtype=DataType.VARCHAR, max_length=256),
-            FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=2048),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.embedding_dim),
-            FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=64),
-            FieldSchema(name="importance", dtype=DataType.FLOAT),
-            FieldSchema(name="confidence", dtype=DataType.FLOAT),
-            FieldSchema(name="timestamp", dtype=DataType.DOUBLE),
-            FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=128),
-            FieldSchema(name="metadata", dtype=DataType.VARCHAR, max_length=1024)
-        ]
-        
-        schema = CollectionSchema(fields, description="Gemma fact storage")
-        collection = Collection(self.collection_name, schema)
-        
-        # Create index for vector search
-        index_params = {
-            "metric_type": "IP",  # Inner Product
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 128}
-        }
-        collection.create_index("embedding", index_params)
-        
-        self.logger.info(f"Created Milvus collection: {self.collection_name}")
+            self.logger.error(f"Error opening local vector store: {e}")
+            self.vector_store = None
     
     def _initialize_neo4j(self):
         """Initialize Neo4j graph database"""
@@ -192,140 +234,218 @@ class LongTermMemory:
         except Exception as e:
             self.logger.error(f"Error creating Neo4j schema: {e}")
     
+    def _fact_id(self, fact: Fact) -> str:
+        """Generate a unique fact ID"""
+        return f"{fact.source}_{int(fact.timestamp)}_{zlib.crc32(fact.content.encode('utf-8')) % 10000}"
+    
+    def _ensure_ingestion(self):
+        """Start the ingestion task if it is not running"""
+        if self.ingest_task is None or self.ingest_task.done():
+            self.ingest_task = asyncio.create_task(self._ingestion_loop())
+    
+    async def enqueue_fact(self, fact: Fact) -> asyncio.Future:
+        """Queue a fact for storage.
+        
+        Returns a future that resolves to whether the fact was stored. Waits
+        while the queue is full.
+        """
+        self._ensure_ingestion()
+        future = asyncio.get_running_loop().create_future()
+        await self.ingest_queue.put((fact, future))
+        self.fact_queued.set()
+        return future
+    
     async def store_fact(self, fact: Fact) -> bool:
-        """Store a fact in long-term memory"""
+        """Store a fact in long-term memory, waiting until its batch is written"""
+        try:
+            return await (await self.enqueue_fact(fact))
+        except Exception as e:
+            self.logger.error(f"Error storing fact: {e}")
+            return False
+    
+    async def flush(self):
+        """Wait until every queued fact has been stored"""
+        if self.ingest_task is not None and not self.ingest_task.done():
+            await self.ingest_queue.join()
+    
+    async def _ingestion_loop(self):
+        """Collect queued facts into batches and store them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.ingest_queue.get()]
+            
+            # Fill the batch until it is full or the window has passed
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                if not self.ingest_queue.empty():
+                    batch.append(self.ingest_queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # Wait on the event rather than get(): before Python 3.12 a
+                # get() finishing as the timeout fires loses its item
+                self.fact_queued.clear()
+                try:
+                    await asyncio.wait_for(self.fact_queued.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._store_batch(batch)
+            finally:
+                for _ in batch:
+                    self.ingest_queue.task_done()
+    
+    async def _store_batch(self, batch: List[Tuple[Fact, asyncio.Future]]):
+        """Store a batch of queued facts and resolve their futures"""
         start_time = time.time()
+        facts = [fact for fact, _ in batch]
         
         try:
-            # Generate unique fact ID
-            fact_id = f"{fact.source}_{int(fact.timestamp)}_{hash(fact.content) % 10000}"
-            
-            # Generate embedding
-            embedding = await self._generate_embedding(fact.content)
-            if embedding is None:
-                return False
-            
-            # Store in vector database
-            vector_success = await self._store_in_milvus(fact, fact_id, embedding)
-            
-            # Store in graph database
-            graph_success = await self._store_in_neo4j(fact, fact_id)
-            
-            if vector_success or graph_success:  # Success if at least one storage method works
-                self.stored_facts += 1
-                storage_time = time.time() - start_time
-                self.storage_times.append(storage_time)
-                
-                if len(self.storage_times) > 100:
-                    self.storage_times.pop(0)
-                
-                self.logger.debug(f"Stored fact in long-term memory: {fact.content[:50]}...")
-                return True
-            
+            stored = await asyncio.get_running_loop().run_in_executor(self.executor, self._write_batch, facts)
         except Exception as e:
-            self.logger.error(f"Error storing fact: {e}")
+            self.logger.error(f"Error storing fact batch: {e}")
+            stored = False
+        
+        for _, future in batch:
+            if not future.done():
+                future.set_result(stored)
         
-        return False
+        if stored:
+            self.stored_facts += len(facts)
+            self.batches_stored += 1
+            batch_time = time.time() - start_time
+            self.batch_times.append(batch_time)
+            self.batch_sizes.append(len(facts))
+            # Storage time per fact, for comparison with single-fact writes
+            self.storage_times.append(batch_time / len(facts))
+            self.logger.debug(f"Stored {len(facts)} facts in long-term memory in {batch_time * 1000:.1f}ms")
+        else:
+            self.failed_facts += len(facts)
     
-    async def _generate_embedding(self, text: str) -> Optional[np.ndarray]:
-        """Generate embedding for text"""
+    def _write_batch(self, facts: List[Fact]) -> bool:
+        """Embed and store a batch of facts (runs on the executor)"""
+        fact_ids = [self._fact_id(fact) for fact in facts]
+        
+        # Generate embeddings
+        embeddings = self._encode([fact.content for fact in facts])
+        if embeddings is None:
+            return False
+        
+        # Store in vector database
+        vector_success = self._store_batch_in_vector_store(facts, fact_ids, embeddings)
+        
+        # Store in graph database
+        graph_success = self._store_batch_in_neo4j(facts, fact_ids)
+        
+        # Success if at least one storage method works
+        return vector_success or graph_success
+    
+    def _encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Generate embeddings for texts, encoding the uncached ones in one call"""
         start_time = time.time()
         
         try:
             if self.embedding_model:
-                embedding = self.embedding_model.encode([text])[0]
-                
-                embedding_time = time.time() - start_time
-                self.embedding_times.append(embedding_time)
-                
-                if len(self.embedding_times) > 100:
-                    self.embedding_times.pop(0)
+                if self.embedding_cache is None:
+                    embeddings = self.embedding_model.encode(texts, batch_size=len(texts))
+                    self.embedding_times.append((time.time() - start_time) / len(texts))
+                    return embeddings
+            
+                cached = self.embedding_cache.get_many(texts)
+                missing = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+                if missing:
+                    encoded = self.embedding_model.encode(missing, batch_size=len(missing))
+                    self.embedding_times.append((time.time() - start_time) / len(missing))
+            
+                    new_embeddings = dict(zip(missing, encoded))
+                    for text, embedding in new_embeddings.items():
+                        self.embedding_cache.put(text, embedding)
+                    cached = [new_embeddings[text] if embedding is None else embedding
+                              for text, embedding in zip(texts, cached)]
                 
-                return embedding
+                return np.stack(cached)
             else:
-                # Mock embedding
-                return np.random.random(self.embedding_dim).astype(np.float32)
-                
+                # Mock embeddings
+                return np.stack([self._mock_embedding(text) for text in texts])
+            
         except Exception as e:
-            self.logger.error(f"Error generating embedding: {e}")
+            self.logger.error(f"Error generating embeddings: {e}")
             return None
     
-    async def _store_in_milvus(self, fact: Fact, fact_id: str, embedding: np.ndarray) -> bool:
-        """Store fact in Milvus vector database"""
+    def _mock_embedding(self, text: str) -> np.ndarray:
+        """Feature-hashed bag of words, so that texts sharing words stay similar without a model"""
+        embedding = np.zeros(self.embedding_dim, dtype=np.float32)
+        for term in tokenize(text):
+            term_hash = zlib.crc32(term.encode("utf-8"))
+            embedding[term_hash % self.embedding_dim] += 1.0 if term_hash & 0x80000000 else -1.0
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def _store_batch_in_vector_store(self, facts: List[Fact], fact_ids: List[str], embeddings: np.ndarray) -> bool:
+        """Store facts in the vector store with one insert"""
         try:
-            if not self.milvus_collection:
+            if self.vector_store is None:
                 return False
             
             # Prepare data
-            data = [
-                [fact_id],
-                [fact.content],
-                [embedding.tolist()],
-                [fact.category],
-                [fact.importance],
-                [fact.confidence],
-                [fact.timestamp],
-                [fact.source],
-                [json.dumps({"related_facts": fact.related_facts})]
-            ]
-            
-            # Insert data
-            mr = self.milvus_collection.insert(data)
-            self.milvus_collection.flush()
-            
-            return len(mr.primary_keys) > 0
+            records = [{
+                "fact_id": fact_id,
+                "content": fact.content,
+                "category": fact.category,
+                "importance": fact.importance,
+                "confidence": fact.confidence,
+                "timestamp": fact.timestamp,
+                "source": fact.source,
+                "metadata": json.dumps({"related_facts": fact.related_facts})
+            } for fact, fact_id in zip(facts, fact_ids)]
+            
+            # Insert data and flush periodically
+            inserted = self.vector_store.insert(records, embeddings)
+            if time.time() - self.last_vector_flush >= self.flush_interval:
+                self.vector_store.flush()
+                self.last_vector_flush = time.time()
+            
+            return inserted > 0
             
         except Exception as e:
-            self.logger.error(f"Error storing in Milvus: {e}")
+            self.logger.error(f"Error storing in vector store: {e}")
             return False
     
-    async def _store_in_neo4j(self, fact: Fact, fact_id: str) -> bool:
-        """Store fact in Neo4j graph database"""
+    def _store_batch_in_neo4j(self, facts: List[Fact], fact_ids: List[str]) -> bool:
+        """Store facts in Neo4j graph database with one transaction"""
         try:
             if not self.neo4j_driver:
                 return False
             
-            with self.neo4j_driver.session() as session:
-                # Create fact node
-                session.run("""
-                    MERGE (f:Fact {id: $fact_id})
-                    SET f.content = $content,
-                        f.category = $category,
-                        f.importance = $importance,
-                        f.confidence = $confidence,
-                        f.timestamp = $timestamp,
-                        f.source = $source
-                """, {
-                    "fact_id": fact_id,
-                    "content": fact.content,
-                    "category": fact.category,
-                    "importance": fact.importance,
-                    "confidence": fact.confidence,
-                    "timestamp": fact.timestamp,
-                    "source": fact.source
-                })
+            rows = [{
+                "fact_id": fact_id,
+                "content": fact.content,
+                "category": fact.category,
+                "importance": fact.importance,
+                "confidence": fact.confidence,
+                "timestamp": fact.timestamp,
+                "source": fact.source
+            } for fact, fact_id in zip(facts, fact_ids)]
                 
-                # Create category node and relationship
-                session.run("""
-                    MERGE (c:Category {name: $category})
-                    WITH c
-                    MATCH (f:Fact {id: $fact_id})
+            with self.neo4j_driver.session() as session:
+                # Create fact nodes with their category and source nodes and
+                # relationships
+                session.execute_write(lambda tx: tx.run("""
+                    UNWIND $facts AS fact
+                    MERGE (f:Fact {id: fact.fact_id})
+                    SET f.content = fact.content,
+                        f.category = fact.category,
+                        f.importance = fact.importance,
+                        f.confidence = fact.confidence,
+                        f.timestamp = fact.timestamp,
+                        f.source = fact.source
+                    MERGE (c:Category {name: fact.category})
                     MERGE (f)-[:BELONGS_TO]->(c)
-                """, {
-                    "category": fact.category,
-                    "fact_id": fact_id
-                })
-                
-                # Create source node and relationship
-                session.run("""
-                    MERGE (s:Source {name: $source})
-                    WITH s
-                    MATCH (f:Fact {id: $fact_id})
+                    MERGE (s:Source {name: fact.source})
                     MERGE (f)-[:ORIGINATED_FROM]->(s)
-                """, {
-                    "source": fact.source,
-                    "fact_id": fact_id
-                })
+                """, {"facts": rows}).consume())
             
             return True
             
@@ -336,90 +456,125 @@ class LongTermMemory:
     async def search_facts(self, 
                           query: str,
                           max_results: int = 10,
-                          similarity_threshold: float = 0.7) -> List[Fact]:
+                          similarity_threshold: float = 0.7,
+                          filters: Optional[SearchFilter] = None) -> List[Fact]:
         """Search for facts using semantic similarity"""
+        results, _ = await self.search_facts_batch([query], max_results, similarity_threshold, filters)
+        return results[0]
+    
+    async def search_facts_batch(self,
+                                 queries: List[str],
+                                 k: int = 10,
+                                 similarity_threshold: float = 0.7,
+                                 filters: Optional[SearchFilter] = None,
+                                 skip_if_busy: bool = False) -> Tuple[List[List[Fact]], List[Fact]]:
+        """Search for facts similar to any of several queries at once.
+        
+        The queries are encoded together and searched in one vector store
+        request, off the event loop; `filters` is evaluated by the store. Returns the facts
+        matching each query and all distinct matching facts by best score.
+        A fact matching several queries is the same object in every list.
+        With `skip_if_busy`, nothing is found when every search worker is
+        still busy, instead of waiting for one.
+        """
         start_time = time.time()
         
         try:
-            # Generate query embedding
-            query_embedding = await self._generate_embedding(query)
-            if query_embedding is None:
-                return []
-            
-            # Search in Milvus
-            facts = await self._search_milvus(query_embedding, max_results, similarity_threshold)
+            if not queries or self.vector_store is None:
+                return [[] for _ in queries], []
+            if skip_if_busy and self.searches_running >= self.search_workers:
+                self.skipped_searches += 1
+                return [[] for _ in queries], []
+            
+            # Cancelling the caller cancels the search if it has not started
+            with self.search_lock:
+                self.searches_running += 1
+            future = self.search_executor.submit(self._search_batch, queries, k, similarity_threshold, filters)
+            future.add_done_callback(self._search_finished)
+            matches = await asyncio.wrap_future(future)
+            if matches is None:
+                return [[] for _ in queries], []
+            
+            # Convert results to Fact objects, once per fact
+            facts_by_id: Dict[str, Fact] = {}
+            best_scores: Dict[str, float] = {}
+            results = []
+            for query_matches in matches:
+                query_facts = []
+                for score, record in query_matches:
+                    fact_id = record['fact_id']
+                    if fact_id not in facts_by_id:
+                        facts_by_id[fact_id] = self._record_to_fact(record)
+                    elif facts_by_id[fact_id] in query_facts:
+                        continue
+                    best_scores[fact_id] = max(score, best_scores.get(fact_id, score))
+                    query_facts.append(facts_by_id[fact_id])
+                results.append(query_facts)
+            merged = [facts_by_id[fact_id] for fact_id in sorted(best_scores, key=best_scores.get, reverse=True)]
             
             # Update statistics
-            self.retrieved_facts += len(facts)
+            self.retrieved_facts += len(merged)
             retrieval_time = time.time() - start_time
             self.retrieval_times.append(retrieval_time)
             
-            if len(self.retrieval_times) > 100:
-                self.retrieval_times.pop(0)
+            self.logger.debug(f"Retrieved {len(merged)} facts for {len(queries)} queries: {queries[0][:30]}...")
             
-            self.logger.debug(f"Retrieved {len(facts)} facts for query: {query[:30]}...")
-            
-            return facts
+            return results, merged
             
         except Exception as e:
             self.logger.error(f"Error searching facts: {e}")
-            return []
+            return [[] for _ in queries], []
     
-    async def _search_milvus(self, 
-                           query_embedding: np.ndarray,
-                           max_results: int,
-                           similarity_threshold: float) -> List[Fact]:
-        """Search Milvus for similar facts"""
+    def _search_finished(self, future):
+        """Free a search worker once a search finishes or is cancelled before it starts"""
+        with self.search_lock:
+            self.searches_running -= 1
+    
+    def _search_batch(self,
+                      queries: List[str],
+                      k: int,
+                      similarity_threshold: float,
+                      filters: Optional[SearchFilter]) -> Optional[List[List[Tuple[float, Dict[str, Any]]]]]:
+        """Encode queries and search the vector store (runs on the search executor)"""
+        # Generate query embeddings
+        query_embeddings = self._encode(queries)
+        if query_embeddings is None:
+            return None
+        
+        # Search in the vector store
+        return self.vector_store.search_batch(query_embeddings, k, similarity_threshold, filters)
+    
+    def _record_to_fact(self, record: Dict[str, Any]) -> Fact:
+        """Convert a vector store record to a Fact"""
+        # Parse metadata
+        metadata = {}
         try:
-            if not self.milvus_collection:
-                return []
-            
-            # Search parameters
-            search_params = {
-                "metric_type": "IP",
-                "params": {"nprobe": 10}
-            }
-            
-            # Perform search
-            results = self.milvus_collection.search(
-                [query_embedding.tolist()],
-                "embedding",
-                search_params,
-                limit=max_results,
-                output_fields=["fact_id", "content", "category", "importance", 
-                              "confidence", "timestamp", "source", "metadata"]
-            )
-            
-            # Convert results to Fact objects
-            facts = []
-            for hits in results:
-                for hit in hits:
-                    if hit.score >= similarity_threshold:
-                        entity = hit.entity
+            metadata = json.loads(record.get('metadata') or '{}')
+        except:
+            pass
                         
-                        # Parse metadata
-                        metadata = {}
-                        try:
-                            metadata = json.loads(entity.get('metadata', '{}'))
-                        except:
-                            pass
-                        
-                        fact = Fact(
-                            content=entity.get('content'),
-                            confidence=entity.get('confidence'),
-                            timestamp=entity.get('timestamp'),
-                            source=entity.get('source'),
-                            category=entity.get('category'),
-                            importance=entity.get('importance'),
-                            related_facts=metadata.get('related_facts', [])
-                        )
-                        facts.append(fact)
-            
-            return facts
+        return Fact(
+            content=record.get('content'),
+            confidence=record.get('confidence'),
+            timestamp=record.get('timestamp'),
+            source=record.get('source'),
+            category=record.get('category'),
+            importance=record.get('importance'),
+            related_facts=metadata.get('related_facts', [])
+        )
+    
+    async def delete_facts(self, fact_ids: List[str]) -> int:
+        """Delete facts from the vector store, returning how many were deleted"""
+        try:
+            if self.vector_store is None:
+                return 0
+            
+            await self.flush()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.vector_store.delete, fact_ids)
             
         except Exception as e:
-            self.logger.error(f"Error searching Milvus: {e}")
-            return []
+            self.logger.error(f"Error deleting facts: {e}")
+            return 0
     
     async def get_related_facts(self, fact_id: str, max_depth: int = 2) -> List[Dict[str, Any]]:
         """Get related facts using graph traversal"""
@@ -457,15 +612,18 @@ class LongTermMemory:
             return []
     
     async def archive_facts(self, facts: List[Fact]) -> int:
-        """Archive multiple facts to long-term storage"""
-        archived_count = 0
+        """Queue multiple facts for long-term storage, returning how many were queued"""
+        queued_count = 0
         
         for fact in facts:
-            if await self.store_fact(fact):
-                archived_count += 1
+            try:
+                await self.enqueue_fact(fact)
+                queued_count += 1
+            except Exception as e:
+                self.logger.error(f"Error queueing fact: {e}")
         
-        self.logger.info(f"Archived {archived_count} facts to long-term memory")
-        return archived_count
+        self.logger.info(f"Queued {queued_count} facts for long-term memory")
+        return queued_count
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get long-term memory statistics"""
@@ -475,28 +633,51 @@ class LongTermMemory:
                            if self.storage_times else 0)
         avg_retrieval_time = (sum(self.retrieval_times) / len(self.retrieval_times) 
                              if self.retrieval_times else 0)
+        avg_batch_time = (sum(self.batch_times) / len(self.batch_times) 
+                          if self.batch_times else 0)
+        avg_batch_size = (sum(self.batch_sizes) / len(self.batch_sizes) 
+                          if self.batch_sizes else 0)
         
         return {
-            'milvus_connected': self.milvus_collection is not None,
+            'milvus_connected': isinstance(self.vector_store, MilvusVectorStore),
+            'vector_store': self.vector_store.get_statistics() if self.vector_store is not None else None,
             'neo4j_connected': self.neo4j_driver is not None,
             'embedding_model_loaded': self.embedding_model is not None,
             'stored_facts': self.stored_facts,
             'retrieved_facts': self.retrieved_facts,
+            'searches_running': self.searches_running,
+            'skipped_searches': self.skipped_searches,
             'avg_embedding_time': avg_embedding_time,
             'avg_storage_time': avg_storage_time,
             'avg_retrieval_time': avg_retrieval_time,
-            'embedding_dimension': self.embedding_dim
+            'queue_depth': self.ingest_queue.qsize(),
+            'batches_stored': self.batches_stored,
+            'failed_facts': self.failed_facts,
+            'avg_batch_size': avg_batch_size,
+            'avg_batch_time': avg_batch_time,
+            'max_batch_time': max(self.batch_times, default=0),
+            'embedding_dimension': self.embedding_dim,
+            'embedding_cache': self.embedding_cache.get_statistics() if self.embedding_cache else None
         }
     
     async def close(self):
-        """Close database connections"""
+        """Store queued facts and close database connections"""
         try:
+            # Store what is still queued, then flush and close the vector store
+            await self.flush()
+            if self.ingest_task:
+                self.ingest_task.cancel()
+                await asyncio.gather(self.ingest_task, return_exceptions=True)
+            if self.vector_store is not None:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.vector_store.close)
+            self.executor.shutdown(wait=True)
+            self.search_executor.shutdown(wait=True)
+            if self.embedding_cache:
+                self.embedding_cache.close()
+            
             if self.neo4j_driver:
                 self.neo4j_driver.close()
             
-            if MILVUS_AVAILABLE:
-                connections.disconnect("default")
-            
             self.logger.info("Closed long-term memory connections")
             
         except Exception as e:
@@ -3,11 +3,14 @@
 import asyncio
 import logging
 import time
+from collections import deque
 from typing import Dict, Any, List, Optional
 
-from .fact_distiller import FactDistiller, Fact
+from .fact_distiller import Fact
 from .immediate_memory import ImmediateMemory
 from .long_term_memory import LongTermMemory
+from .hybrid_retriever import HybridRetriever
+from .distillation_pool import DistillationPool
 from ..event_system import EventConsumer, EventProducer, EventType, GemmaEvent
 from ..config import Config
 
@@ -18,21 +21,42 @@ class MemoryManager:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
-        # Memory components
-        self.fact_distiller = FactDistiller(
+        # Memory components; distillation runs in worker processes
+        self.distillation_pool = DistillationPool(
+            self._on_facts_distilled,
             model_name=config.MODEL_NAME if hasattr(config, 'MODEL_NAME') else "microsoft/DialoGPT-medium",
-            cache_dir=config.MODEL_CACHE_DIR if hasattr(config, 'MODEL_CACHE_DIR') else "./models"
+            cache_dir=config.MODEL_CACHE_DIR if hasattr(config, 'MODEL_CACHE_DIR') else "./models",
+            workers=config.DISTILLATION_WORKERS,
+            queue_size=config.DISTILLATION_QUEUE_SIZE,
+            max_batch=config.DISTILLATION_MAX_BATCH
         )
         self.immediate_memory = ImmediateMemory(
             max_facts=config.IMMEDIATE_MEMORY_SIZE,
-            relevance_threshold=0.3
+            relevance_threshold=0.3,
+            duplicate_threshold=config.IMMEDIATE_MEMORY_DUPLICATE_THRESHOLD
         )
         self.long_term_memory = LongTermMemory(
             milvus_host=config.MILVUS_HOST,
             milvus_port=config.MILVUS_PORT,
             neo4j_uri=config.NEO4J_URI,
             neo4j_user=config.NEO4J_USER,
-            neo4j_password=config.NEO4J_PASSWORD
+            neo4j_password=config.NEO4J_PASSWORD,
+            batch_size=config.LONG_TERM_BATCH_SIZE,
+            batch_window=config.LONG_TERM_BATCH_WINDOW,
+            flush_interval=config.LONG_TERM_FLUSH_INTERVAL,
+            embedding_cache_dir=config.EMBEDDING_CACHE_DIR,
+            embedding_cache_size=config.EMBEDDING_CACHE_SIZE,
+            embedding_disk_cache_size=config.EMBEDDING_DISK_CACHE_SIZE,
+            vector_backend=config.VECTOR_STORE_BACKEND,
+            vector_store_dir=config.VECTOR_STORE_DIR,
+            vector_exact_limit=config.VECTOR_STORE_EXACT_LIMIT,
+            search_workers=config.LONG_TERM_SEARCH_WORKERS
+        )
+        
+        self.hybrid_retriever = HybridRetriever(
+            self.immediate_memory,
+            self.long_term_memory,
+            latency_budget=config.MEMORY_RETRIEVAL_BUDGET_MS / 1000
         )
         
         # Event system
@@ -56,7 +80,7 @@ class MemoryManager:
         # Statistics
         self.conversations_processed = 0
         self.facts_injected = 0
-        self.processing_times = []
+        self.processing_times = deque(maxlen=100)
         
         # Register event handlers
         self._register_event_handlers()
@@ -81,8 +105,9 @@ class MemoryManager:
         self.running = True
         self.processing_active = True
         
-        # Start processing loop
+        # Start processing loop and distillation workers
         asyncio.create_task(self._processing_loop())
+        self.distillation_pool.start()
         
         self.logger.info("Memory manager started")
     
@@ -96,6 +121,7 @@ class MemoryManager:
         # Stop event system
         await self.event_consumer.stop_consuming()
         await self.event_producer.disconnect()
+        await self.distillation_pool.close()
         await self.long_term_memory.close()
         
         self.logger.info("Memory manager stopped")
@@ -172,35 +198,38 @@ class MemoryManager:
             if len(self.conversation_buffer) > self.max_buffer_size:
                 self.conversation_buffer.pop(0)
             
-            # Distill facts from the conversation
-            facts = await self.fact_distiller.distill_facts_from_conversation(
-                user_input, assistant_response, context
-            )
-            
-            # Add facts to immediate memory
-            if facts:
-                added_count = await self.immediate_memory.add_facts(facts)
-                self.logger.debug(f"Added {added_count} facts to immediate memory")
-                
-                # Archive important facts to long-term memory
-                important_facts = [f for f in facts if f.importance > 0.7]
-                if important_facts:
-                    archived_count = await self.long_term_memory.archive_facts(important_facts)
-                    self.logger.debug(f"Archived {archived_count} important facts to long-term memory")
+            # Distill facts in the background, see _on_facts_distilled
+            self.distillation_pool.submit(user_input, assistant_response, context)
             
             # Update statistics
             processing_time = time.time() - start_time
             self.conversations_processed += 1
             self.processing_times.append(processing_time)
             
-            if len(self.processing_times) > 100:
-                self.processing_times.pop(0)
-            
-            self.logger.debug(f"Processed conversation in {processing_time:.2f}s, distilled {len(facts)} facts")
+            self.logger.debug(f"Processed conversation in {processing_time:.2f}s")
             
         except Exception as e:
             self.logger.error(f"Error processing conversation: {e}")
     
+    async def _on_facts_distilled(self, event: GemmaEvent):
+        """Store the facts of a FACT_DISTILLED event and publish it"""
+        facts = [Fact.from_dict(data) for data in event.data.get('facts', [])]
+            
+        # Add facts to immediate memory
+        if facts:
+            added_count = await self.immediate_memory.add_facts(facts)
+            self.logger.debug(f"Added {added_count} facts to immediate memory")
+                
+            # Queue important facts for batched storage in long-term memory
+            important_facts = [f for f in facts if f.importance > 0.7]
+            if important_facts:
+                queued_count = await self.long_term_memory.archive_facts(important_facts)
+                self.logger.debug(f"Queued {queued_count} important facts for long-term memory")
+            
+        # Let other components see the facts
+        if self.event_producer.connected:
+            await self.event_producer.send_event(event)
+    
     async def inject_relevant_facts(self,
                                   query: str,
                                   context: Optional[Dict[str, Any]] = None,
@@ -228,11 +257,16 @@ class MemoryManager:
                                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Get memory context for model inference"""
         try:
-            # Get relevant facts from immediate memory
-            relevant_facts = await self.inject_relevant_facts(query, context)
-            
-            # Search long-term memory for additional relevant facts
-            long_term_facts = await self.long_term_memory.search_facts(query, max_results=5)
+            # Get relevant facts from immediate and long-term memory, fused
+            # into one ranking within the retrieval budget. Detected objects
+            # and the active category are searched in long-term memory too
+            extra_queries = []
+            if context:
+                extra_queries.extend(detection.get('class_name') for detection in context.get('detections') or [])
+                extra_queries.append(context.get('active_category'))
+            relevant_facts = await self.hybrid_retriever.retrieve(query, context, max_facts=5,
+                                                                  extra_queries=extra_queries)
+            self.facts_injected += len(relevant_facts)
             
             # Get recent facts
             recent_facts = self.immediate_memory.get_recent_facts(hours=1.0)
@@ -243,11 +277,10 @@ class MemoryManager:
             # Format facts for injection
             memory_context = {
                 'relevant_facts': [fact.content for fact in relevant_facts],
-                'long_term_facts': [fact.content for fact in long_term_facts],
                 'recent_facts': [fact.content for fact in recent_facts[-5:]],  # Last 5 recent facts
                 'important_facts': [fact.content for fact in important_facts[-3:]],  # Top 3 important facts
-                'fact_count': len(self.immediate_memory.facts),
-                'memory_utilization': len(self.immediate_memory.facts) / self.immediate_memory.max_facts
+                'fact_count': len(self.immediate_memory),
+                'memory_utilization': len(self.immediate_memory) / self.immediate_memory.max_facts
             }
             
             return memory_context
@@ -328,7 +361,8 @@ class MemoryManager:
             'conversation_buffer_size': len(self.conversation_buffer),
             'immediate_memory': self.immediate_memory.get_statistics(),
             'long_term_memory': self.long_term_memory.get_statistics(),
-            'fact_distiller': self.fact_distiller.get_statistics(),
+            'hybrid_retriever': self.hybrid_retriever.get_statistics(),
+            'fact_distiller': self.distillation_pool.get_statistics(),
             'queue_size': self.processing_queue.qsize()
         }
     
@@ -341,7 +375,7 @@ class MemoryManager:
         for category, facts in self.immediate_memory.facts_by_category.items():
             if facts:
                 # Get most recent fact from each category
-                recent_fact = max(facts, key=lambda f: f.timestamp)
+                recent_fact = max(facts.values(), key=lambda f: f.timestamp)
                 category_samples[category] = recent_fact.content[:100] + "..." if len(recent_fact.content) > 100 else recent_fact.content
         
         return {
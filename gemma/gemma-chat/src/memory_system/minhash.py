@@ -0,0 +1,150 @@
+"""MinHash signatures and LSH banding for near-duplicate fact detection"""
+
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+def word_set(text: str) -> FrozenSet[str]:
+    """Lowercase words of a text, as compared for duplicates"""
+    return frozenset(text.lower().split())
+
+def jaccard_similarity(words1: FrozenSet[str], words2: FrozenSet[str]) -> float:
+    """Jaccard similarity of two word sets"""
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+def choose_bands(num_perm: int, threshold: float, recall: float = 0.999) -> Tuple[int, int]:
+    """Pick (bands, rows per band) for a signature length and threshold.
+    
+    Uses the longest bands, which produce the fewest false candidates,
+    that still make a pair at exactly the threshold a candidate with
+    probability `recall`.
+    """
+    for rows in range(num_perm, 0, -1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+class MinHashIndex:
+    """Finds stored texts whose word sets are near duplicates of a new one.
+    
+    Each text gets a MinHash signature, and the signature is split into
+    bands that are hashed into buckets: texts sharing any band bucket are
+    candidates, and only candidates are compared exactly. Lookups therefore
+    cost about the same however many texts are stored. A pair with
+    similarity at the threshold is missed with probability below 0.1%.
+    """
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        
+        # Multiply-shift hash functions, one per permutation
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.offsets = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        
+        # Folds the rows of a band into a single 64-bit bucket key
+        self.band_weights = rng.integers(1, 2 ** 63, size=self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        
+        # Exact duplicates by lowercase text
+        self.exact: Dict[str, int] = {}
+        # doc_id -> lowercase text, word set and band keys
+        self.doc_texts: Dict[int, str] = {}
+        self.doc_words: Dict[int, FrozenSet[str]] = {}
+        self.doc_bands: Dict[int, List[int]] = {}
+        # (band, band key) -> doc ids
+        self.buckets: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+    
+    def __len__(self) -> int:
+        return len(self.doc_texts)
+    
+    def signature(self, words: FrozenSet[str]) -> np.ndarray:
+        """MinHash signature of a non-empty word set"""
+        hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words),
+                             dtype=np.uint64, count=len(words))
+        with np.errstate(over="ignore"):
+            values = (self.multipliers[:, None] * hashes[None, :] + self.offsets[:, None]) >> np.uint64(32)
+        return values.min(axis=1)
+    
+    def _band_keys(self, words: FrozenSet[str]) -> List[int]:
+        """Bucket key of each band of a word set's signature"""
+        bands = self.signature(words).reshape(self.bands, self.rows)
+        with np.errstate(over="ignore"):
+            return (bands * self.band_weights).sum(axis=1).tolist()
+    
+    def add(self, doc_id: int, text: str):
+        """Index a text"""
+        self.remove(doc_id)
+        text = text.lower()
+        self.exact.setdefault(text, doc_id)
+        self.doc_texts[doc_id] = text
+        
+        words = word_set(text)
+        self.doc_words[doc_id] = words
+        if not words:
+            return
+        
+        band_keys = self._band_keys(words)
+        self.doc_bands[doc_id] = band_keys
+        for band, key in enumerate(band_keys):
+            self.buckets[(band, key)].add(doc_id)
+    
+    def remove(self, doc_id: int):
+        """Remove a text from the index"""
+        text = self.doc_texts.pop(doc_id, None)
+        if text is None:
+            return
+        
+        del self.doc_words[doc_id]
+        if self.exact.get(text) == doc_id:
+            del self.exact[text]
+        
+        for band, key in enumerate(self.doc_bands.pop(doc_id, ())):
+            bucket = self.buckets[(band, key)]
+            bucket.discard(doc_id)
+            if not bucket:
+                del self.buckets[(band, key)]
+    
+    def clear(self):
+        """Remove every text"""
+        self.exact = {}
+        self.doc_texts = {}
+        self.doc_words = {}
+        self.doc_bands = {}
+        self.buckets = defaultdict(set)
+    
+    def find_duplicate(self, text: str) -> Optional[int]:
+        """Id of a stored text equal to or more similar than the threshold to `text`"""
+        doc_id = self.exact.get(text.lower())
+        if doc_id is not None:
+            return doc_id
+        
+        words = word_set(text)
+        if not words:
+            return None
+        
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(words)):
+            candidates.update(self.buckets.get((band, key), ()))
+        
+        for doc_id in candidates:
+            if jaccard_similarity(words, self.doc_words[doc_id]) > self.threshold:
+                return doc_id
+        return None
+    
+    def get_statistics(self) -> Dict[str, int]:
+        """Get index statistics"""
+        return {
+            'texts': len(self.doc_texts),
+            'bands': self.bands,
+            'rows_per_band': self.rows,
+            'buckets': len(self.buckets)
+        }
@@ -0,0 +1,217 @@
+"""Inverted text index with BM25 scoring for fact retrieval"""
+
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could did do does for from had has have he her him his
+how i if in into is it its me my no not of on or our she so than that the their them then there
+these they this to was we were what when where which who will with would you your
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase index terms, skipping stopwords"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.replace("'", "")
+        if token and token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+def _ngrams(term: str, size: int) -> Set[str]:
+    return {term[i:i + size] for i in range(len(term) - size + 1)}
+
+class TextIndex:
+    """Inverted index over short documents, scored with BM25.
+    
+    Documents are identified by integer ids chosen by the caller, and are
+    added and removed one at a time. Besides exact term matches, query
+    terms also match indexed terms that contain them or are contained in
+    them ("bike" and "motorbike"), found through an n-gram index over the
+    vocabulary and scored at a discount.
+    
+    Postings are kept in dicts so that documents can be added and removed
+    cheaply, and are packed into NumPy arrays, the columns of a sparse
+    term-document matrix, the first time a term is searched after it
+    changed. Scoring a query is then one vectorized expression per term.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75, partial_weight: float = 0.3,
+                 ngram_size: int = 3, max_partial_terms: int = 16):
+        self.k1 = k1
+        self.b = b
+        self.partial_weight = partial_weight
+        self.ngram_size = ngram_size
+        self.max_partial_terms = max_partial_terms
+        
+        # term -> {doc_id: term frequency}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        # doc_id -> {term: term frequency}, needed to remove a document
+        self.doc_terms: Dict[int, Dict[str, int]] = {}
+        self.total_length = 0
+        
+        # Packed postings: term -> (doc ids, term frequencies)
+        self.term_columns: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Document lengths by doc id
+        self.lengths = np.zeros(128, dtype=np.float32)
+        
+        # n-gram -> indexed terms containing it, for partial matches
+        self.ngram_index: Dict[str, Set[str]] = defaultdict(set)
+    
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+    
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.doc_terms
+    
+    def add(self, doc_id: int, text: str):
+        """Index a document, replacing any previous one with the same id"""
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        
+        terms: Dict[str, int] = {}
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + 1
+        
+        for term, frequency in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                for ngram in _ngrams(term, self.ngram_size):
+                    self.ngram_index[ngram].add(term)
+            postings[doc_id] = frequency
+            self.term_columns.pop(term, None)
+        
+        if doc_id >= len(self.lengths):
+            grown = np.zeros(max(doc_id + 1, len(self.lengths) * 2), dtype=np.float32)
+            grown[:len(self.lengths)] = self.lengths
+            self.lengths = grown
+        
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = terms
+        self.lengths[doc_id] = length
+        self.total_length += length
+    
+    def remove(self, doc_id: int):
+        """Remove a document from the index"""
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        
+        self.total_length -= int(self.lengths[doc_id])
+        self.lengths[doc_id] = 0
+        for term in terms:
+            self.term_columns.pop(term, None)
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                for ngram in _ngrams(term, self.ngram_size):
+                    terms_with_ngram = self.ngram_index[ngram]
+                    terms_with_ngram.discard(term)
+                    if not terms_with_ngram:
+                        del self.ngram_index[ngram]
+    
+    def clear(self):
+        """Remove every document"""
+        self.postings = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self.term_columns = {}
+        self.lengths = np.zeros(128, dtype=np.float32)
+        self.ngram_index = defaultdict(set)
+    
+    def _partial_terms(self, term: str) -> List[str]:
+        """Indexed terms containing `term` or contained in it, rarest first"""
+        if len(term) < self.ngram_size:
+            return []
+        
+        # Terms containing the query term share all of its n-grams
+        ngrams = sorted(_ngrams(term, self.ngram_size),
+                        key=lambda ngram: len(self.ngram_index.get(ngram, ())))
+        candidates = set(self.ngram_index.get(ngrams[0], ()))
+        for ngram in ngrams[1:]:
+            if not candidates:
+                break
+            candidates &= self.ngram_index.get(ngram, set())
+        matches = {candidate for candidate in candidates if term in candidate}
+        
+        # Terms contained in the query term are among its substrings
+        for length in range(self.ngram_size, len(term)):
+            for start in range(len(term) - length + 1):
+                substring = term[start:start + length]
+                if substring in self.postings:
+                    matches.add(substring)
+        
+        matches.discard(term)
+        return sorted(matches, key=lambda match: len(self.postings[match]))[:self.max_partial_terms]
+    
+    def _term_column(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids and term frequencies of a term as arrays"""
+        column = self.term_columns.get(term)
+        if column is None:
+            postings = self.postings[term]
+            column = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            self.term_columns[term] = column
+        return column
+    
+    def search_arrays(self, query: str, limit: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Best matching doc ids and their scores, highest score first"""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        if not self.doc_terms or limit <= 0:
+            return empty
+        
+        document_count = len(self.doc_terms)
+        average_length = self.total_length / document_count or 1.0
+        k1 = self.k1
+        length_norm = k1 * self.b / average_length
+        base_norm = k1 * (1 - self.b)
+        
+        # Query terms with their weight: exact matches count in full,
+        # partial matches at a discount
+        weighted_terms: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                weighted_terms[term] = 1.0
+            for match in self._partial_terms(term):
+                weighted_terms.setdefault(match, self.partial_weight)
+        if not weighted_terms:
+            return empty
+        
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        touched = []
+        for term, weight in weighted_terms.items():
+            doc_ids, frequencies = self._term_column(term)
+            idf = math.log(1 + (document_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += (weight * idf * (k1 + 1)) * frequencies / (
+                frequencies + base_norm + length_norm * self.lengths[doc_ids])
+            touched.append(doc_ids)
+        
+        # Top matches without sorting every match
+        matches = np.unique(np.concatenate(touched))
+        if len(matches) > limit:
+            matches = matches[np.argpartition(scores[matches], -limit)[-limit:]]
+        matches = matches[np.argsort(scores[matches])[::-1]]
+        return matches, scores[matches]
+    
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, int]]:
+        """Best matching documents as (score, doc_id), highest score first"""
+        doc_ids, scores = self.search_arrays(query, limit)
+        return [(float(score), int(doc_id)) for doc_id, score in zip(doc_ids, scores)]
+    
+    def get_statistics(self) -> Dict[str, int]:
+        """Get index statistics"""
+        return {
+            'documents': len(self.doc_terms),
+            'terms': len(self.postings),
+            'postings': sum(len(postings) for postings in self.postings.values()),
+            'ngrams': len(self.ngram_index)
+        }
@@ -0,0 +1,814 @@
+"""Vector stores holding fact embeddings for long-term memory
+
+A store keeps one record per fact (its fields, see RECORD_FIELDS) next to
+its embedding, and finds the records whose embeddings have the highest
+inner product with a query embedding, optionally only among records
+meeting a SearchFilter. Several queries can be searched at once.
+
+MilvusVectorStore keeps them in a Milvus collection. LocalVectorStore
+keeps them in the process, for a single box without a Milvus server:
+embeddings are rows of a memory-mapped float32 matrix, searched exactly
+with one matrix product while the store is small and through an IVF
+index (k-means clusters of rows, of which the closest few are searched)
+once it grows past `exact_limit`.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from pymilvus import connections, Collection, CollectionSchema, FieldSchema, DataType, utility
+    MILVUS_AVAILABLE = True
+except ImportError:
+    MILVUS_AVAILABLE = False
+    logging.warning("PyMilvus not available, using mock vector storage")
+
+# Fields of a stored fact record
+RECORD_FIELDS = ("fact_id", "content", "category", "importance", "confidence", "timestamp", "source", "metadata")
+
+@dataclass
+class SearchFilter:
+    """Conditions on record metadata that search matches must meet"""
+    categories: Optional[List[str]] = None
+    since: Optional[float] = None  # Earliest timestamp
+    until: Optional[float] = None  # Latest timestamp
+    min_importance: Optional[float] = None
+    
+    def to_expression(self) -> str:
+        """The filter as a Milvus boolean expression"""
+        conditions = []
+        if self.categories is not None:
+            conditions.append(f"category in {json.dumps(list(self.categories))}")
+        if self.since is not None:
+            conditions.append(f"timestamp >= {float(self.since)!r}")
+        if self.until is not None:
+            conditions.append(f"timestamp <= {float(self.until)!r}")
+        if self.min_importance is not None:
+            conditions.append(f"importance >= {float(self.min_importance)!r}")
+        return " and ".join(conditions)
+    
+    def matches(self, record: Dict[str, Any]) -> bool:
+        """Whether a record meets the filter"""
+        return ((self.categories is None or record["category"] in self.categories)
+                and (self.since is None or record["timestamp"] >= self.since)
+                and (self.until is None or record["timestamp"] <= self.until)
+                and (self.min_importance is None or record["importance"] >= self.min_importance))
+
+class VectorStore:
+    """Base class of vector stores"""
+    
+    name = "base"
+    
+    def insert(self, records: List[Dict[str, Any]], embeddings: np.ndarray) -> int:
+        """Store records with their embeddings, returning how many were stored"""
+        raise NotImplementedError
+    
+    def search(self, query_embedding: np.ndarray, limit: int, threshold: float = 0.0,
+               filters: Optional[SearchFilter] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """Records scoring at least `threshold` against a query as (score, record), best first"""
+        return self.search_batch(np.asarray(query_embedding)[None], limit, threshold, filters)[0]
+    
+    def search_batch(self, query_embeddings: np.ndarray, limit: int, threshold: float = 0.0,
+                     filters: Optional[SearchFilter] = None) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        """Search for each row of `query_embeddings`, returning the matches of each query"""
+        raise NotImplementedError
+    
+    def delete(self, fact_ids: List[str]) -> int:
+        """Delete the records of facts, returning how many were deleted"""
+        raise NotImplementedError
+    
+    def flush(self):
+        """Make stored records durable"""
+    
+    def close(self):
+        """Flush and release the store"""
+        self.flush()
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        return {'backend': self.name}
+
+class MilvusVectorStore(VectorStore):
+    """Vector store backed by a Milvus collection"""
+    
+    name = "milvus"
+    
+    def __init__(self, host: str, port: int, collection_name: str, dimension: int):
+        if not MILVUS_AVAILABLE:
+            raise RuntimeError("PyMilvus not available")
+        
+        self.collection_name = collection_name
+        self.dimension = dimension
+        self.logger = logging.getLogger(__name__)
+        
+        # Connect to Milvus
+        connections.connect("default", host=host, port=port)
+        
+        # Create collection if it doesn't exist
+        if not utility.has_collection(collection_name):
+            self._create_collection()
+        
+        # Load collection
+        self.collection = Collection(collection_name)
+        self.collection.load()
+        
+        self.logger.info(f"Connected to Milvus collection: {collection_name}")
+    
+    def _create_collection(self):
+        """Create Milvus collection schema"""
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="fact_id", dtype=DataType.VARCHAR, max_length=256),
+            FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=2048),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
+            FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=64),
+            FieldSchema(name="importance", dtype=DataType.FLOAT),
+            FieldSchema(name="confidence", dtype=DataType.FLOAT),
+            FieldSchema(name="timestamp", dtype=DataType.DOUBLE),
+            FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=128),
+            FieldSchema(name="metadata", dtype=DataType.VARCHAR, max_length=1024)
+        ]
+        
+        schema = CollectionSchema(fields, description="Gemma fact storage")
+        collection = Collection(self.collection_name, schema)
+        
+        # Create index for vector search
+        index_params = {
+            "metric_type": "IP",  # Inner Product
+            "index_type": "IVF_FLAT",
+            "params": {"nlist": 128}
+        }
+        collection.create_index("embedding", index_params)
+        
+        self.logger.info(f"Created Milvus collection: {self.collection_name}")
+    
+    def insert(self, records: List[Dict[str, Any]], embeddings: np.ndarray) -> int:
+        data = [
+            [record["fact_id"] for record in records],
+            [record["content"] for record in records],
+            [embedding.tolist() for embedding in embeddings],
+            [record["category"] for record in records],
+            [record["importance"] for record in records],
+            [record["confidence"] for record in records],
+            [record["timestamp"] for record in records],
+            [record["source"] for record in records],
+            [record["metadata"] for record in records]
+        ]
+        mr = self.collection.insert(data)
+        return len(mr.primary_keys)
+    
+    def search_batch(self, query_embeddings: np.ndarray, limit: int, threshold: float = 0.0,
+                     filters: Optional[SearchFilter] = None) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        # Search parameters
+        search_params = {
+            "metric_type": "IP",
+            "params": {"nprobe": 10}
+        }
+        
+        # One request for all queries, with the filter evaluated by Milvus
+        results = self.collection.search(
+            [embedding.tolist() for embedding in query_embeddings],
+            "embedding",
+            search_params,
+            limit=limit,
+            expr=(filters.to_expression() or None) if filters else None,
+            output_fields=list(RECORD_FIELDS)
+        )
+        
+        matches = []
+        for hits in results:
+            query_matches = []
+            for hit in hits:
+                if hit.score >= threshold:
+                    query_matches.append((hit.score, {field: hit.entity.get(field) for field in RECORD_FIELDS}))
+            matches.append(query_matches)
+        return matches
+    
+    def delete(self, fact_ids: List[str]) -> int:
+        if not fact_ids:
+            return 0
+        result = self.collection.delete(f"fact_id in {json.dumps(list(fact_ids))}")
+        return result.delete_count
+    
+    def flush(self):
+        # Inserted rows are searchable before a flush, which only seals segments
+        self.collection.flush()
+    
+    def close(self):
+        self.flush()
+        connections.disconnect("default")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'collection': self.collection_name
+        }
+
+class LocalVectorStore(VectorStore):
+    """Vector store kept in the process, optionally persisted to a directory.
+    
+    Rows are only appended: deleting a record leaves a tombstone, and rows
+    are compacted when a snapshot finds more than a quarter of them
+    deleted. With a directory, the embedding matrix is a memory-mapped
+    file and `snapshot` writes the records and the IVF index next to it;
+    the store restores the last snapshot when it is opened. Between
+    snapshots, `flush` only appends the inserts and deletes since the
+    last flush to a records log, which is replayed on restore, and takes
+    a full snapshot once the log has grown to half the store or the index
+    has changed. Rows inserted after the last flush are lost on a crash.
+    
+    Compaction renumbers rows, so it writes the remaining rows to the
+    embedding and index files of a new generation rather than in place.
+    The state file names the generation it belongs to and is replaced
+    last, so an interrupted snapshot leaves the previous one readable;
+    files of other generations are removed once a state no longer needs
+    them.
+    """
+    
+    name = "local"
+    
+    VECTORS_FILE = "vectors.f32"
+    STATE_FILE = "state.json"
+    INDEX_FILE = "ivf.npz"
+    LOG_FILE = "records.log"
+    GENERATION_FILE_PATTERN = re.compile(r"^(vectors|ivf|records)(?:\.(\d+))?\.(f32|npz|log)$")
+    
+    # Log entries a flush may append before it takes a full snapshot instead
+    MIN_LOG_ENTRIES = 1024
+    
+    def __init__(self,
+                 dimension: int,
+                 directory: Optional[str] = None,
+                 exact_limit: int = 20000,
+                 nprobe: int = 8,
+                 initial_capacity: int = 1024):
+        self.dimension = dimension
+        self.directory = directory
+        self.exact_limit = exact_limit
+        self.nprobe = nprobe
+        self.logger = logging.getLogger(__name__)
+        
+        # Inserts run on the long-term memory executor while searches run on
+        # its search executor, a different thread
+        self.lock = threading.RLock()
+        
+        # Rows, including deleted ones, are below count
+        self.count = 0
+        self.capacity = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.records: List[Optional[Dict[str, Any]]] = []
+        self.deleted = np.zeros(0, dtype=bool)
+        self.deleted_count = 0
+        self.rows_by_fact_id: Dict[str, int] = {}
+        self.dirty = False
+        # Generation of the embedding and index files, advanced by compaction
+        self.generation = 0
+        
+        # Records log: entries not yet written, entries in the log since the
+        # last snapshot, and whether the next flush must take a snapshot; the
+        # log is replayed over a state, so the first flush writes one
+        self.log_entries: List[Dict[str, Any]] = []
+        self.log_length = 0
+        self.snapshot_due = True
+        
+        # Metadata columns for filtering, with categories as integer codes
+        self.timestamps = np.zeros(0, dtype=np.float64)
+        self.importances = np.zeros(0, dtype=np.float32)
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.category_codes: Dict[str, int] = {}
+        
+        # IVF index: cluster centroids, the cluster of each row and the rows
+        # of each cluster. Rows added since the lists were packed are kept in
+        # Python lists until the next search
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists: List[np.ndarray] = []
+        self.pending: List[List[int]] = []
+        self.trained_size = 0
+        # Training runs without the lock; compaction and restore renumber
+        # rows, which invalidates an index trained meanwhile
+        self.training = False
+        self.layout_version = 0
+        
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._allocate(initial_capacity)
+        if directory:
+            self.restore()
+    
+    # Storage
+    
+    @staticmethod
+    def _generation_path(directory: str, name: str, generation: int) -> str:
+        """Path of a file of a generation; generation 0 uses the plain name"""
+        if generation:
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}.{generation}{extension}"
+        return os.path.join(directory, name)
+    
+    def _remove_other_generations(self, directory: str):
+        """Delete embedding and index files not belonging to the current generation"""
+        for filename in os.listdir(directory):
+            match = self.GENERATION_FILE_PATTERN.match(filename)
+            if match and int(match.group(2) or 0) != self.generation:
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError as e:
+                    self.logger.warning(f"Could not remove stale vector store file {filename}: {e}")
+    
+    def _allocate(self, capacity: int):
+        """Grow the embedding matrix and per-row arrays to a capacity"""
+        if self.directory:
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            self.vectors = None
+            
+            path = self._generation_path(self.directory, self.VECTORS_FILE, self.generation)
+            size = capacity * self.dimension * 4
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        else:
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            if self.vectors is not None:
+                vectors[:self.count] = self.vectors[:self.count]
+        self.vectors = vectors
+        
+        for name, dtype, fill in (("deleted", bool, False), ("assignments", np.int32, -1),
+                                  ("timestamps", np.float64, 0.0), ("importances", np.float32, 0.0),
+                                  ("categories", np.int32, -1)):
+            column = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+        self.capacity = capacity
+    
+    def __len__(self) -> int:
+        return self.count - self.deleted_count
+    
+    def insert(self, records: List[Dict[str, Any]], embeddings: np.ndarray) -> int:
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(records), self.dimension)
+        with self.lock:
+            # A record replaces any earlier one of the same fact
+            for record in records:
+                row = self.rows_by_fact_id.get(record["fact_id"])
+                if row is not None:
+                    self._delete_row(row)
+            
+            if self.count + len(records) > self.capacity:
+                self._allocate(max(self.count + len(records), self.capacity * 2))
+            
+            rows = np.arange(self.count, self.count + len(records))
+            self.vectors[rows] = embeddings
+            for row, record in zip(rows, records):
+                self.records.append(dict(record))
+                self.rows_by_fact_id[record["fact_id"]] = int(row)
+                self._set_columns(row, record)
+                if self.directory:
+                    self.log_entries.append({'row': int(row), 'record': self.records[row]})
+            self.count += len(records)
+            self.dirty = True
+            
+            if self.centroids is not None:
+                self._assign(rows)
+            train = not self.training and len(self) >= self.exact_limit and len(self) >= 2 * self.trained_size
+            if train:
+                self.training = True
+        
+        if train:
+            self._train()
+        return len(records)
+    
+    def _set_columns(self, row: int, record: Dict[str, Any]):
+        """Copy the filterable fields of a record into the metadata columns"""
+        category = record["category"]
+        code = self.category_codes.get(category)
+        if code is None:
+            code = self.category_codes[category] = len(self.category_codes)
+        self.categories[row] = code
+        self.timestamps[row] = record["timestamp"]
+        self.importances[row] = record["importance"]
+    
+    def _delete_row(self, row: int):
+        record = self.records[row]
+        if record is None:
+            return
+        self.records[row] = None
+        self.deleted[row] = True
+        self.deleted_count += 1
+        if self.rows_by_fact_id.get(record["fact_id"]) == row:
+            del self.rows_by_fact_id[record["fact_id"]]
+        if self.directory:
+            self.log_entries.append({'delete': int(row)})
+        self.dirty = True
+    
+    def delete(self, fact_ids: List[str]) -> int:
+        with self.lock:
+            deleted = 0
+            for fact_id in fact_ids:
+                row = self.rows_by_fact_id.get(fact_id)
+                if row is not None:
+                    self._delete_row(row)
+                    deleted += 1
+            return deleted
+    
+    def _compact(self):
+        """Drop deleted rows, renumbering the remaining ones"""
+        live_rows = np.flatnonzero(~self.deleted[:self.count])
+        vectors = np.array(self.vectors[live_rows])
+        columns = {name: getattr(self, name)[live_rows] for name in ("assignments", "timestamps", "importances", "categories")}
+        
+        self.records = [self.records[row] for row in live_rows]
+        self.rows_by_fact_id = {record["fact_id"]: row for row, record in enumerate(self.records)}
+        self.count = len(live_rows)
+        self.deleted[:] = False
+        self.deleted_count = 0
+        self.layout_version += 1
+        if self.directory:
+            # The last snapshot still uses the current files
+            self.vectors.flush()
+            self.generation += 1
+            path = self._generation_path(self.directory, self.VECTORS_FILE, self.generation)
+            self.vectors = np.memmap(path, dtype=np.float32, mode="w+", shape=(self.capacity, self.dimension))
+        self.vectors[:self.count] = vectors
+        self.assignments[:] = -1
+        for name, column in columns.items():
+            getattr(self, name)[:self.count] = column
+        if self.centroids is not None:
+            self._build_lists()
+        
+        self.logger.info(f"Compacted local vector store to {self.count} rows")
+    
+    # IVF index
+    
+    def _train(self):
+        """Cluster the live rows and assign every row to a cluster.
+        
+        Only taking the sample and installing the index hold the lock, so
+        searches and inserts go on while the clusters are computed. Rows
+        below the captured count are never rewritten in place, so reading
+        them from the captured matrix without the lock is safe.
+        """
+        try:
+            with self.lock:
+                layout_version = self.layout_version
+                count = self.count
+                vectors = self.vectors
+                live_rows = np.flatnonzero(~self.deleted[:count])
+                nlist = min(4096, max(16, int(4 * math.sqrt(len(live_rows)))))
+                
+                rng = np.random.default_rng(0)
+                sample_rows = rng.choice(live_rows, size=min(len(live_rows), nlist * 64), replace=False)
+                sample = self._normalized(np.array(vectors[np.sort(sample_rows)]))
+            
+            # Spherical k-means on a sample of the rows
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+            for _ in range(10):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=nlist)
+                # Keep the old centroid of an empty cluster
+                centroids = np.where(counts[:, None] > 0, self._normalized(sums), centroids)
+            centroids = centroids.astype(np.float32)
+            assignments = self._nearest_clusters(vectors, live_rows, centroids)
+            
+            with self.lock:
+                if self.layout_version != layout_version:
+                    self.logger.info("Discarding IVF index trained before the rows were renumbered")
+                    return
+                
+                self.centroids = centroids
+                self.trained_size = len(live_rows)
+                self.assignments[:] = -1
+                self.assignments[live_rows] = assignments
+                # The old lists belong to the old clusters, whose number may differ
+                self.lists = []
+                self._build_lists()
+                # Rows inserted while training
+                if self.count > count:
+                    self._assign(np.arange(count, self.count))
+                self.dirty = True
+                self.snapshot_due = True
+        finally:
+            self.training = False
+        
+        self.logger.info(f"Trained IVF index with {nlist} clusters over {len(live_rows)} rows")
+    
+    @staticmethod
+    def _normalized(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    @staticmethod
+    def _nearest_clusters(vectors: np.ndarray, rows: np.ndarray, centroids: np.ndarray,
+                          chunk_size: int = 8192) -> np.ndarray:
+        """Closest centroid of each of the rows"""
+        clusters = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            clusters[start:start + chunk_size] = np.argmax(vectors[chunk] @ centroids.T, axis=1)
+        return clusters
+    
+    def _assign(self, rows: np.ndarray, chunk_size: int = 8192):
+        """Assign rows to their closest cluster"""
+        self.assignments[rows] = self._nearest_clusters(self.vectors, rows, self.centroids, chunk_size)
+        
+        if len(rows) > chunk_size or not self.lists:
+            self._build_lists()
+        else:
+            for row in rows:
+                self.pending[self.assignments[row]].append(int(row))
+    
+    def _build_lists(self):
+        """Rebuild the row lists of all clusters from the assignments"""
+        rows = np.flatnonzero(self.assignments[:self.count] >= 0)
+        order = np.argsort(self.assignments[rows], kind="stable")
+        bounds = np.searchsorted(self.assignments[rows][order], np.arange(len(self.centroids) + 1))
+        sorted_rows = rows[order]
+        self.lists = [sorted_rows[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.pending = [[] for _ in range(len(self.centroids))]
+    
+    def _cluster_rows(self, cluster: int) -> np.ndarray:
+        if self.pending[cluster]:
+            self.lists[cluster] = np.concatenate([self.lists[cluster], np.array(self.pending[cluster], dtype=np.int64)])
+            self.pending[cluster] = []
+        return self.lists[cluster]
+    
+    # Search
+    
+    def _filter_mask(self, rows: np.ndarray, filters: Optional[SearchFilter]) -> np.ndarray:
+        """Which of the rows are live and meet the filter"""
+        mask = ~self.deleted[rows]
+        if filters is None:
+            return mask
+        
+        if filters.categories is not None:
+            codes = [self.category_codes[category] for category in filters.categories if category in self.category_codes]
+            mask &= np.isin(self.categories[rows], codes)
+        if filters.since is not None:
+            mask &= self.timestamps[rows] >= filters.since
+        if filters.until is not None:
+            mask &= self.timestamps[rows] <= filters.until
+        if filters.min_importance is not None:
+            mask &= self.importances[rows] >= filters.min_importance
+        return mask
+    
+    def search_batch(self, query_embeddings: np.ndarray, limit: int, threshold: float = 0.0,
+                     filters: Optional[SearchFilter] = None) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        with self.lock:
+            if len(self) == 0 or limit <= 0 or len(queries) == 0:
+                return [[] for _ in queries]
+            
+            # The filter is applied before scoring. If few rows meet it, they
+            # are searched exactly even when there is an IVF index, since the
+            # closest clusters might hold too few of them
+            matching = None
+            if filters is not None or self.centroids is None:
+                matching = np.flatnonzero(self._filter_mask(np.arange(self.count), filters))
+            
+            if self.centroids is None:
+                # Exact search over every row, as one matrix product
+                rows = matching
+                scores = (queries @ self.vectors[:self.count].T)[:, rows]
+            elif matching is not None and len(matching) <= self.exact_limit // 4:
+                rows = matching
+                scores = queries @ self.vectors[rows].T
+            else:
+                # Exact search over the rows of the clusters closest to any query
+                nprobe = min(self.nprobe, len(self.centroids))
+                clusters = np.argpartition(queries @ self.centroids.T, -nprobe, axis=1)[:, -nprobe:]
+                rows = np.sort(np.concatenate([self._cluster_rows(cluster) for cluster in np.unique(clusters)]))
+                rows = rows[self._filter_mask(rows, filters)]
+                scores = queries @ self.vectors[rows].T
+            
+            if len(rows) == 0:
+                return [[] for _ in queries]
+            
+            # Top matches of each query without sorting every row
+            if len(rows) > limit:
+                top = np.argpartition(scores, -limit, axis=1)[:, -limit:]
+            else:
+                top = np.broadcast_to(np.arange(len(rows)), (len(queries), len(rows)))
+            
+            matches = []
+            for query_scores, query_top in zip(scores, top):
+                top_scores = query_scores[query_top]
+                order = np.argsort(top_scores)[::-1]
+                matches.append([(float(top_scores[i]), dict(self.records[rows[query_top[i]]]))
+                                for i in order if top_scores[i] >= threshold])
+            return matches
+    
+    # Snapshots
+    
+    def snapshot(self, directory: Optional[str] = None) -> bool:
+        """Write the store to a directory, by default its own.
+        
+        The embeddings are written first and the records last, so an
+        interrupted snapshot leaves the previous one readable. A store
+        with its own directory compacts deleted rows only in snapshots
+        written there.
+        """
+        directory = directory or self.directory
+        if not directory:
+            return False
+        
+        with self.lock:
+            if directory == self.directory and not self.dirty:
+                return True
+            if self.deleted_count > self.count // 4 and (directory == self.directory or not self.directory):
+                self._compact()
+            
+            os.makedirs(directory, exist_ok=True)
+            if directory == self.directory:
+                self.vectors.flush()
+            else:
+                np.asarray(self.vectors[:self.count]).tofile(
+                    self._generation_path(directory, self.VECTORS_FILE, self.generation))
+            
+            index_path = self._generation_path(directory, self.INDEX_FILE, self.generation)
+            if self.centroids is not None:
+                with open(index_path + ".tmp", "wb") as f:
+                    np.savez(f, centroids=self.centroids, assignments=self.assignments[:self.count])
+                os.replace(index_path + ".tmp", index_path)
+            elif os.path.exists(index_path):
+                os.remove(index_path)
+            
+            state = {
+                'dimension': self.dimension,
+                'generation': self.generation,
+                'count': self.count,
+                'trained_size': self.trained_size,
+                'records': self.records[:self.count]
+            }
+            state_path = os.path.join(directory, self.STATE_FILE)
+            with open(state_path + ".tmp", "w") as f:
+                json.dump(state, f)
+            os.replace(state_path + ".tmp", state_path)
+            
+            # The state now holds everything the log did
+            log_path = self._generation_path(directory, self.LOG_FILE, self.generation)
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            self._remove_other_generations(directory)
+            
+            if directory == self.directory:
+                self.dirty = False
+                self.log_entries = []
+                self.log_length = 0
+                self.snapshot_due = False
+            return True
+    
+    def restore(self, directory: Optional[str] = None) -> bool:
+        """Replace the contents of the store with a snapshot, by default its own"""
+        directory = directory or self.directory
+        state_path = os.path.join(directory or "", self.STATE_FILE)
+        if not directory or not os.path.exists(state_path):
+            return False
+        
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state['dimension'] != self.dimension:
+                self.logger.warning(f"Ignoring vector store snapshot of dimension {state['dimension']} in {directory}")
+                return False
+            
+            with self.lock:
+                count = state['count']
+                generation = state.get('generation', 0)
+                log, log_complete = self._read_log(directory, generation)
+                total = count + sum(1 for entry in log if entry.get('row', -1) >= count)
+                if directory != self.directory:
+                    vectors = np.fromfile(self._generation_path(directory, self.VECTORS_FILE, generation),
+                                          dtype=np.float32, count=total * self.dimension)
+                    if self.directory:
+                        # Copy into new files, keeping the store's own snapshot intact
+                        self.generation += 1
+                        path = self._generation_path(self.directory, self.VECTORS_FILE, self.generation)
+                        if os.path.exists(path):
+                            os.remove(path)
+                else:
+                    self.generation = generation
+                self.count = 0
+                self.layout_version += 1
+                for name in ("deleted", "assignments", "timestamps", "importances", "categories"):
+                    setattr(self, name, np.zeros(0, dtype=getattr(self, name).dtype))
+                self._allocate(max(total, self.capacity))
+                if directory != self.directory:
+                    self.vectors[:total] = vectors.reshape(total, self.dimension)
+                
+                self.count = count
+                self.records = state['records']
+                self.rows_by_fact_id = {}
+                self.category_codes = {}
+                self.deleted_count = 0
+                for row, record in enumerate(self.records):
+                    if record is None:
+                        self.deleted[row] = True
+                        self.deleted_count += 1
+                    else:
+                        self.rows_by_fact_id[record["fact_id"]] = row
+                        self._set_columns(row, record)
+                
+                # Inserts and deletes flushed since the state was written
+                for entry in log:
+                    if 'delete' in entry:
+                        if entry['delete'] < self.count:
+                            self._delete_row(entry['delete'])
+                    elif entry['row'] == self.count:
+                        record = entry['record']
+                        self.records.append(record)
+                        self.rows_by_fact_id[record["fact_id"]] = self.count
+                        self._set_columns(self.count, record)
+                        self.count += 1
+                self.log_entries = []
+                self.log_length = len(log)
+                
+                self.centroids = None
+                self.lists = []
+                self.pending = []
+                self.trained_size = state.get('trained_size', 0)
+                index_path = self._generation_path(directory, self.INDEX_FILE, generation)
+                if os.path.exists(index_path):
+                    with np.load(index_path) as index:
+                        self.centroids = index['centroids']
+                        assignments = index['assignments'][:count]
+                    self.assignments[:len(assignments)] = assignments
+                    # Rows written after the index was saved
+                    unassigned = np.flatnonzero(self.assignments[:self.count] < 0)
+                    self._build_lists()
+                    if len(unassigned):
+                        self._assign(unassigned)
+                
+                # A restore into another directory must be snapshotted there,
+                # and a torn log line must not be followed by new entries
+                self.dirty = directory != self.directory or not log_complete
+                self.snapshot_due = self.dirty
+                if directory == self.directory:
+                    # Leftovers of an interrupted compaction
+                    self._remove_other_generations(directory)
+            
+            self.logger.info(f"Restored {len(self)} vectors from {directory}")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Error restoring vector store from {directory}: {e}")
+            return False
+    
+    def _read_log(self, directory: str, generation: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Entries of the records log of a generation, and whether its last line was whole"""
+        path = self._generation_path(directory, self.LOG_FILE, generation)
+        if not os.path.exists(path):
+            return [], True
+        
+        entries = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Written when a crash interrupted a flush
+                    self.logger.warning(f"Ignoring torn vector store log entry in {directory}")
+                    return entries, False
+        return entries, True
+    
+    def flush(self):
+        """Persist the changes since the last flush to the store's own directory"""
+        if not self.directory:
+            return
+        
+        with self.lock:
+            if not self.dirty:
+                return
+            if (self.snapshot_due or self.deleted_count > self.count // 4
+                    or self.log_length + len(self.log_entries) > max(self.MIN_LOG_ENTRIES, self.count // 2)):
+                self.snapshot()
+                return
+            
+            # Vectors first, so every row in the log has its embedding
+            self.vectors.flush()
+            with open(self._generation_path(self.directory, self.LOG_FILE, self.generation), "a") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in self.log_entries))
+            self.log_length += len(self.log_entries)
+            self.log_entries = []
+            self.dirty = False
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'vectors': len(self),
+            'deleted': self.deleted_count,
+            'log_entries': self.log_length,
+            'index': 'ivf' if self.centroids is not None else 'exact',
+            'clusters': len(self.centroids) if self.centroids is not None else 0
+        }
@@ -9,7 +9,7 @@ import tempfile
 import re
 
 from .tts_queue import TTSQueue, TTSQueueItem
-from ..event_system import EventConsumer, EventProducer, EventType, TTSEvent
+from ..event_system import EventConsumer, EventProducer, EventType, TTSEvent, mark_stage
 from ..config import Config
 
 class QueueManager:
@@ -89,7 +89,10 @@ class QueueManager:
         """Handle queue sentences event"""
         sentences = event.data.get('sentences', [])
         if sentences:
-            await self.tts_queue.add_sentences(sentences)
+            # A streamed response arrives as several events with one trace
+            event.mark("queue_manager", once=True)
+            # Sentences of one response share its trace
+            await self.tts_queue.add_sentences(sentences, metadata={'trace': event.trace})
             self.logger.debug(f"Queued {len(sentences)} sentences")
     
     async def _handle_reset_queue(self, event: TTSEvent):
@@ -139,14 +142,16 @@ class QueueManager:
                 return
             
             # Generate audio file
+            trace = item.metadata.get('trace')
             audio_file = await self._generate_audio(quoted_text)
             if not audio_file:
                 self.logger.error(f"Failed to generate audio for: {quoted_text}")
                 await self.tts_queue.mark_item_complete(item)
                 return
+            mark_stage(trace, "synthesis", once=True)
             
             # Play audio
-            await self._play_audio(audio_file)
+            await self._play_audio(audio_file, trace)
             
             # Clean up
             try:
@@ -167,12 +172,16 @@ class QueueManager:
             await self.tts_queue.mark_item_complete(item)
     
     def _extract_quoted_text(self, text: str) -> str:
-        """Extract text within quotes for TTS"""
+        """Extract text within quotes for TTS.
+        
+        The response processor already strips the quotes from the sentences
+        it queues, so unquoted text is spoken as-is.
+        """
         # Find all quoted text
         quoted_matches = re.findall(r'"([^"]*)"', text)
         if quoted_matches:
             return ' '.join(quoted_matches)
-        return ""
+        return text.strip()
     
     async def _generate_audio(self, text: str) -> Optional[str]:
         """Generate audio file from text"""
@@ -244,7 +253,7 @@ class QueueManager:
             self.logger.error(f"Error generating audio: {e}")
             return None
     
-    async def _play_audio(self, audio_file: str):
+    async def _play_audio(self, audio_file: str, trace: Optional[Dict[str, Any]] = None):
         """Play audio file"""
         try:
             # Use aplay or similar to play audio
@@ -255,6 +264,7 @@ class QueueManager:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
+            mark_stage(trace, "first_audio", once=True)
             
             # Wait for playback to complete
             await self.current_process.wait()
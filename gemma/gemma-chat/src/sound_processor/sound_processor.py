@@ -7,11 +7,12 @@ import pyaudio
 from typing import Optional, Dict, Any
 import threading
 import time
+from collections import deque
 from queue import Queue as ThreadQueue
 
 from .vad_detector import VADDetector
 from .wake_word_detector import WakeWordDetector
-from ..event_system import EventProducer, EventType, AudioEvent
+from ..event_system import EventProducer, EventType, AudioEvent, SharedFrameRing
 from ..config import Config
 
 class SoundProcessor:
@@ -40,6 +41,10 @@ class SoundProcessor:
         # Event system
         self.event_producer = EventProducer(config, "sound_processor")
         
+        # Shared memory ring for speech PCM, created on first use
+        self.shared_frames_enabled = config.SHARED_FRAMES_ENABLED
+        self.audio_ring: Optional[SharedFrameRing] = None
+        
         # PyAudio
         self.audio = None
         self.stream = None
@@ -59,7 +64,7 @@ class SoundProcessor:
         
         # Performance metrics
         self.processed_chunks = 0
-        self.processing_times = []
+        self.processing_times = deque(maxlen=100)
         self.vad_detections = 0
         self.wake_word_detections = 0
     
@@ -113,6 +118,11 @@ class SoundProcessor:
         # Disconnect from event system
         await self.event_producer.disconnect()
         
+        # Release shared audio ring
+        if self.audio_ring:
+            self.audio_ring.close()
+            self.audio_ring = None
+        
         self.logger.info("Sound processor stopped")
     
     def _initialize_audio(self) -> bool:
@@ -239,8 +249,6 @@ class SoundProcessor:
             # Track performance
             processing_time = time.time() - start_time
             self.processing_times.append(processing_time)
-            if len(self.processing_times) > 100:
-                self.processing_times.pop(0)
                 
         except Exception as e:
             self.logger.error(f"Error processing audio chunk: {e}")
@@ -274,11 +282,21 @@ class SoundProcessor:
                 # Get speech audio
                 speech_audio = self.vad_detector.get_speech_audio()
                 if speech_audio is not None:
-                    speech_event = AudioEvent(
-                        event_type=EventType.SPEECH_DETECTED,
-                        audio_data=speech_audio.tobytes(),
-                        confidence=vad_confidence
-                    )
+                    speech_audio = speech_audio.astype(np.float32, copy=False)
+                    audio_ref = self._write_shared_audio(speech_audio)
+                    if audio_ref is not None:
+                        speech_event = AudioEvent(
+                            event_type=EventType.SPEECH_DETECTED,
+                            audio_ref=audio_ref,
+                            confidence=vad_confidence
+                        )
+                    else:
+                        speech_event = AudioEvent(
+                            event_type=EventType.SPEECH_DETECTED,
+                            audio_data=speech_audio.tobytes(),
+                            confidence=vad_confidence
+                        )
+                    speech_event.start_trace("sound_processor")
                     await self.event_producer.send_event(speech_event)
                 
                 self.current_speech_active = False
@@ -291,6 +309,7 @@ class SoundProcessor:
                     wake_word=wake_word_text,
                     confidence=wake_word_confidence
                 )
+                wake_word_event.start_trace("sound_processor")
                 await self.event_producer.send_event(wake_word_event)
                 self.current_wake_word_active = True
                 self.logger.info(f"Wake word detected: {wake_word_text}")
@@ -298,6 +317,33 @@ class SoundProcessor:
         except Exception as e:
             self.logger.error(f"Error sending audio events: {e}")
     
+    def _write_shared_audio(self, audio: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Copy PCM samples into the shared ring and return their reference.
+        
+        Returns None if the samples must be sent inline instead.
+        """
+        if not self.shared_frames_enabled:
+            return None
+        
+        try:
+            if self.audio_ring is None:
+                slot_size = (self.config.AUDIO_RING_SLOT_SECONDS * self.sample_rate *
+                             self.channels * np.dtype(np.float32).itemsize)
+                self.audio_ring = SharedFrameRing.create(
+                    self.config.AUDIO_RING_NAME, self.config.AUDIO_RING_SLOTS, slot_size
+                )
+            
+            if audio.nbytes > self.audio_ring.slot_size:
+                # Speech too long for a slot goes inline so no samples are lost
+                self.logger.debug(f"Speech segment of {audio.nbytes} bytes exceeds the audio ring slot, sending inline")
+                return None
+            return self.audio_ring.write(audio)
+            
+        except Exception as e:
+            self.logger.warning(f"Shared audio ring unavailable, falling back to inline audio: {e}")
+            self.shared_frames_enabled = False
+            return None
+    
     def get_status(self) -> Dict[str, Any]:
         """Get sound processor status"""
         avg_processing_time = np.mean(self.processing_times) if self.processing_times else 0
@@ -317,7 +363,9 @@ class SoundProcessor:
                 'chunk_size': self.chunk_size
             },
             'vad_stats': self.vad_detector.get_statistics(),
-            'wake_word_stats': self.wake_word_detector.get_statistics()
+            'wake_word_stats': self.wake_word_detector.get_statistics(),
+            'audio_ring': self.audio_ring.get_statistics() if self.audio_ring else None,
+            'event_flow': self.event_producer.get_statistics()
         }
     
     def get_current_audio(self) -> Optional[np.ndarray]:
@@ -8,7 +8,7 @@ import threading
 import time
 from queue import Queue as ThreadQueue
 
-from ..event_system import EventProducer, EventType, TextEvent
+from ..event_system import EventProducer, EventType, TextEvent, get_latency_recorder
 from ..config import Config
 
 class TextProcessor:
@@ -192,6 +192,7 @@ class TextProcessor:
                 event_type=EventType.TEXT_INPUT,
                 text=text
             )
+            text_event.start_trace("text_processor")
             await self.event_producer.send_event(text_event)
             self.logger.debug(f"Sent text event: {text}")
             
@@ -255,6 +256,26 @@ class TextProcessor:
             avg_length = sum(status['input_lengths']) / len(status['input_lengths'])
             print(f"Average input length: {avg_length:.1f} characters")
         print()
+        self._print_latency_summary()
+    
+    def _print_latency_summary(self):
+        """Print per-stage latency percentiles from traced interactions"""
+        summary = get_latency_recorder().get_summary()
+        print("Latency by Stage (ms since input / since previous stage)")
+        print("=" * 58)
+        if not summary:
+            print("No traced interactions yet")
+            print()
+            return
+        
+        print(f"{'Stage':<20}{'Count':>6}  {'p50':>7}{'p95':>7}{'p99':>7}  {'step p50':>9}{'p95':>7}")
+        for stage, latencies in summary.items():
+            total = latencies['since_start']
+            step = latencies['since_previous']
+            print(f"{stage:<20}{total['count']:>6}  "
+                  f"{total['p50'] * 1000:>7.0f}{total['p95'] * 1000:>7.0f}{total['p99'] * 1000:>7.0f}  "
+                  f"{step['p50'] * 1000:>9.0f}{step['p95'] * 1000:>7.0f}")
+        print()
     
     async def _handle_clear(self, cmd_parts: List[str]):
         """Handle clear command"""
@@ -0,0 +1,119 @@
+"""Round trip tests for the event bus codecs"""
+
+import pytest
+
+from src.event_system.codecs import CODECS, MSGPACK_AVAILABLE, BinaryCodec, JsonCodec, MsgpackCodec, get_codec
+from src.event_system.event_types import AudioEvent, CameraEvent, EventType, GemmaEvent, TextEvent, TTSEvent
+
+BINARY_CODECS = [BinaryCodec.name] + ([MsgpackCodec.name] if MSGPACK_AVAILABLE else [])
+
+def round_trip(codec_name, event):
+    """Encode an event and decode it from the joined frame payload"""
+    codec = get_codec(codec_name)
+    payload = b"".join(bytes(part) for part in codec.encode(event))
+    return codec.decode(payload)
+
+def as_plain(data):
+    """Event data with binary values as bytes, for comparison"""
+    return {key: bytes(value) if isinstance(value, (bytes, bytearray, memoryview)) else value
+            for key, value in data.items()}
+
+def assert_same_event(decoded, event):
+    assert type(decoded) is GemmaEvent
+    assert decoded.event_type == event.event_type
+    assert decoded.timestamp == event.timestamp
+    assert decoded.priority == event.priority
+    assert decoded.source == event.source
+    assert decoded.trace == event.trace
+    assert as_plain(decoded.data) == as_plain(event.data)
+
+def sample_events():
+    """One event of each GemmaEvent subclass, plus a plain one"""
+    return [
+        CameraEvent(EventType.CAMERA_FRAME, frame_data=b"\xff\xd8jpeg\x00\xff\xd9",
+                    detections=[{'label': 'person', 'box': [1, 2, 3, 4], 'score': 0.9}],
+                    priority=2, source="camera"),
+        CameraEvent(EventType.CAMERA_FRAME, frame_ref={'ring': 'frames', 'slot': 3, 'sequence': 17,
+                                                       'shape': [480, 640, 3]}),
+        AudioEvent(EventType.SPEECH_DETECTED, audio_data=bytearray(b"\x01\x00\x02\x00" * 64),
+                   confidence=0.75, source="audio"),
+        AudioEvent(EventType.WAKE_WORD_DETECTED, wake_word="gemma", confidence=1.0),
+        TextEvent(EventType.TEXT_INPUT, text="Hello, événement \U0001F600"),
+        TTSEvent(EventType.QUEUE_SENTENCES, sentences=["One.", "Two."], priority=5),
+        GemmaEvent(EventType.SYSTEM_READY, 1700000000.25, {}, source="manager")
+    ]
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+@pytest.mark.parametrize("index", range(len(sample_events())))
+def test_event_round_trip(codec_name, index):
+    event = sample_events()[index]
+    assert_same_event(round_trip(codec_name, event), event)
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_every_event_type_round_trips(codec_name):
+    for event_type in EventType:
+        event = GemmaEvent(event_type, 1.5, {'value': event_type.value})
+        assert round_trip(codec_name, event).event_type == event_type
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_nested_data_round_trips(codec_name):
+    data = {
+        'facts': [{'content': 'likes tea', 'importance': 0.5, 'tags': ['drink', None]}],
+        'counts': {'a': 1, 'b': [1, 2, {'c': True}]},
+        'empty': {},
+        'none': None,
+        'big': 2 ** 40,
+        'ratio': -0.125
+    }
+    event = GemmaEvent(EventType.MEMORY_RETRIEVED, 2.0, data)
+    assert round_trip(codec_name, event).data == data
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_trace_round_trips(codec_name):
+    event = TextEvent(EventType.TEXT_INPUT, text="hi")
+    event.start_trace("producer")
+    event.mark("event_manager")
+    decoded = round_trip(codec_name, event)
+    assert decoded.trace == event.trace
+    assert "__trace__" not in decoded.data
+
+@pytest.mark.parametrize("codec_name", BINARY_CODECS)
+def test_binary_values_are_sent_out_of_band(codec_name):
+    frame = bytes(range(256)) * 1024
+    audio = memoryview(b"\x00\x01" * 1000)
+    event = GemmaEvent(EventType.CAMERA_FRAME, 4.0, {'frame_data': frame, 'audio_data': audio, 'label': 'x'})
+    
+    parts = get_codec(codec_name).encode(event)
+    # The header part is small; the blobs are passed through without copying
+    assert parts[1] is frame
+    assert parts[2] is audio
+    assert len(parts[0]) < 200
+    
+    decoded = round_trip(codec_name, event)
+    assert isinstance(decoded.data['frame_data'], memoryview)
+    assert bytes(decoded.data['frame_data']) == frame
+    assert bytes(decoded.data['audio_data']) == bytes(audio)
+    assert decoded.data['label'] == 'x'
+
+@pytest.mark.parametrize("codec_name", BINARY_CODECS)
+def test_empty_blob_round_trips(codec_name):
+    event = GemmaEvent(EventType.AUDIO_FRAME, 5.0, {'audio_data': b"", 'after': 1})
+    decoded = round_trip(codec_name, event)
+    assert bytes(decoded.data['audio_data']) == b""
+    assert decoded.data['after'] == 1
+
+def test_json_codec_carries_bytes_as_base64():
+    event = GemmaEvent(EventType.AUDIO_FRAME, 6.0, {'audio_data': b"\x00\xff"})
+    payload = JsonCodec().encode(event)[0]
+    assert b"__bytes__" in payload
+    assert round_trip(JsonCodec.name, event).data['audio_data'] == b"\x00\xff"
+
+def test_binary_codec_rejects_other_versions():
+    payload = bytearray(b"".join(BinaryCodec().encode(GemmaEvent(EventType.ERROR, 7.0, {}))))
+    payload[0] = BinaryCodec.version + 1
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(payload)
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("xml")
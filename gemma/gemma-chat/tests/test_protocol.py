@@ -0,0 +1,155 @@
+"""Tests for the event bus framing: FrameDecoder and FrameReader"""
+
+import asyncio
+import os
+import socket
+
+import pytest
+
+from src.event_system.protocol import (FRAME_CONTROL, FRAME_EVENT, FRAME_HEADER, FrameDecoder, FrameError,
+                                       FrameReader, decode_control, write_control, write_frame)
+
+def frame(payload, kind=FRAME_EVENT):
+    return FRAME_HEADER.pack(len(payload), kind) + payload
+
+def test_decoder_partial_reads():
+    decoder = FrameDecoder(max_frame_size=1024)
+    stream = frame(b"hello") + frame(b"", FRAME_CONTROL) + frame(b"world")
+    frames = []
+    for i in range(len(stream)):
+        frames.extend(decoder.feed(stream[i:i + 1]))
+    assert frames == [(FRAME_EVENT, b"hello"), (FRAME_CONTROL, b""), (FRAME_EVENT, b"world")]
+
+def test_decoder_merged_frames():
+    decoder = FrameDecoder(max_frame_size=1024)
+    payloads = [os.urandom(n) for n in (1, 10, 100, 1000)]
+    stream = b"".join(frame(payload) for payload in payloads)
+    # Two reads splitting the second frame's header
+    assert decoder.feed(stream[:len(frame(payloads[0])) + 2]) == [(FRAME_EVENT, payloads[0])]
+    assert decoder.feed(stream[len(frame(payloads[0])) + 2:]) == [(FRAME_EVENT, payload) for payload in payloads[1:]]
+
+def test_decoder_large_frame_is_filled_in_place():
+    decoder = FrameDecoder(max_frame_size=16 * 1024 * 1024, large_frame_size=4096)
+    payload = os.urandom(3 * 1024 * 1024 + 7)
+    stream = frame(payload) + frame(b"next")
+    
+    assert decoder.feed(stream[:1000]) == []
+    # The reader receives the rest of the frame straight into its buffer
+    received = 1000
+    frames = []
+    while decoder.pending_view is not None:
+        view = decoder.pending_view
+        count = min(len(view), 65536)
+        view[:count] = stream[received:received + count]
+        view.release()
+        received += count
+        completed = decoder.advance(count)
+        if completed is not None:
+            frames.append(completed)
+    frames.extend(decoder.feed(stream[received:]))
+    
+    assert [kind for kind, _ in frames] == [FRAME_EVENT, FRAME_EVENT]
+    assert bytes(frames[0][1]) == payload
+    assert frames[1][1] == b"next"
+
+def test_decoder_large_frame_fed_in_chunks_with_following_frames():
+    decoder = FrameDecoder(max_frame_size=16 * 1024 * 1024, large_frame_size=4096)
+    payload = os.urandom(2 * 1024 * 1024)
+    stream = frame(payload) + frame(b"a") + frame(b"b")
+    frames = []
+    for start in range(0, len(stream), 100000):
+        frames.extend(decoder.feed(stream[start:start + 100000]))
+    assert len(frames) == 3
+    assert bytes(frames[0][1]) == payload
+    assert frames[1:] == [(FRAME_EVENT, b"a"), (FRAME_EVENT, b"b")]
+
+def test_decoder_rejects_oversized_frames():
+    decoder = FrameDecoder(max_frame_size=100)
+    with pytest.raises(FrameError):
+        decoder.feed(FRAME_HEADER.pack(101, FRAME_EVENT))
+
+def test_decoder_reset_drops_partial_frame():
+    decoder = FrameDecoder(max_frame_size=1024 * 1024, large_frame_size=16)
+    decoder.feed(frame(b"x" * 1000)[:50])
+    decoder.reset()
+    assert decoder.pending_view is None
+    assert decoder.feed(frame(b"fresh")) == [(FRAME_EVENT, b"fresh")]
+
+async def read_all(reader, expected):
+    """Read until `expected` frames have arrived"""
+    frames = []
+    while len(frames) < expected:
+        read = await reader.read_frames()
+        assert read is not None
+        frames.extend(read)
+    return frames
+
+def socket_pair():
+    left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    left.setblocking(False)
+    right.setblocking(False)
+    return left, right
+
+def test_reader_multi_megabyte_frames():
+    async def run():
+        left, right = socket_pair()
+        try:
+            reader = FrameReader(right, buffer_size=65536, max_frame_size=32 * 1024 * 1024)
+            payloads = [os.urandom(5 * 1024 * 1024), b"small", os.urandom(70000)]
+            
+            async def send():
+                # Large payloads split across parts, as the codecs produce them
+                await write_frame(left, [payloads[0][:100], payloads[0][100:]])
+                await write_frame(left, payloads[1])
+                await write_control(left, {'type': 'credit', 'credits': 3})
+                await write_frame(left, payloads[2])
+            
+            sender = asyncio.ensure_future(send())
+            frames = await read_all(reader, 4)
+            await sender
+        finally:
+            left.close()
+            right.close()
+        return payloads, frames
+    
+    payloads, frames = asyncio.run(run())
+    assert [kind for kind, _ in frames] == [FRAME_EVENT, FRAME_EVENT, FRAME_CONTROL, FRAME_EVENT]
+    assert bytes(frames[0][1]) == payloads[0]
+    assert bytes(frames[1][1]) == payloads[1]
+    assert decode_control(frames[2][1]) == {'type': 'credit', 'credits': 3}
+    assert bytes(frames[3][1]) == payloads[2]
+
+def test_reader_merged_small_frames():
+    async def run():
+        left, right = socket_pair()
+        try:
+            reader = FrameReader(right, buffer_size=65536, max_frame_size=1024 * 1024)
+            # Written in one call, so the frames arrive in a single read
+            left.sendall(b"".join(frame(bytes([i]) * i) for i in range(1, 50)))
+            return await read_all(reader, 49)
+        finally:
+            left.close()
+            right.close()
+    
+    frames = asyncio.run(run())
+    assert frames == [(FRAME_EVENT, bytes([i]) * i) for i in range(1, 50)]
+
+def test_reader_returns_unread_frames_first_and_none_on_close():
+    async def run():
+        left, right = socket_pair()
+        try:
+            reader = FrameReader(right, buffer_size=1024, max_frame_size=1024 * 1024)
+            reader.unread([(FRAME_CONTROL, b"{}")])
+            left.sendall(frame(b"later"))
+            first = await reader.read_frames()
+            second = await read_all(reader, 1)
+            left.close()
+            closed = await reader.read_frames()
+            return first, second, closed
+        finally:
+            right.close()
+    
+    first, second, closed = asyncio.run(run())
+    assert first == [(FRAME_CONTROL, b"{}")]
+    assert second == [(FRAME_EVENT, b"later")]
+    assert closed is None
@@ -0,0 +1,122 @@
+"""Tests for the event manager's priority scheduler"""
+
+import asyncio
+
+from src.event_system.event_types import EventType, GemmaEvent
+from src.event_system.scheduler import EventScheduler
+
+def event(event_type=EventType.TEXT_INPUT, priority=0, label=None):
+    return GemmaEvent(event_type, 1.0, {'label': label}, priority=priority)
+
+def drain(scheduler):
+    events = []
+    while True:
+        next_event = scheduler.get_nowait()
+        if next_event is None:
+            return events
+        events.append(next_event)
+
+def labels(events):
+    return [e.data['label'] for e in events]
+
+def test_priority_then_arrival_order():
+    scheduler = EventScheduler()
+    for label, priority in (("a", 0), ("b", 5), ("c", 1), ("d", 5), ("e", 0), ("f", -1)):
+        scheduler.put(event(priority=priority, label=label))
+    assert len(scheduler) == 6
+    assert labels(drain(scheduler)) == ["b", "d", "c", "a", "e", "f"]
+    assert len(scheduler) == 0
+
+def test_full_queue_evicts_oldest_droppable():
+    scheduler = EventScheduler(max_size=3, droppable_types=[EventType.AUDIO_FRAME])
+    scheduler.put(event(EventType.AUDIO_FRAME, label="audio1"))
+    scheduler.put(event(label="text1"))
+    scheduler.put(event(EventType.AUDIO_FRAME, label="audio2"))
+    assert scheduler.put(event(label="text2"))
+    assert len(scheduler) == 3
+    assert scheduler.dropped == 1
+    assert labels(drain(scheduler)) == ["text1", "audio2", "text2"]
+
+def test_full_queue_drops_incoming_droppable_and_overflows_for_others():
+    scheduler = EventScheduler(max_size=2, droppable_types=[EventType.AUDIO_FRAME])
+    scheduler.put(event(label="text1"))
+    scheduler.put(event(label="text2"))
+    assert not scheduler.put(event(EventType.AUDIO_FRAME, label="audio"))
+    assert scheduler.dropped == 1
+    
+    # Events that must not be lost exceed the bound instead
+    assert scheduler.put(event(label="text3"))
+    assert scheduler.overflowed == 1
+    assert labels(drain(scheduler)) == ["text1", "text2", "text3"]
+
+def test_coalesce_keeps_latest_only():
+    scheduler = EventScheduler(coalesce_types=[EventType.CAMERA_FRAME])
+    scheduler.put(event(EventType.CAMERA_FRAME, label="frame1"))
+    scheduler.put(event(label="text"))
+    scheduler.put(event(EventType.CAMERA_FRAME, label="frame2"))
+    scheduler.put(event(EventType.CAMERA_FRAME, label="frame3"))
+    assert len(scheduler) == 2
+    assert scheduler.coalesced == 2
+    assert labels(drain(scheduler)) == ["text", "frame3"]
+    
+    # Once handed out, the next frame queues normally
+    scheduler.put(event(EventType.CAMERA_FRAME, label="frame4"))
+    assert scheduler.coalesced == 2
+    assert labels(drain(scheduler)) == ["frame4"]
+
+def test_release_called_once_per_event_whichever_way_it_leaves():
+    released = []
+    scheduler = EventScheduler(max_size=2,
+                               droppable_types=[EventType.AUDIO_FRAME],
+                               coalesce_types=[EventType.CAMERA_FRAME],
+                               on_release=released.append)
+    scheduler.put(event(EventType.CAMERA_FRAME), origin="coalesced")
+    scheduler.put(event(EventType.CAMERA_FRAME), origin="camera")
+    scheduler.put(event(EventType.AUDIO_FRAME), origin="evicted")
+    scheduler.put(event(), origin=None)
+    scheduler.put(event(EventType.AUDIO_FRAME), origin="dropped")
+    assert released == ["coalesced", "evicted", "dropped"]
+    
+    scheduler.get_nowait()
+    assert released == ["coalesced", "evicted", "dropped", "camera"]
+    
+    scheduler.put(event(), origin="cleared")
+    scheduler.clear()
+    assert released[-1] == "cleared"
+    assert len(released) == 5
+    assert len(scheduler) == 0
+
+def test_release_errors_are_contained():
+    def fail(origin):
+        raise RuntimeError("broken")
+    
+    scheduler = EventScheduler(on_release=fail)
+    scheduler.put(event(label="x"), origin="client")
+    assert labels(drain(scheduler)) == ["x"]
+
+def test_dead_entries_are_compacted():
+    scheduler = EventScheduler(max_size=4, coalesce_types=[EventType.CAMERA_FRAME])
+    for i in range(1000):
+        scheduler.put(event(EventType.CAMERA_FRAME, label=i))
+    assert len(scheduler) == 1
+    assert len(scheduler._heap) <= 2 * scheduler.max_size + 1
+    assert labels(drain(scheduler)) == [999]
+
+def test_get_waits_for_events_and_returns_none_when_closed():
+    async def run():
+        scheduler = EventScheduler()
+        waiter = asyncio.ensure_future(scheduler.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        
+        scheduler.put(event(label="woken"))
+        received = await asyncio.wait_for(waiter, 1.0)
+        
+        closing = asyncio.ensure_future(scheduler.get())
+        await asyncio.sleep(0)
+        scheduler.close()
+        return received, await asyncio.wait_for(closing, 1.0)
+    
+    received, after_close = asyncio.run(run())
+    assert received.data['label'] == "woken"
+    assert after_close is None